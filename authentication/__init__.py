@@ -0,0 +1,2 @@
+from .authentication import CachedTokenAuthentication, SignedTokenAuthentication, TokenCache
+from .tokens import make_signed_token, read_signed_token
@@ -0,0 +1,238 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache as shared_cache
+from django.db.models import signals
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .tokens import ExpiredToken, read_signed_token
+
+# Defaults for the AUTH_TOKEN_CACHE_* settings
+DEFAULT_CACHE_SIZE = 1000
+DEFAULT_CACHE_TIMEOUT = 60
+
+
+class TokenCache(object):
+    """
+    A bounded, thread-safe, least-recently-used map from token keys to
+    the values of the token's user's fields. Entries expire after
+    'timeout' seconds; when the cache is full, the least recently used
+    entry is dropped.
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                expires, user_values = self.entries[key]
+            except KeyError:
+                return None
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return user_values
+
+    def set(self, key, user_values):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, user_values)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    # The cache is small, so scanning it is cheaper than keeping an
+    # index by user.
+    def delete_user(self, user_id):
+        with self.lock:
+            for key in [k for k, (expires, values) in self.entries.items() if values['id'] == user_id]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache(
+    getattr(settings, 'AUTH_TOKEN_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT),
+)
+
+
+def shared_token_key(key):
+    return 'auth-token:{}'.format(key)
+
+
+def shared_user_key(user_id):
+    return 'auth-user:{}'.format(user_id)
+
+
+def use_shared_cache():
+    return getattr(settings, 'AUTH_TOKEN_CACHE_SHARED', False)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    A drop-in replacement for rest_framework's TokenAuthentication that
+    remembers which user each token belongs to, so that most requests
+    don't need a database query to authenticate.
+
+    Resolved tokens are kept in a per-process LRU cache (see TokenCache),
+    sized by AUTH_TOKEN_CACHE_SIZE and expiring after
+    AUTH_TOKEN_CACHE_TIMEOUT seconds. If AUTH_TOKEN_CACHE_SHARED is set,
+    the default Django cache is used instead, so that processes share the
+    work, and the LRU cache isn't used at all.
+
+    Deleting a token or saving a user (which covers deactivating them,
+    or changing their club or staff status) clears their entries: from
+    the shared cache everywhere, but from the LRU cache only in the
+    process that made the change. So without the shared cache, other
+    processes (and, either way, changes made with QuerySet.update()) can
+    use stale details for up to AUTH_TOKEN_CACHE_TIMEOUT seconds.
+
+    We cache the user's field values (apart from UNCACHED_FIELDS) rather
+    than the User object, and build a fresh User for each request, so
+    that nothing cached on the object (such as its committee roles)
+    outlives the request.
+    """
+
+    def authenticate_credentials(self, key):
+        if use_shared_cache():
+            # Only the shared cache is cleared everywhere when a token is
+            # deleted or a user is saved, so the LRU cache is skipped
+            user_values = None
+            user_id = shared_cache.get(shared_token_key(key))
+            if user_id is not None:
+                user_values = shared_cache.get(shared_user_key(user_id))
+        else:
+            user_values = token_cache.get(key)
+        if user_values is None:
+            user, token = super(CachedTokenAuthentication, self).authenticate_credentials(key)
+            user_values = user_to_values(user)
+            if use_shared_cache():
+                # In the shared cache, tokens map to user IDs, and user
+                # IDs map to field values, so that saving a user only
+                # has to clear one entry.
+                shared_cache.set(shared_token_key(key), user.pk, cache_timeout())
+                shared_cache.set(shared_user_key(user.pk), user_values, cache_timeout())
+            else:
+                token_cache.set(key, user_values)
+            return (user, token)
+
+        if not user_values['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        user = user_from_values(user_values)
+        return (user, self.get_model()(key=key, user=user))
+
+
+def cache_timeout():
+    return getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT)
+
+
+# User fields that authentication doesn't need, and which are kept out
+# of the caches (the password hash above all). Users built from cached
+# values have them deferred, so they're loaded if anything asks for them.
+UNCACHED_FIELDS = ('password', 'last_login')
+
+
+def cached_field_names():
+    User = get_user_model()
+    return [field.attname for field in User._meta.concrete_fields if field.attname not in UNCACHED_FIELDS]
+
+
+def user_to_values(user):
+    return {name: getattr(user, name) for name in cached_field_names()}
+
+
+def user_from_values(user_values):
+    field_names = cached_field_names()
+    return get_user_model().from_db('default', field_names, [user_values[name] for name in field_names])
+
+
+def get_user_values(user_id):
+    """
+    Return the field values of the user with the given ID, or None if
+    there's no such user. They come from the shared cache, if
+    AUTH_TOKEN_CACHE_SHARED is set, or from the database; never from the
+    per-process cache, which only the process that revokes a user's
+    tokens (or deactivates them) would know to clear.
+    """
+    user_values = None
+    if use_shared_cache():
+        user_values = shared_cache.get(shared_user_key(user_id))
+    if user_values is None:
+        User = get_user_model()
+        try:
+            user_values = user_to_values(User.objects.get(pk=user_id))
+        except User.DoesNotExist:
+            return None
+        if use_shared_cache():
+            shared_cache.set(shared_user_key(user_id), user_values, cache_timeout())
+    return user_values
+
+
+class SignedTokenAuthentication(TokenAuthentication):
+    """
+    Authenticate with an expiring, signed token (see tokens.py), sent as:
+
+        Authorization: Bearer 1234:1500000000:0:<signature>
+
+    The signature and expiry time are checked without touching the
+    database. A token is rejected once the user's token generation has
+    moved on (see User.revoke_signed_tokens()), so the user's details
+    must be current in every process: they come from the shared cache
+    (which revoking clears) if AUTH_TOKEN_CACHE_SHARED is set, and from
+    the database, with one query per request, if it isn't.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate_credentials(self, key):
+        try:
+            user_id, generation = read_signed_token(key)
+        except ExpiredToken:
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        except signing.BadSignature:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user_values = get_user_values(user_id)
+        if user_values is None or not user_values['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        if user_values['token_generation'] != generation:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+        return (user_from_values(user_values), key)
+
+
+###############################################################################
+# Invalidation
+###############################################################################
+
+def forget_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+    if use_shared_cache():
+        shared_cache.delete(shared_token_key(instance.key))
+
+
+def forget_user(sender, instance, **kwargs):
+    token_cache.delete_user(instance.pk)
+    if use_shared_cache():
+        shared_cache.delete(shared_user_key(instance.pk))
+
+
+signals.post_delete.connect(forget_token, sender='authtoken.Token', dispatch_uid='authentication.forget_token')
+signals.post_save.connect(forget_user, sender=settings.AUTH_USER_MODEL, dispatch_uid='authentication.forget_user:save')
+signals.post_delete.connect(forget_user, sender=settings.AUTH_USER_MODEL, dispatch_uid='authentication.forget_user:delete')
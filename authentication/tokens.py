@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+
+# Signed tokens are valid for this many seconds unless the
+# SIGNED_TOKEN_LIFETIME setting says otherwise.
+DEFAULT_LIFETIME = 24 * 60 * 60
+
+SALT = 'authentication.tokens'
+
+
+class ExpiredToken(signing.BadSignature):
+    pass
+
+
+def token_lifetime():
+    return getattr(settings, 'SIGNED_TOKEN_LIFETIME', DEFAULT_LIFETIME)
+
+
+def make_signed_token(user, lifetime=None):
+    """
+    Return a token for the user, and the time (in seconds since the
+    epoch) at which it expires. The token is the user's ID, the expiry
+    time and the user's current token generation, with an HMAC signature
+    over all three, so it can be checked without a database query.
+    """
+    expires = int(time.time()) + (lifetime if lifetime is not None else token_lifetime())
+    value = '{}:{}:{}'.format(user.pk, expires, user.token_generation)
+    return signing.Signer(salt=SALT).sign(value), expires
+
+
+def read_signed_token(token):
+    """
+    Check a token's signature and expiry time, and return the user ID
+    and token generation that it was issued for. Raises BadSignature if
+    the token has been tampered with, or ExpiredToken if it's too old.
+    """
+    value = signing.Signer(salt=SALT).unsign(token)
+    try:
+        user_id, expires, generation = [int(part) for part in value.split(':')]
+    except ValueError:
+        raise signing.BadSignature('Malformed token')
+    if expires < time.time():
+        raise ExpiredToken('Token expired')
+    return user_id, generation
@@ -0,0 +1,50 @@
+from rest_framework import status
+from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .authentication import SignedTokenAuthentication
+from .tokens import make_signed_token
+
+
+def signed_token_response(user):
+    token, expires = make_signed_token(user)
+    return Response({'token': token, 'expires': expires})
+
+
+# Exchange a username and password for a signed token, just as
+# /auth/login/ does for a database token. Any credentials the client
+# sends (such as a revoked token) are ignored.
+class ObtainSignedToken(ObtainAuthToken):
+    authentication_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return signed_token_response(serializer.validated_data['user'])
+
+
+# Exchange a signed token that hasn't expired yet for a fresh one.
+class RefreshSignedToken(APIView):
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        return signed_token_response(request.user)
+
+
+# Revoke every signed token issued to the requesting user, including
+# the one used to make this request.
+class RevokeSignedTokens(APIView):
+    authentication_classes = (SignedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request, *args, **kwargs):
+        request.user.revoke_signed_tokens()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+obtain_signed_token = ObtainSignedToken.as_view()
+refresh_signed_token = RefreshSignedToken.as_view()
+revoke_signed_tokens = RevokeSignedTokens.as_view()
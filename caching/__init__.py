@@ -0,0 +1 @@
+from .caching import CachedListMixin, ConditionalGetMixin, cache_list_until_changed, invalidate_cached_list, make_etag
@@ -0,0 +1,204 @@
+import calendar
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Max, signals
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+# How long (in seconds) a cached list is kept. Saving or deleting an
+# object clears its model's list straight away, but only in the cache
+# used by the process that made the change; with the default local-memory
+# cache, other processes can serve the old list for up to this long.
+DEFAULT_TIMEOUT = 300
+
+
+def cached_list_key(model):
+    return 'cached-list:{}.{}'.format(model._meta.app_label, model._meta.model_name)
+
+
+def deleted_key(model):
+    return 'cached-list-deleted:{}.{}'.format(model._meta.app_label, model._meta.model_name)
+
+
+def invalidate_cached_list(sender, **kwargs):
+    """
+    Throw away the cached list for a model. The signature allows this to
+    be used as a signal receiver (in which case 'sender' is the model).
+    """
+    cache.delete(cached_list_key(sender))
+
+
+# Deleting a row doesn't change the latest last_modified of the rows
+# that are left, so the time of the last deletion is kept (for as long
+# as the cache keeps it) to go into the list's Last-Modified too.
+def record_deletion(sender, **kwargs):
+    cache.set(deleted_key(sender), timezone.now(), None)
+    invalidate_cached_list(sender)
+
+
+def cache_list_until_changed(model):
+    """
+    Clear the model's cached list whenever one of its objects is saved
+    or deleted.
+    """
+    signals.post_save.connect(invalidate_cached_list, model, weak=False,
+                              dispatch_uid=cached_list_key(model) + ':save')
+    signals.post_delete.connect(record_deletion, model, weak=False,
+                                dispatch_uid=cached_list_key(model) + ':delete')
+
+
+def compute_etag(data):
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode('utf-8')
+    return hashlib.md5(content).hexdigest()
+
+
+def make_etag(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+
+class CachedListMixin(object):
+    """
+    Serve a viewset's (unfiltered, unpaginated) list from the cache, and
+    answer conditional requests (If-None-Match / If-Modified-Since) with
+    304 Not Modified. This is meant for small reference tables that
+    every client fetches often and that rarely change: the list must be
+    the same for every user, and the model must be registered with
+    cache_list_until_changed() so that changes clear the cache.
+
+    The model must also have a 'last_modified' field. The list's
+    Last-Modified is the latest of its rows' (or the time a row was last
+    deleted, if that's later), not the time the list was cached, so that
+    a change made just before the list was cached isn't missed.
+    """
+
+    def list(self, request, *args, **kwargs):
+        # Requests with query parameters (for pagination, say) are
+        # passed straight through
+        if request.query_params:
+            return super(CachedListMixin, self).list(request, *args, **kwargs)
+
+        model = self.get_queryset().model
+        key = cached_list_key(model)
+        entry = cache.get(key)
+        if entry is None:
+            changed = [self.get_queryset().aggregate(latest=Max('last_modified'))['latest'],
+                       cache.get(deleted_key(model))]
+            changed = [dt for dt in changed if dt is not None]
+            data = super(CachedListMixin, self).list(request, *args, **kwargs).data
+            # Store plain JSON-compatible data rather than DRF's
+            # ReturnList, which keeps a reference to its serializer
+            data = json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+            entry = {
+                'data': data,
+                'etag': compute_etag(data),
+                'last_modified': timestamp(max(changed)) if changed else None,
+            }
+            timeout = getattr(settings, 'REFERENCE_DATA_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+            cache.set(key, entry, timeout)
+
+        not_modified = get_conditional_response(
+            request, etag=entry['etag'], last_modified=entry['last_modified'])
+        if not_modified is not None:
+            response = not_modified
+        else:
+            response = Response(entry['data'])
+        response['ETag'] = quote_etag(entry['etag'])
+        if entry['last_modified'] is not None:
+            response['Last-Modified'] = http_date(entry['last_modified'])
+        return response
+
+
+class ConditionalGetMixin(object):
+    """
+    Answer conditional GET requests (If-None-Match / If-Modified-Since)
+    for models with a 'last_modified' field with 304 Not Modified, before
+    anything is serialized.
+
+    A detail response's validator is the object's last_modified plus the
+    set of fields the caller gets to see; a list's is the latest
+    last_modified and the number of rows in the (already permission-
+    filtered) queryset, so adding, changing or deleting a row changes
+    it. Lists go through paginated_response() (see PaginatedListMixin);
+    views that build their own detail response can use
+    conditional_response() directly.
+
+    Only the object's own row is checked: a change to a related object
+    (a certificate's name, say) doesn't change the validator. Views can
+    add to the validator by extending get_detail_etag_parts() or
+    get_list_etag_parts(), and can limit which actions are conditional
+    with 'conditional_actions'.
+    """
+
+    conditional_actions = None
+
+    def is_conditional(self, model):
+        if self.request.method not in ('GET', 'HEAD'):
+            return False
+        if self.conditional_actions is not None and self.action not in self.conditional_actions:
+            return False
+        return any(field.name == 'last_modified' for field in model._meta.get_fields())
+
+    def get_detail_etag_parts(self, obj, fields=None):
+        return [
+            obj._meta.label, obj.pk, obj.last_modified.isoformat(),
+            ','.join(sorted(fields)) if fields is not None else '*',
+        ]
+
+    def get_list_etag_parts(self, queryset, serializer_class, **kwargs):
+        # The queryset is already restricted to what the requesting user
+        # may see, but two users can see different lists of the same
+        # size and age, so the user is part of the validator too.
+        aggregates = queryset.aggregate(latest=Max('last_modified'), count=Count('pk'))
+        fields = kwargs.get('fields')
+        return [
+            queryset.model._meta.label, self.request.user.pk, serializer_class.__name__,
+            ','.join(sorted(fields)) if fields is not None else '*',
+            self.request.META.get('QUERY_STRING', ''),
+            aggregates['count'],
+            aggregates['latest'].isoformat() if aggregates['latest'] else '',
+        ]
+
+    def conditional_response(self, etag, last_modified, respond):
+        """
+        Return 304 Not Modified if the client's copy is current, or
+        respond() if not, with the validators set on the response.
+        'last_modified' may be None (see paginated_response()).
+        """
+        response = get_conditional_response(self.request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = respond()
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def conditional_detail_response(self, instance, respond, fields=None):
+        if not self.is_conditional(type(instance)):
+            return respond()
+        etag = make_etag(*self.get_detail_etag_parts(instance, fields))
+        return self.conditional_response(etag, timestamp(instance.last_modified), respond)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.conditional_detail_response(
+            instance, lambda: Response(self.get_serializer(instance).data))
+
+    def paginated_response(self, queryset, serializer_class, limit=None, **kwargs):
+        respond = lambda: super(ConditionalGetMixin, self).paginated_response(
+            queryset, serializer_class, limit=limit, **kwargs)
+        if not self.is_conditional(queryset.model):
+            return respond()
+        etag = make_etag(*self.get_list_etag_parts(queryset, serializer_class, **kwargs))
+        # Deleting a row doesn't change the latest last_modified, so a
+        # list can't be validated by date alone; it only gets an ETag.
+        return self.conditional_response(etag, None, respond)
@@ -0,0 +1,33 @@
+import factory
+from factory.django import DjangoModelFactory
+
+from clubs.models import Club, CommitteePosition, Region
+from clubs.roles import DIVE_OFFICER
+
+class RegionFactory(DjangoModelFactory):
+    class Meta:
+        model = Region
+
+    name = factory.Sequence(lambda n: 'Region {}'.format(n))
+
+
+class ClubFactory(DjangoModelFactory):
+    class Meta:
+        model = Club
+
+    name = factory.Sequence(lambda n: 'Club {}'.format(n))
+    region = factory.SubFactory(RegionFactory)
+    description = factory.Faker('sentence')
+    contact_name = factory.Faker('name')
+    contact_email = factory.Faker('email')
+    location = factory.Faker('city')
+    foundation_date = factory.Faker('date_object')
+
+
+class CommitteePositionFactory(DjangoModelFactory):
+    class Meta:
+        model = CommitteePosition
+
+    user = factory.SubFactory('users.factories.UserFactory')
+    club = factory.SelfAttribute('user.club')
+    role = DIVE_OFFICER
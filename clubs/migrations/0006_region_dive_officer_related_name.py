@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 16:03
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0005_auto_20170215_1406'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='region',
+            name='dive_officer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='regions_officered', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 from django.db import models
 
+from caching import cache_list_until_changed
 from clubs.roles import ROLE_CHOICES
 
 def get_national_region():
@@ -60,7 +61,7 @@ class Club(models.Model):
     ############################################################################
 
     def has_as_dive_officer(self, user):
-        return user.club == self and user.is_dive_officer()
+        return user.club_id == self.pk and user.is_dive_officer()
 
     ############################################################################
     # Internal use only
@@ -101,8 +102,16 @@ class Region(models.Model):
     A Region has a Dive Officer, and a name.
     """
 
-    dive_officer = models.ForeignKey('users.User', blank=True, null=True)
+    dive_officer = models.ForeignKey('users.User', blank=True, null=True, related_name='regions_officered')
     name = models.CharField(max_length=200)
 
+    # When was the record last modified?
+    last_modified = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name
+
+
+# The region list is served from the cache (see RegionViewSet), so
+# throw it away whenever a region changes.
+cache_list_until_changed(Region)
@@ -113,3 +113,30 @@ class ActiveInstructorsTestCase(APITestCase):
         self.client.force_authenticate(self.pleb)
         result = self.client.get(reverse('region-active-instructors', args=[self.south.id]))
         self.assertEqual(result.status_code, status.HTTP_403_FORBIDDEN)
+
+    ###########################################################################
+    # Each active instructor appears once, however many instructor
+    # certificates they hold, and the list is built in a constant number
+    # of queries.
+    ###########################################################################
+
+    def test_instructor_with_several_instructor_certificates_is_listed_once(self):
+        mon2 = Certificate.objects.create(name='Mon 2', is_instructor_certificate=True)
+        self.u1.receive_certificate(mon2)
+        self.client.force_authenticate(self.do)
+        result = self.client.get(reverse('region-active-instructors', args=[self.south.id]))
+        ids = [u['id'] for u in result.data]
+        self.assertEqual(sorted(ids), sorted([self.u1.id, self.u2.id]))
+
+    def test_query_count_does_not_depend_on_number_of_instructors(self):
+        staff = User.objects.create_user('Staff', 'User', is_staff=True)
+        self.client.force_authenticate(staff)
+        url = reverse('region-active-instructors', args=[self.south.id])
+        with self.assertNumQueries(4):
+            self.client.get(url)
+        for i in range(5):
+            u = User.objects.create_user('Another', 'Instructor', club=self.csac)
+            u.receive_certificate(self.mon1)
+        with self.assertNumQueries(4):
+            result = self.client.get(url)
+        self.assertEqual(len(result.data), self.num_instructors_in_south + 5)
@@ -148,3 +148,43 @@ class ClubDetailTestCase(APITestCase):
                      'DO should see a list of members in club detail')
         expected_member_length = 2 # DO and member
         self.assertEqual(len(data['users']), expected_member_length)
+
+
+class ConditionalClubDetailTestCase(APITestCase):
+
+    def setUp(self):
+        self.club = Club.objects.create(name='UCC')
+        self.do = User.objects.create_user('Dave', 'Officer', club=self.club)
+        self.do.become_dive_officer()
+        self.member = User.objects.create_user('Normal', 'User', club=self.club)
+        self.url = reverse('club-detail', args=[self.club.id])
+
+    def get(self, user, etag):
+        self.client.force_authenticate(user)
+        return self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_club_is_not_modified(self):
+        self.client.force_authenticate(self.member)
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.get(self.member, etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_validator_depends_on_visible_fields(self):
+        self.client.force_authenticate(self.member)
+        etag = self.client.get(self.url)['ETag']
+        # The DO sees more fields, so the member's copy won't do
+        self.assertEqual(self.get(self.do, etag).status_code, status.HTTP_200_OK)
+
+    def test_new_member_changes_validator(self):
+        self.client.force_authenticate(self.do)
+        etag = self.client.get(self.url)['ETag']
+        User.objects.create_user('New', 'Member', club=self.club)
+        response = self.get(self.do, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['users']), 3)
+
+    def test_update_changes_validator(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.get(self.url)
+        self.club.location = 'Cork'
+        self.club.save()
+        self.assertEqual(self.get(self.member, response['ETag']).status_code, status.HTTP_200_OK)
@@ -0,0 +1,100 @@
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from qualifications.models import Certificate, Qualification
+from users.models import User
+
+class ClubQualificationsTestCase(APITestCase):
+
+    def setUp(self):
+        self.region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=self.region)
+        self.other_club = Club.objects.create(name='CSAC', region=self.region)
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.do = User.objects.create_user('Dave', 'Officer', club=self.club)
+        self.do.become_dive_officer()
+        self.trainee = Certificate.objects.create(name='Trainee Diver')
+        self.club_diver = Certificate.objects.create(name='Club Diver')
+        self.alice = User.objects.create_user('Alice', 'Byrne', club=self.club)
+        self.bob = User.objects.create_user('Bob', 'Ahern', club=self.club)
+        self.outsider = User.objects.create_user('Olive', 'Outsider', club=self.other_club)
+        for user in (self.alice, self.bob, self.outsider):
+            user.receive_certificate(self.trainee)
+        self.alice.receive_certificate(self.club_diver)
+        # A second, later qualification with the same certificate
+        Qualification.objects.create(user=self.alice, certificate=self.club_diver)
+        self.url = reverse('club-qualifications', args=[self.club.pk])
+
+    def test_full_list_is_still_the_default(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['user']['club']['region']['name'], 'South')
+
+    def test_full_list_takes_a_constant_number_of_queries(self):
+        self.client.force_authenticate(self.staff)
+        # The club, the conditional-request validator, the
+        # qualifications, and the members of their holders' clubs
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        for i in range(5):
+            User.objects.create_user('Member', str(i), club=self.club).receive_certificate(self.trainee)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_counts_report(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, {'report': 'counts'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'certificate': {'id': self.club_diver.pk, 'name': 'Club Diver'}, 'holders': 1},
+            {'certificate': {'id': self.trainee.pk, 'name': 'Trainee Diver'}, 'holders': 2},
+        ])
+
+    def test_members_report(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, {'report': 'members'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['holders'] for row in response.data], [1, 2])
+        self.assertEqual(response.data[0]['members'], [
+            {'id': self.alice.pk, 'first_name': 'Alice', 'last_name': 'Byrne'},
+        ])
+        # Members are listed by surname
+        self.assertEqual([member['id'] for member in response.data[1]['members']],
+                         [self.bob.pk, self.alice.pk])
+
+    def test_reports_take_a_constant_number_of_queries(self):
+        self.client.force_authenticate(self.staff)
+        for report in ('counts', 'members'):
+            # The club, the conditional-request validator, and the report
+            with self.assertNumQueries(3):
+                self.client.get(self.url, {'report': report})
+
+    def test_report_answers_conditional_requests(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, {'report': 'counts'})
+        etag = response['ETag']
+        self.assertNotEqual(etag, self.client.get(self.url)['ETag'])
+        response = self.client.get(self.url, {'report': 'counts'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_unknown_report_is_rejected(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.get(self.url, {'report': 'everything'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_dive_officer_can_see_their_own_club_report(self):
+        self.client.force_authenticate(self.do)
+        response = self.client.get(self.url, {'report': 'counts'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(reverse('club-qualifications', args=[self.other_club.pk]), {'report': 'counts'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_regular_members_cannot_see_reports(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.get(self.url, {'report': 'counts'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
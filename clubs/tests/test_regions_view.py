@@ -1,4 +1,10 @@
+import calendar
+import datetime
+
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -65,3 +71,59 @@ class RegionDeleteTestCase(APITestCase):
         self.client.force_authenticate(User.objects.create_superuser('Super', 'User', 'pass'))
         response = self.client.delete(reverse('region-detail', args=[self.south.id]))
         self.assertTrue(Club.objects.filter(name='UCC').exists())
+
+
+class CachedRegionListTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.south = Region.objects.create(name='south')
+        self.member = User.objects.create_user('Club', 'Member')
+        self.client.force_authenticate(self.member)
+
+    def test_region_list_is_served_from_the_cache(self):
+        self.client.get(reverse('region-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('region-list'))
+        self.assertEqual(response.data, [{'name': 'south', 'id': self.south.id}])
+
+    def test_changes_to_regions_clear_the_cache(self):
+        self.client.get(reverse('region-list'))
+        Region.objects.create(name='north')
+        response = self.client.get(reverse('region-list'))
+        self.assertEqual(len(response.data), 2)
+        self.south.delete()
+        response = self.client.get(reverse('region-list'))
+        self.assertEqual(len(response.data), 1)
+
+    def test_clients_can_revalidate_with_etag(self):
+        response = self.client.get(reverse('region-list'))
+        etag = response['ETag']
+        response = self.client.get(reverse('region-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.south.name = 'South'
+        self.south.save()
+        response = self.client.get(reverse('region-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_clients_can_revalidate_with_last_modified(self):
+        response = self.client.get(reverse('region-list'))
+        response = self.client.get(reverse('region-list'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_last_modified_is_when_the_regions_changed(self):
+        an_hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        Region.objects.filter(pk=self.south.pk).update(last_modified=an_hour_ago)
+        response = self.client.get(reverse('region-list'))
+        self.assertEqual(response['Last-Modified'], http_date(calendar.timegm(an_hour_ago.utctimetuple())))
+
+    def test_deleting_a_region_moves_last_modified_on(self):
+        Region.objects.create(name='north')
+        an_hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        Region.objects.update(last_modified=an_hour_ago)
+        last_modified = self.client.get(reverse('region-list'))['Last-Modified']
+        self.south.delete()
+        response = self.client.get(reverse('region-list'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
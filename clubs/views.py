@@ -1,28 +1,35 @@
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets
 from rest_framework.decorators import detail_route, list_route, permission_classes
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
 
 from rest_condition import C, ConditionalPermission
 
+from caching import CachedListMixin, ConditionalGetMixin, make_etag
 from clubs.models import Club, Region
 from clubs.roles import DIVE_OFFICER
 from clubs.serializers import ClubSerializer, RegionSerializer
+from mixins import PaginatedListMixin
 from permissions.permissions import IsAdminUser, IsRegionalDiveOfficer, IsDiveOfficer, IsSafeMethod
 from qualifications.models import Qualification
 from qualifications.serializers import QualificationSerializer
+from users import fieldsets
 from users.models import User
 from users.serializers import UserSerializer
 
-from users.choices import STATUS_CURRENT
-
-class ClubViewSet(viewsets.ModelViewSet):
+class ClubViewSet(ConditionalGetMixin, PaginatedListMixin, viewsets.ModelViewSet):
 
     queryset = Club.objects.all()
     serializer_class = ClubSerializer
 
+    # The club list includes each club's members, which can change
+    # without touching the club's last_modified, so only these
+    # responses are conditional (see get_detail_etag_parts()).
+    conditional_actions = ('retrieve', 'qualifications')
+
     ###########################################################################
     # Field sets for detail views --- these tuples 
     ###########################################################################
@@ -87,7 +94,7 @@ class ClubViewSet(viewsets.ModelViewSet):
             if user.is_staff:
                 fields = self.admin_fields
             # Let DOs see more detail about their own club
-            if user.is_dive_officer() and user.club == club:
+            if user.is_dive_officer() and user.club_id == club.pk:
                 fields = self.do_fields
             return fields
         # For unsafe methods, return the fields corresponding to the user's
@@ -115,8 +122,7 @@ class ClubViewSet(viewsets.ModelViewSet):
         queryset = self.get_queryset()
         if region_pk is not None:
             queryset = queryset.filter(region__pk=region_pk)
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(queryset, self.serializer_class)
 
     def perform_create(self, serializer):
         # Find the region in the request data and save it with the rest
@@ -129,7 +135,8 @@ class ClubViewSet(viewsets.ModelViewSet):
         )
 
     # We override ModelViewSet.retrieve() in order to set the fields.
-    def retrieve(self, request, pk=None):
+    # (The nested region routes pass region_pk too, which we don't need.)
+    def retrieve(self, request, pk=None, **kwargs):
         # Retrieve the club
         club = self.get_object()
         # Get the requesting user
@@ -141,16 +148,30 @@ class ClubViewSet(viewsets.ModelViewSet):
         if user.is_staff:
             fields = self.admin_fields
         # Let DOs see more detail about their own club
-        if user.is_dive_officer() and user.club == club:
+        if user.is_dive_officer() and user.club_id == club.pk:
             fields = self.do_fields
-        serializer = self.serializer_class(club, fields=fields)
-        return Response(serializer.data)
+        return self.conditional_detail_response(
+            club, lambda: Response(self.serializer_class(club, fields=fields).data), fields=fields)
+
+    # Joining or leaving a club doesn't change the club's last_modified,
+    # so if the response lists the club's members, the validator has to
+    # include them.
+    def get_detail_etag_parts(self, obj, fields=None):
+        parts = super(ClubViewSet, self).get_detail_etag_parts(obj, fields)
+        if fields is None or 'users' in fields:
+            parts.append(','.join(str(pk) for pk in obj.users.order_by('pk').values_list('pk', flat=True)))
+        return parts
+
 
+    # The kinds of report that the qualifications route can give instead
+    # of a full list (see qualifications_report())
+    qualification_reports = ('counts', 'members')
 
     # Given a club ID in the request URL, find all qualifications that
-    # have been granted to members of that club
+    # have been granted to members of that club. With ?report=counts or
+    # ?report=members, summarize them by certificate instead.
     @detail_route(methods=['GET'])
-    def qualifications(self, request, pk=None):
+    def qualifications(self, request, pk=None, **kwargs):
         club = self.get_object()
         # the requesting user is a superuser or staff, then that's OK.
         if request.user.is_superuser or request.user.is_staff:
@@ -159,12 +180,56 @@ class ClubViewSet(viewsets.ModelViewSet):
         elif not request.user.has_any_role():
             raise PermissionDenied
         # A Dive Officer can only receive a list of members of their own club
-        elif not club == request.user.club:
+        elif not club.pk == request.user.club_id:
             raise PermissionDenied
         # Otherwise, proceed
         queryset = Qualification.objects.filter(user__club=club)
-        serializer = QualificationSerializer(queryset, many=True)
-        return Response(serializer.data)
+        report = request.query_params.get('report')
+        if report is not None:
+            if report not in self.qualification_reports:
+                raise ValidationError({'report': 'Must be one of: {}'.format(', '.join(self.qualification_reports))})
+            respond = lambda: Response(self.qualifications_report(queryset, report))
+            if not self.is_conditional(Qualification):
+                return respond()
+            etag = make_etag(*self.get_list_etag_parts(queryset, QualificationSerializer))
+            return self.conditional_response(etag, None, respond)
+        return self.paginated_response(queryset.with_serializer_data(), QualificationSerializer)
+
+    def qualifications_report(self, queryset, report):
+        """
+        Summarize qualifications by certificate, in certificate order:
+        for each certificate, the number of members who hold it and (if
+        report is 'members') who they are. This takes a single query.
+        """
+        if report == 'counts':
+            rows = queryset.values('certificate_id', 'certificate__name').annotate(
+                holders=Count('user', distinct=True),
+            ).order_by('certificate__name', 'certificate_id')
+            return [{
+                'certificate': {'id': row['certificate_id'], 'name': row['certificate__name']},
+                'holders': row['holders'],
+            } for row in rows]
+
+        rows = queryset.values(
+            'certificate_id', 'certificate__name', 'user_id', 'user__first_name', 'user__last_name',
+        ).order_by(
+            'certificate__name', 'certificate_id', 'user__last_name', 'user__first_name', 'user_id',
+        ).distinct()
+        certificates = []
+        for row in rows:
+            if not certificates or certificates[-1]['certificate']['id'] != row['certificate_id']:
+                certificates.append({
+                    'certificate': {'id': row['certificate_id'], 'name': row['certificate__name']},
+                    'holders': 0,
+                    'members': [],
+                })
+            certificates[-1]['holders'] += 1
+            certificates[-1]['members'].append({
+                'id': row['user_id'],
+                'first_name': row['user__first_name'],
+                'last_name': row['user__last_name'],
+            })
+        return certificates
 
     def perform_update(self, serializer):
         user = self.request.user
@@ -216,7 +281,9 @@ class ClubViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class RegionViewSet(viewsets.ModelViewSet):
+# Regions rarely change, and every client needs the list, so it's served
+# from the cache.
+class RegionViewSet(CachedListMixin, PaginatedListMixin, viewsets.ModelViewSet):
 
     queryset = Region.objects.all()
 
@@ -249,25 +316,18 @@ class RegionViewSet(viewsets.ModelViewSet):
             pass
         # Otherwise, if the user is a committee member and the region
         # matches, then they're fine
-        elif user.has_any_role() and user.club.region == region:
+        elif user.has_any_role() and user.club.region_id == region.pk:
             pass
         # Or (least likely) the user is the regional dive officer
-        elif user == region.dive_officer:
+        elif user.is_regional_dive_officer(region):
             pass
         # Otherwise, they're forbidden to access this
         else:
             raise PermissionDenied
 
-        # Get all instructors from this region
-        queryset = User.objects.filter(
-            club__region=region,
-            qualifications__certificate__is_instructor_certificate=True
-        )
-        # Filter on active status --- we can't do this through the ORM,
-        # so we have to do it on the retrieved queryset.
-        queryset = [u for u in queryset if u.current_membership_status() == STATUS_CURRENT]
-        serializer = UserSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Get all current instructors from this region
+        queryset = User.objects.filter(club__region=region).instructors().current()
+        return self.paginated_response(queryset.with_serializer_data(), UserSerializer)
 
     @detail_route(methods=['get'])
     def dive_officers(self, request, pk=None):
@@ -291,5 +351,4 @@ class RegionViewSet(viewsets.ModelViewSet):
         fields = fieldsets.CONTACT_DETAILS
 
         # Serialize and return the data
-        serializer = UserSerializer(dive_officers, fields=fields, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(queryset, UserSerializer, fields=fields)
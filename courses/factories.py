@@ -0,0 +1,33 @@
+import factory
+from django.utils import timezone
+from factory.django import DjangoModelFactory
+
+from courses.models import Course, CourseEnrolment, CourseInstruction
+from qualifications.factories import CertificateFactory
+
+class CourseFactory(DjangoModelFactory):
+    class Meta:
+        model = Course
+
+    certificate = factory.SubFactory(CertificateFactory)
+    creator = factory.SubFactory('users.factories.UserFactory')
+    organizer = factory.SelfAttribute('creator')
+    region = factory.SelfAttribute('organizer.club.region')
+    location = factory.Faker('city')
+    datetime = factory.Faker('date_time_this_year', tzinfo=timezone.utc)
+
+
+class CourseEnrolmentFactory(DjangoModelFactory):
+    class Meta:
+        model = CourseEnrolment
+
+    course = factory.SubFactory(CourseFactory)
+    user = factory.SubFactory('users.factories.UserFactory')
+
+
+class CourseInstructionFactory(DjangoModelFactory):
+    class Meta:
+        model = CourseInstruction
+
+    course = factory.SubFactory(CourseFactory)
+    user = factory.SubFactory('users.factories.UserFactory')
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 17:20
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+# Instructors used to be added one at a time, so a course could list the
+# same instructor more than once. Keep the first row for each.
+def remove_duplicate_instructions(apps, schema_editor):
+    CourseInstruction = apps.get_model('courses', 'CourseInstruction')
+    duplicates = CourseInstruction.objects.values('course_id', 'user_id').annotate(
+        first=Min('id'), count=Count('id'),
+    ).filter(count__gt=1)
+    for row in duplicates:
+        CourseInstruction.objects.filter(
+            course_id=row['course_id'], user_id=row['user_id'],
+        ).exclude(id=row['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('courses', '0004_auto_20170115_1443'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_instructions, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='courseinstruction',
+            unique_together=set([('course', 'user')]),
+        ),
+    ]
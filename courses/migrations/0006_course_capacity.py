@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 18:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# Every existing enrolment holds a place, since there was no waiting list
+def count_enrolments(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    counts = Course.objects.annotate(count=Count('courseenrolments')).filter(count__gt=0)
+    for course in counts.values('id', 'count'):
+        Course.objects.filter(id=course['id']).update(enrolled_count=course['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0005_unique_course_instruction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrolled_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='waitlist',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='courseenrolment',
+            name='is_waitlisted',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(count_enrolments, migrations.RunPython.noop),
+    ]
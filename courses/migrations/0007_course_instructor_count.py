@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 18:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_instructors(apps, schema_editor):
+    Course = apps.get_model('courses', 'Course')
+    counts = Course.objects.annotate(count=Count('courseinstruction')).filter(count__gt=0)
+    for course in counts.values('id', 'count'):
+        Course.objects.filter(id=course['id']).update(instructor_count=course['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0006_course_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='instructor_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_instructors, migrations.RunPython.noop),
+    ]
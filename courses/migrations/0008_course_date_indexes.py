@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 19:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# Lists that may include undated courses are ordered on
+# COALESCE(datetime, UNDATED) (see CourseQuerySet.with_date_order()),
+# which the indexes on the datetime column can't serve. On PostgreSQL,
+# the same expression is indexed (the constant must stay the same as
+# courses.models.UNDATED); other databases go without.
+DATE_ORDER = "COALESCE(\"datetime\", '9999-12-31 23:59:59.999999+00'::timestamptz)"
+
+DATE_ORDER_INDEXES = [
+    ('courses_course_date_order', [DATE_ORDER, 'id']),
+    ('courses_course_region_date_order', ['region_id', DATE_ORDER, 'id']),
+    ('courses_course_certificate_date_order', ['certificate_id', DATE_ORDER, 'id']),
+]
+
+
+def create_date_order_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, columns in DATE_ORDER_INDEXES:
+        schema_editor.execute('CREATE INDEX {} ON courses_course ({})'.format(name, ', '.join(columns)))
+
+
+def drop_date_order_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, columns in DATE_ORDER_INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_course_instructor_count'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='course',
+            index_together=set([('region', 'datetime'), ('certificate', 'datetime')]),
+        ),
+        migrations.RunPython(create_date_order_indexes, drop_date_order_indexes),
+    ]
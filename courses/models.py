@@ -1,11 +1,100 @@
-from django.db import models
+import datetime
+
+from django.db import models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 from clubs.models import Region
 from qualifications.models import Certificate
 from users.models import User
 
+# The outcomes of enrolling a member on a course (see Course.enrol())
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+ALREADY_ENROLLED = 'already_enrolled'
+COURSE_FULL = 'course_full'
+
+# Courses without a date are listed after all of the dated ones. (The
+# date-ordered lists are indexed on PostgreSQL with this value written
+# out; see migration 0008.)
+UNDATED = datetime.datetime.max.replace(tzinfo=timezone.utc)
+
+
+class CourseQuerySet(models.QuerySet):
+
+    def with_serializer_data(self):
+        """
+        Join everything that CourseSerializer nests (the certificate,
+        region, creator and organizer), so that serializing the courses
+        takes a single query however many there are.
+        """
+        return self.select_related('certificate', 'region', 'creator', 'organizer')
+
+    def with_date_order(self):
+        """
+        Annotate each course with 'date_order': its datetime, or UNDATED
+        if it hasn't got one. Lists that may include undated courses are
+        ordered (and cursor-paginated) on this, since a cursor can't
+        point at a NULL.
+        """
+        return self.annotate(date_order=Coalesce(
+            'datetime', Value(UNDATED, output_field=models.DateTimeField()),
+        ))
+
+    def with_space(self):
+        """
+        Only the courses with places left (including those with no
+        limit).
+        """
+        return self.filter(
+            Q(maximum_participants__isnull=True) | Q(enrolled_count__lt=F('maximum_participants'))
+        )
+
+    def full(self):
+        """
+        Only the courses with no places left.
+        """
+        return self.filter(enrolled_count__gte=F('maximum_participants'))
+
+    def add_to_counts(self, **counts):
+        """
+        Add the given numbers (which may be negative) to the named
+        counter columns (enrolled_count, instructor_count) in the
+        database. The courses are marked as modified, so that lists
+        showing the counts are revalidated.
+        """
+        changes = {name: F(name) + count for name, count in counts.items() if count}
+        if changes:
+            self.update(last_modified=timezone.now(), **changes)
+
+
+class CourseInstructionQuerySet(models.QuerySet):
+
+    def with_serializer_data(self):
+        """
+        Join everything that CourseInstructionSerializer nests: the
+        instructor, and the course with its own nested objects.
+        """
+        return self.select_related(
+            'user',
+            'course__certificate', 'course__region', 'course__creator', 'course__organizer',
+        )
+
+
 class Course(models.Model):
 
+    class Meta:
+        # Course lists are filtered on region or certificate, and on
+        # (and ordered by) date. Lists ordered on date_order (see
+        # with_date_order()) have their own indexes, on PostgreSQL.
+        index_together = [
+            ('region', 'datetime'),
+            ('certificate', 'datetime'),
+        ]
+
+    objects = CourseQuerySet.as_manager()
+
     # What qualification does this course confer?
     certificate = models.ForeignKey(Certificate)
 
@@ -30,6 +119,19 @@ class Course(models.Model):
     # no limit
     maximum_participants = models.PositiveIntegerField(blank=True, null=True)
 
+    # Are members who sign up once the course is full put on a waiting
+    # list, rather than turned away?
+    waitlist = models.BooleanField(default=False)
+
+    # How many members hold places on the course (not counting the
+    # waiting list). This is only ever changed by adding to or taking
+    # away from the value in the database (see add_to_counts()), so that
+    # checking for room doesn't mean counting the enrolments.
+    enrolled_count = models.PositiveIntegerField(default=0, editable=False)
+
+    # How many instructors the course has, kept up to date in the same way
+    instructor_count = models.PositiveIntegerField(default=0, editable=False)
+
     # The region in which the course is being held; this may not be the
     # same as the organizer or the creator's region
     region = models.ForeignKey('clubs.Region', blank=True, null=True)
@@ -46,6 +148,143 @@ class Course(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
 
+    # Columns that are only changed through CourseQuerySet.add_to_counts()
+    COUNTER_FIELDS = ('enrolled_count', 'instructor_count')
+
+    def save(self, *args, **kwargs):
+        # An ordinary save mustn't write back stale counts over places
+        # that have been taken since this object was loaded.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super(Course, self).save(*args, **kwargs)
+
+    def lock(self):
+        """
+        Lock the course's row until the end of the current transaction,
+        and bring its capacity fields up to date from the database. Any
+        other transaction that wants to take or give back places on the
+        course waits for this one to finish.
+        """
+        capacity = Course.objects.select_for_update().values(
+            'maximum_participants', 'waitlist', 'enrolled_count',
+        ).get(pk=self.pk)
+        for name, value in capacity.items():
+            setattr(self, name, value)
+
+    def places_left(self):
+        """
+        Return the number of places left on the course, or None if it
+        has no limit.
+        """
+        if self.maximum_participants is None:
+            return None
+        return max(0, self.maximum_participants - self.enrolled_count)
+
+    def set_instructors(self, user_ids):
+        """
+        Make the users with the given IDs (and only them) the course's
+        instructors, ignoring IDs that don't belong to any user. Existing
+        instructors keep their CourseInstruction rows (and expenses).
+        The change is made atomically, with the same few queries however
+        many instructors are kept or added, and one more for each one
+        removed (to count it).
+        """
+        with transaction.atomic():
+            wanted = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+            existing = dict(CourseInstruction.objects.filter(course=self).values_list('user_id', 'id'))
+            stale = [pk for user_id, pk in existing.items() if user_id not in wanted]
+            if stale:
+                # The post_delete signal counts the removals
+                CourseInstruction.objects.filter(pk__in=stale).delete()
+            added = sorted(wanted - set(existing))
+            CourseInstruction.objects.bulk_create([
+                CourseInstruction(course=self, user_id=user_id) for user_id in added
+            ])
+            # bulk_create() doesn't send post_save, so count the new ones here
+            Course.objects.filter(pk=self.pk).add_to_counts(instructor_count=len(added))
+
+    def enrol(self, user_ids, **fields):
+        """
+        Enrol the users with the given IDs, in order, for as long as the
+        course has room, and return a dict mapping each ID to ENROLLED,
+        WAITLISTED (if the course is full and has a waiting list),
+        ALREADY_ENROLLED, or COURSE_FULL. The IDs must belong to users;
+        any other fields are set on the new enrolments.
+
+        The course is locked while we check for room, so concurrent
+        enrolments can't oversubscribe it. New enrolments are inserted
+        together, in the same transaction.
+        """
+        with transaction.atomic():
+            self.lock()
+            enrolled = set(CourseEnrolment.objects.filter(
+                course=self, user_id__in=user_ids,
+            ).values_list('user_id', flat=True))
+            room = self.places_left()
+            results = {}
+            enrolments = []
+            places = 0
+            for user_id in user_ids:
+                if user_id in results:
+                    continue
+                if user_id in enrolled:
+                    results[user_id] = ALREADY_ENROLLED
+                elif room is None or places < room:
+                    results[user_id] = ENROLLED
+                    enrolments.append(CourseEnrolment(course=self, user_id=user_id, **fields))
+                    places += 1
+                elif self.waitlist:
+                    results[user_id] = WAITLISTED
+                    enrolments.append(CourseEnrolment(course=self, user_id=user_id, is_waitlisted=True, **fields))
+                else:
+                    results[user_id] = COURSE_FULL
+            CourseEnrolment.objects.bulk_create(enrolments)
+            # bulk_create() doesn't send post_save, so count the places here
+            self.count_places(places)
+        return results
+
+    def withdraw(self, enrolment):
+        """
+        Delete one of the course's enrolments. If it held a place, the
+        place goes to the first member on the waiting list.
+        """
+        with transaction.atomic():
+            self.lock()
+            # The enrolment may have come off the waiting list since it
+            # was loaded
+            enrolment.refresh_from_db(fields=['is_waitlisted'])
+            enrolment.delete()
+            if not enrolment.is_waitlisted:
+                # The post_delete signal has given back the place
+                self.enrolled_count -= 1
+                self.fill_from_waitlist()
+
+    def fill_from_waitlist(self):
+        """
+        Give any places left on the course to members on the waiting
+        list, first come, first served. The course must be locked.
+        """
+        room = self.places_left()
+        if room == 0:
+            return
+        waiting = self.courseenrolments.filter(is_waitlisted=True).order_by('date_created', 'id')
+        if room is not None:
+            waiting = waiting[:room]
+        promoted = list(waiting.values_list('pk', flat=True))
+        if promoted:
+            CourseEnrolment.objects.filter(pk__in=promoted).update(is_waitlisted=False)
+            self.count_places(len(promoted))
+
+    def count_places(self, places):
+        """
+        Add the given number of places (which may be negative) to the
+        course's enrolled_count, in the database and on this object.
+        """
+        Course.objects.filter(pk=self.pk).add_to_counts(enrolled_count=places)
+        self.enrolled_count += places
 
 
 class CourseEnrolment(models.Model):
@@ -57,6 +296,9 @@ class CourseEnrolment(models.Model):
     # Has the member's Dive Officer checked this?
     recommended_by_dive_officer = models.BooleanField(blank=True, default=False)
 
+    # Is the member waiting for a place on a full course?
+    is_waitlisted = models.BooleanField(default=False)
+
     ############################################################################
     # Internal use
     ############################################################################
@@ -72,7 +314,12 @@ class CourseEnrolment(models.Model):
 
 
 class CourseInstruction(models.Model):
-    
+
+    class Meta:
+        unique_together = ('course', 'user')
+
+    objects = CourseInstructionQuerySet.as_manager()
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
 
@@ -84,3 +331,38 @@ class CourseInstruction(models.Model):
     ############################################################################
     date_created = models.DateTimeField(auto_now_add=True)
     last_modified = models.DateTimeField(auto_now=True)
+
+###############################################################################
+# Database signals.
+###############################################################################
+
+
+# Enrolments that are saved or deleted one at a time take or give back
+# their places here. (Course.enrol() inserts in bulk, without signals,
+# and counts its own places.)
+def take_place(sender, **kwargs):
+    enrolment = kwargs['instance']
+    if kwargs['created'] and not kwargs['raw'] and not enrolment.is_waitlisted:
+        Course.objects.filter(pk=enrolment.course_id).add_to_counts(enrolled_count=1)
+models.signals.post_save.connect(take_place, CourseEnrolment)
+
+
+def give_back_place(sender, **kwargs):
+    enrolment = kwargs['instance']
+    if not enrolment.is_waitlisted:
+        Course.objects.filter(pk=enrolment.course_id).add_to_counts(enrolled_count=-1)
+models.signals.post_delete.connect(give_back_place, CourseEnrolment)
+
+
+# Likewise, instructors who are added or removed one at a time
+# (including removals that cascade from deleting a member) are counted
+# here. Course.set_instructors() counts its own changes.
+def add_instructor(sender, **kwargs):
+    if kwargs['created'] and not kwargs['raw']:
+        Course.objects.filter(pk=kwargs['instance'].course_id).add_to_counts(instructor_count=1)
+models.signals.post_save.connect(add_instructor, CourseInstruction)
+
+
+def remove_instructor(sender, **kwargs):
+    Course.objects.filter(pk=kwargs['instance'].course_id).add_to_counts(instructor_count=-1)
+models.signals.post_delete.connect(remove_instructor, CourseInstruction)
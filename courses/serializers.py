@@ -14,6 +14,15 @@ class CourseEnrolmentSerializer(ModelSerializer):
     class Meta:
         model = CourseEnrolment
         fields = '__all__'
+        # Members come off the waiting list when places free up, not on request
+        read_only_fields = ('is_waitlisted',)
+
+class CourseEnrolmentUpdateSerializer(CourseEnrolmentSerializer):
+    class Meta(CourseEnrolmentSerializer.Meta):
+        # Moving an enrolment to another course (or member) would skip
+        # the capacity checks in Course.enrol(); places only change
+        # hands through enrol() and withdraw()
+        read_only_fields = ('course', 'is_waitlisted', 'user')
 
 class CourseSerializer(DynamicFieldsModelSerializer):
     class Meta:
@@ -26,6 +35,9 @@ class CourseSerializer(DynamicFieldsModelSerializer):
             'organizer',
             'region',
             'datetime',
+            'waitlist',
+            'enrolled_count',
+            'instructor_count',
         )
     # Course creator and course organizer are handled in the view
     # (they are set to the requesting user unless that user is an
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from qualifications.models import Certificate
+from users.models import User
+
+class CertificateListTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        Certificate.objects.create(name='Trainee Diver')
+        self.client.force_authenticate(User.objects.create_user('Normal', 'User'))
+
+    def test_certificate_list_is_cached_until_a_certificate_changes(self):
+        response = self.client.get(reverse('certificate-list'))
+        self.assertEqual(len(response.data), 1)
+        with self.assertNumQueries(0):
+            self.client.get(reverse('certificate-list'))
+        Certificate.objects.create(name='Club Diver')
+        response = self.client.get(reverse('certificate-list'))
+        self.assertEqual([c['name'] for c in response.data], ['Club Diver', 'Trainee Diver'])
+
+    def test_clients_can_revalidate_with_etag(self):
+        etag = self.client.get(reverse('certificate-list'))['ETag']
+        response = self.client.get(reverse('certificate-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,194 @@
+import threading
+from unittest import mock
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models.sql.compiler import SQLCompiler
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club
+from courses.models import Course, CourseEnrolment
+from qualifications.models import Certificate
+from users.models import User
+
+class CourseCapacityTestCase(APITestCase):
+
+    def setUp(self):
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        club = Club.objects.create(name='UCCSAC')
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.members = [User.objects.create_user('Club', 'Member', club=club) for i in range(3)]
+        self.course = Course.objects.create(
+            certificate=certificate,
+            creator=self.staff,
+            organizer=self.staff,
+            maximum_participants=2,
+        )
+        self.client.force_authenticate(self.staff)
+
+    def enrol(self, user):
+        return self.client.post(reverse('courseenrolment-list'), {'user': user.pk, 'course': self.course.pk})
+
+    def withdraw(self, user):
+        enrolment = CourseEnrolment.objects.get(course=self.course, user=user)
+        return self.client.delete(reverse('courseenrolment-detail', args=[enrolment.pk]))
+
+    def enrolled_count(self):
+        self.course.refresh_from_db()
+        return self.course.enrolled_count
+
+    def test_full_course_turns_members_away(self):
+        for member in self.members[:2]:
+            self.assertEqual(self.enrol(member).status_code, status.HTTP_201_CREATED)
+        response = self.enrol(self.members[2])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.course.courseenrolments.count(), 2)
+        self.assertEqual(self.enrolled_count(), 2)
+
+    def test_members_cannot_enrol_twice(self):
+        self.enrol(self.members[0])
+        response = self.enrol(self.members[0])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.enrolled_count(), 1)
+
+    def test_full_course_with_a_waitlist_takes_names(self):
+        self.course.waitlist = True
+        self.course.save()
+        for member in self.members:
+            self.assertEqual(self.enrol(member).status_code, status.HTTP_201_CREATED)
+        self.assertTrue(CourseEnrolment.objects.get(user=self.members[2]).is_waitlisted)
+        self.assertEqual(self.enrolled_count(), 2)
+
+    def test_withdrawal_gives_the_place_to_the_waitlist(self):
+        self.course.waitlist = True
+        self.course.save()
+        for member in self.members:
+            self.enrol(member)
+        self.assertEqual(self.withdraw(self.members[0]).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(CourseEnrolment.objects.get(user=self.members[2]).is_waitlisted)
+        self.assertEqual(self.enrolled_count(), 2)
+
+    def test_withdrawal_from_the_waitlist_keeps_the_count(self):
+        self.course.waitlist = True
+        self.course.save()
+        for member in self.members:
+            self.enrol(member)
+        self.withdraw(self.members[2])
+        self.assertEqual(self.enrolled_count(), 2)
+        self.withdraw(self.members[0])
+        self.assertEqual(self.enrolled_count(), 1)
+
+    def test_raising_the_limit_fills_places_from_the_waitlist(self):
+        self.course.waitlist = True
+        self.course.save()
+        for member in self.members:
+            self.enrol(member)
+        response = self.client.patch(reverse('course-detail', args=[self.course.pk]),
+                                     {'maximum_participants': 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(CourseEnrolment.objects.filter(is_waitlisted=True).exists())
+        self.assertEqual(self.enrolled_count(), 3)
+
+    def test_waitlist_cannot_be_skipped(self):
+        self.course.waitlist = True
+        self.course.save()
+        for member in self.members[:2]:
+            self.enrol(member)
+        self.client.post(reverse('courseenrolment-list'),
+                         {'user': self.members[2].pk, 'course': self.course.pk, 'is_waitlisted': False})
+        self.assertTrue(CourseEnrolment.objects.get(user=self.members[2]).is_waitlisted)
+
+    def test_saving_a_stale_course_keeps_the_count(self):
+        stale = Course.objects.get(pk=self.course.pk)
+        self.enrol(self.members[0])
+        stale.location = 'Cork'
+        stale.save()
+        self.assertEqual(self.enrolled_count(), 1)
+
+    def test_full_save_after_a_concurrent_enrolment_keeps_the_count(self):
+        # Another request enrols members while this one holds the course
+        stale = Course.objects.get(pk=self.course.pk)
+        Course.objects.get(pk=self.course.pk).enrol([m.pk for m in self.members[:2]])
+        stale.location = 'Cork'
+        stale.maximum_participants = 3
+        stale.save()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.location, self.course.maximum_participants), ('Cork', 3))
+        self.assertEqual(self.course.enrolled_count, 2)
+
+    def test_enrolment_and_withdrawal_lock_the_course(self):
+        # SQLite can't lock rows, so the concurrent tests below are
+        # skipped there; this checks that the lock is at least asked for
+        locked = []
+        execute_sql = SQLCompiler.execute_sql
+
+        def record_lock(compiler, *args, **kwargs):
+            if compiler.query.select_for_update:
+                locked.append(str(compiler.query))
+            return execute_sql(compiler, *args, **kwargs)
+
+        with mock.patch.object(SQLCompiler, 'execute_sql', record_lock):
+            self.course.enrol([self.members[0].pk])
+            self.course.withdraw(CourseEnrolment.objects.get(user=self.members[0]))
+        self.assertEqual(len(locked), 2)
+        for sql in locked:
+            self.assertIn('FROM "courses_course" WHERE "courses_course"."id" = {}'.format(self.course.pk), sql)
+
+    def test_deleting_a_member_gives_back_their_place(self):
+        self.enrol(self.members[0])
+        self.members[0].delete()
+        self.assertEqual(self.enrolled_count(), 0)
+
+
+# Each enrolment runs in its own thread, with its own database
+# connection, so these tests need real transactions (and a database
+# that can lock rows).
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentEnrolmentTestCase(TransactionTestCase):
+
+    def setUp(self):
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.members = [User.objects.create_user('Club', 'Member') for i in range(12)]
+        self.course = Course.objects.create(
+            certificate=certificate,
+            creator=self.staff,
+            organizer=self.staff,
+            maximum_participants=5,
+        )
+
+    def enrol_all_at_once(self):
+        barrier = threading.Barrier(len(self.members))
+        errors = []
+
+        def enrol(member):
+            try:
+                course = Course.objects.get(pk=self.course.pk)
+                barrier.wait()
+                course.enrol([member.pk])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=enrol, args=(member,)) for member in self.members]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.course.refresh_from_db()
+
+    def test_concurrent_enrolments_do_not_oversubscribe(self):
+        self.enrol_all_at_once()
+        self.assertEqual(self.course.enrolled_count, 5)
+        self.assertEqual(self.course.courseenrolments.count(), 5)
+
+    def test_concurrent_enrolments_overflow_onto_the_waitlist(self):
+        Course.objects.filter(pk=self.course.pk).update(waitlist=True)
+        self.enrol_all_at_once()
+        self.assertEqual(self.course.enrolled_count, 5)
+        self.assertEqual(self.course.courseenrolments.filter(is_waitlisted=False).count(), 5)
+        self.assertEqual(self.course.courseenrolments.filter(is_waitlisted=True).count(), 7)
@@ -0,0 +1,114 @@
+from django.core.urlresolvers import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club
+from courses.models import Course, CourseEnrolment, CourseInstruction
+from qualifications.models import Certificate
+from users.models import User
+
+class CourseCountsTestCase(APITestCase):
+
+    def setUp(self):
+        self.certificate = Certificate.objects.create(name='Trainee Diver')
+        club = Club.objects.create(name='UCCSAC')
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.members = [User.objects.create_user('Club', 'Member', club=club) for i in range(3)]
+        self.course = self.add_course()
+        self.client.force_authenticate(self.staff)
+
+    def add_course(self, **kwargs):
+        return Course.objects.create(
+            certificate=self.certificate, creator=self.staff, organizer=self.staff, **kwargs)
+
+    def counts(self, course=None):
+        course = Course.objects.get(pk=(course or self.course).pk)
+        return course.enrolled_count, course.instructor_count
+
+    def test_enrolments_are_counted(self):
+        self.course.enrol([m.pk for m in self.members[:2]])
+        CourseEnrolment.objects.create(course=self.course, user=self.members[2])
+        self.assertEqual(self.counts(), (3, 0))
+        self.course.withdraw(CourseEnrolment.objects.get(user=self.members[0]))
+        self.assertEqual(self.counts(), (2, 0))
+
+    def test_instructors_are_counted(self):
+        self.course.set_instructors([m.pk for m in self.members])
+        self.assertEqual(self.counts(), (0, 3))
+        self.course.set_instructors([self.members[0].pk])
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_instructors_added_and_removed_one_at_a_time_are_counted(self):
+        response = self.client.post(reverse('course-instruction-list', args=[self.course.pk]),
+                                    {'user': self.members[0].pk})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.counts(), (0, 1))
+        response = self.client.delete(
+            reverse('course-instruction-detail', args=[self.course.pk, response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_deleting_an_instructor_uncounts_them(self):
+        self.course.set_instructors([m.pk for m in self.members[:2]])
+        self.members[0].delete()
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_removing_instructors_counts_each_one(self):
+        self.course.set_instructors([m.pk for m in self.members])
+        with self.assertNumQueries(8):
+            # The users, the existing instructors, the stale instructors,
+            # the delete, and a count for each removal, inside a savepoint
+            self.course.set_instructors([self.members[0].pk])
+        self.assertEqual(self.counts(), (0, 1))
+
+    def test_counts_are_listed(self):
+        self.course.enrol([self.members[0].pk])
+        CourseInstruction.objects.create(course=self.course, user=self.members[1])
+        response = self.client.get(reverse('course-list'))
+        self.assertEqual(response.data[0]['enrolled_count'], 1)
+        self.assertEqual(response.data[0]['instructor_count'], 1)
+
+    def test_counts_cannot_be_set_by_clients(self):
+        response = self.client.patch(reverse('course-detail', args=[self.course.pk]),
+                                     {'enrolled_count': 10, 'instructor_count': 10}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.counts(), (0, 0))
+
+    def test_new_enrolments_change_the_list_etag(self):
+        etag = self.client.get(reverse('course-list'))['ETag']
+        self.course.enrol([self.members[0].pk])
+        response = self.client.get(reverse('course-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['enrolled_count'], 1)
+
+    def test_list_can_be_ordered_by_counts(self):
+        busy = self.add_course()
+        busy.enrol([m.pk for m in self.members])
+        quiet = self.add_course()
+        quiet.enrol([self.members[0].pk])
+        response = self.client.get(reverse('course-list'), {'ordering': '-enrolled_count'})
+        self.assertEqual([course['id'] for course in response.data], [busy.pk, quiet.pk, self.course.pk])
+        response = self.client.get(reverse('course-list'), {'ordering': 'enrolled_count', 'page_size': 2})
+        self.assertEqual([course['id'] for course in response.data['results']], [self.course.pk, quiet.pk])
+
+    def test_list_can_be_filtered_on_counts(self):
+        staffed = self.add_course()
+        staffed.set_instructors([self.members[0].pk])
+        response = self.client.get(reverse('course-list'), {'max_instructors': 0})
+        self.assertEqual([course['id'] for course in response.data], [self.course.pk])
+        response = self.client.get(reverse('course-list'), {'min_instructors': 1})
+        self.assertEqual([course['id'] for course in response.data], [staffed.pk])
+
+    def test_bad_list_parameters_are_rejected(self):
+        for params in ({'ordering': 'location'}, {'min_enrolled': 'lots'}, {'max_instructors': '-1'}):
+            response = self.client.get(reverse('course-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_counted_list_takes_a_constant_number_of_queries(self):
+        for i in range(5):
+            course = self.add_course()
+            course.enrol([m.pk for m in self.members])
+            course.set_instructors([self.members[0].pk])
+        # The validator for conditional requests, then the courses
+        with self.assertNumQueries(2):
+            self.client.get(reverse('course-list'), {'ordering': '-enrolled_count'})
@@ -1,4 +1,6 @@
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -128,3 +130,23 @@ class CourseCreateWithInstructorsTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         course = Course.objects.get(organizer=self.organizer)
         self.assertEqual(len(course.instructors.all()), 2)
+
+    def test_creating_with_many_instructors_takes_no_extra_queries(self):
+        self.client.force_authenticate(self.admin)
+        many = self.instructors + [User.objects.create_user('Another', 'Instructor') for i in range(10)]
+
+        def count_queries(instructors):
+            data = {
+                'certificate': self.certificate.id,
+                'organizer': self.organizer.id,
+                'region': self.region.id,
+                'instructors': [i.pk for i in instructors],
+            }
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(reverse('course-list'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(self.instructors[:1]), count_queries(many))
+        course = Course.objects.order_by('-id')[0]
+        self.assertEqual(course.instructors.count(), 12)
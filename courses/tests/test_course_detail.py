@@ -154,3 +154,54 @@ class CourseDetailTestCase(APITestCase):
     def test_unauthenticated_user_cannot_view_course_detail(self):
         response = self.client.get(reverse('course-detail', args=[self.course.id]))
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ConditionalCourseTestCase(APITestCase):
+
+    def setUp(self):
+        self.certificate = Certificate.objects.create(name='Trainee Diver')
+        self.user = User.objects.create_user('Course', 'Organizer')
+        self.course = Course.objects.create(
+            certificate=self.certificate,
+            creator=self.user,
+            organizer=self.user,
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_course_is_not_modified(self):
+        url = reverse('course-detail', args=[self.course.id])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_changed_course_is_sent_again(self):
+        url = reverse('course-detail', args=[self.course.id])
+        etag = self.client.get(url)['ETag']
+        self.course.maximum_participants = 10
+        self.course.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['maximum_participants'], 10)
+
+    def test_course_list_changes_when_a_course_is_added_or_deleted(self):
+        url = reverse('course-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+        course = Course.objects.create(certificate=self.certificate, creator=self.user, organizer=self.user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        course.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_not_modified_list_is_not_serialized(self):
+        url = reverse('course-list')
+        etag = self.client.get(url)['ETag']
+        # Just the aggregate query
+        with self.assertNumQueries(1):
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag)
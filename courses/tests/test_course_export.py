@@ -0,0 +1,28 @@
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Region
+from courses.models import Course
+from qualifications.models import Certificate
+from users.models import User
+from users.tests.test_export import read_csv
+
+class CourseExportTestCase(APITestCase):
+
+    def setUp(self):
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        self.south = Region.objects.create(name='South')
+        north = Region.objects.create(name='North')
+        self.organizer = User.objects.create_user('Course', 'Organizer')
+        for region in (self.south, north):
+            Course.objects.create(certificate=certificate, creator=self.organizer,
+                                  organizer=self.organizer, region=region)
+
+    def test_courses_can_be_exported_by_region(self):
+        self.client.force_authenticate(self.organizer)
+        response = self.client.get(reverse('region-course-export', args=[self.south.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = read_csv(response)
+        self.assertEqual([r['region__name'] for r in rows], ['South'])
@@ -1,9 +1,15 @@
+import datetime
+import importlib
+import re
+
 from django.core.urlresolvers import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from clubs.models import Club, Region
-from courses.models import Course, CourseEnrolment
+from courses.models import UNDATED, Course, CourseEnrolment
 from qualifications.models import Certificate
 from users.models import User
 
@@ -85,3 +91,107 @@ class RegionCourseListTestCase(APITestCase):
         response = self.client.get(reverse('region-course-list', args=[self.region.id]))
         self.assertEqual(len(response.data), 1,
                         'Regional course list shouldn\'t list courses from other regions')
+
+
+class CourseListFilterTestCase(APITestCase):
+
+    def setUp(self):
+        self.south = Region.objects.create(name='South')
+        self.north = Region.objects.create(name='North')
+        self.trainee = Certificate.objects.create(name='Trainee Diver')
+        self.club_diver = Certificate.objects.create(name='Club Diver')
+        self.organizer = User.objects.create_user('Course', 'Organizer')
+        self.other_organizer = User.objects.create_user('Other', 'Organizer')
+        self.user = User.objects.create_user('Normal', 'User')
+        now = timezone.now()
+        self.last_year = self.add_course(now - datetime.timedelta(days=365))
+        self.last_week = self.add_course(now - datetime.timedelta(days=7), certificate=self.club_diver)
+        self.next_week = self.add_course(now + datetime.timedelta(days=7), region=self.north)
+        self.next_year = self.add_course(now + datetime.timedelta(days=365), organizer=self.other_organizer)
+        self.undated = self.add_course(None)
+        self.client.force_authenticate(self.user)
+
+    def add_course(self, when, **kwargs):
+        fields = {
+            'certificate': self.trainee,
+            'creator': self.organizer,
+            'organizer': self.organizer,
+            'region': self.south,
+            'datetime': when,
+        }
+        fields.update(kwargs)
+        return Course.objects.create(**fields)
+
+    def get_ids(self, params=None, url=None):
+        response = self.client.get(url or reverse('course-list'), params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data['results'] if 'results' in response.data else response.data
+        return [course['id'] for course in data]
+
+    def test_courses_are_listed_by_date_with_undated_courses_last(self):
+        self.assertEqual(self.get_ids(), [
+            self.last_year.pk, self.last_week.pk, self.next_week.pk, self.next_year.pk, self.undated.pk,
+        ])
+        self.assertEqual(self.get_ids({'ordering': '-datetime'}), [
+            self.undated.pk, self.next_year.pk, self.next_week.pk, self.last_week.pk, self.last_year.pk,
+        ])
+
+    def test_upcoming_and_past_courses(self):
+        self.assertEqual(self.get_ids({'when': 'upcoming'}), [self.next_week.pk, self.next_year.pk])
+        self.assertEqual(self.get_ids({'when': 'past'}), [self.last_year.pk, self.last_week.pk])
+
+    def test_date_range(self):
+        today = timezone.now().date()
+        params = {
+            'after': (today - datetime.timedelta(days=30)).isoformat(),
+            'before': (timezone.now() + datetime.timedelta(days=30)).isoformat(),
+        }
+        self.assertEqual(self.get_ids(params), [self.last_week.pk, self.next_week.pk])
+
+    def test_filters_by_id(self):
+        self.assertEqual(self.get_ids({'certificate': self.club_diver.pk}), [self.last_week.pk])
+        self.assertEqual(self.get_ids({'organizer': self.other_organizer.pk}), [self.next_year.pk])
+        self.assertEqual(self.get_ids({'region': self.north.pk}), [self.next_week.pk])
+
+    def test_filters_combine_with_the_region_route(self):
+        url = reverse('region-course-list', args=[self.south.pk])
+        self.assertEqual(self.get_ids({'when': 'upcoming'}, url=url), [self.next_year.pk])
+
+    def test_has_space(self):
+        Course.objects.filter(pk=self.next_week.pk).update(maximum_participants=1)
+        self.next_week.enrol([self.user.pk])
+        Course.objects.filter(pk=self.next_year.pk).update(maximum_participants=2)
+        self.next_year.enrol([self.user.pk])
+        self.assertEqual(self.get_ids({'when': 'upcoming', 'has_space': 'true'}), [self.next_year.pk])
+        self.assertEqual(self.get_ids({'has_space': 'false'}), [self.next_week.pk])
+
+    def test_pages_follow_the_date_order(self):
+        first = self.get_ids({'page_size': 2})
+        second = self.get_ids({'page_size': 2, 'page': 2})
+        self.assertEqual(first + second, [
+            self.last_year.pk, self.last_week.pk, self.next_week.pk, self.next_year.pk,
+        ])
+
+    def test_cursors_follow_the_date_order(self):
+        ids = []
+        response = self.client.get(reverse('course-list'), {'cursor': '', 'page_size': 2})
+        while True:
+            ids.extend(course['id'] for course in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(ids, [
+            self.last_year.pk, self.last_week.pk, self.next_week.pk, self.next_year.pk, self.undated.pk,
+        ])
+
+    def test_date_order_index_matches_undated(self):
+        # The PostgreSQL index on the date order has UNDATED written out
+        migration = importlib.import_module('courses.migrations.0008_course_date_indexes')
+        undated = re.search(r"'(.*)'::timestamptz", migration.DATE_ORDER).group(1)
+        self.assertEqual(parse_datetime(undated.replace('+00', '+00:00')), UNDATED)
+
+    def test_bad_filters_are_rejected(self):
+        for params in ({'when': 'soon'}, {'after': 'yesterday'}, {'before': '2017-02-30'},
+                       {'certificate': 'scuba'}, {'has_space': 'maybe'}):
+            response = self.client.get(reverse('course-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
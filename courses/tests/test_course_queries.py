@@ -0,0 +1,79 @@
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from courses.models import Course, CourseInstruction
+from qualifications.models import Certificate
+from users.models import User
+
+class CourseQueryCountTestCase(APITestCase):
+    """
+    Serializing courses (including the nested certificate, region,
+    creator and organizer) shouldn't take more queries as the number of
+    courses grows.
+    """
+
+    def setUp(self):
+        self.region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=self.region)
+        self.certificate = Certificate.objects.create(name='Trainee Diver')
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True, club=self.club)
+        self.instructor = User.objects.create_user('Club', 'Instructor', club=self.club)
+        self.client.force_authenticate(self.staff)
+
+    def add_courses(self, count):
+        for i in range(count):
+            # A different organizer for every course, so that nothing
+            # can come from an earlier course's cached relations
+            organizer = User.objects.create_user('Course', 'Organizer', club=self.club)
+            course = Course.objects.create(
+                certificate=self.certificate,
+                creator=self.instructor,
+                organizer=organizer,
+                region=self.region,
+            )
+            CourseInstruction.objects.create(course=course, user=self.instructor)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), len(response.data)
+
+    def assertConstantQueries(self, url):
+        self.add_courses(1)
+        queries, count = self.count_queries(url)
+        self.assertEqual(count, 1)
+        self.add_courses(10)
+        self.assertEqual(self.count_queries(url), (queries, 11))
+
+    def test_course_list(self):
+        self.add_courses(10)
+        # The validator for conditional requests, then the courses
+        with self.assertNumQueries(2):
+            self.client.get(reverse('course-list'))
+
+    def test_region_course_list(self):
+        self.assertConstantQueries(reverse('region-course-list', args=[self.region.id]))
+
+    def test_course_instruction_list(self):
+        course = Course.objects.create(certificate=self.certificate, creator=self.staff, organizer=self.staff)
+        for i in range(11):
+            CourseInstruction.objects.create(
+                course=course, user=User.objects.create_user('Club', 'Instructor', club=self.club))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('course-instruction-list', args=[course.id]))
+        self.assertEqual(len(response.data), 11)
+
+    def test_courses_taught(self):
+        self.assertConstantQueries(reverse('user-courses-taught', args=[self.instructor.id]))
+
+    def test_course_detail(self):
+        self.add_courses(1)
+        course = Course.objects.get()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('course-detail', args=[course.id]))
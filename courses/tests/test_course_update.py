@@ -3,7 +3,7 @@ from rest_framework import status
 from rest_framework.test import APITestCase
 
 from clubs.models import Club, Region
-from courses.models import Course, CourseEnrolment
+from courses.models import Course, CourseEnrolment, CourseInstruction
 from qualifications.models import Certificate
 from users.models import User
 
@@ -72,6 +72,22 @@ class CourseUpdateTestCase(APITestCase):
         self.assertIn(i1, instructors)
         self.assertIn(i2, instructors)
 
+    def test_instructor_list_replaces_the_instructors(self):
+        i1 = User.objects.create_user('One', 'Instructor')
+        i2 = User.objects.create_user('Another', 'Instructor')
+        i3 = User.objects.create_user('Third', 'Instructor')
+        kept = CourseInstruction.objects.create(course=self.course, user=i1, expense_type='Fuel')
+        CourseInstruction.objects.create(course=self.course, user=i2)
+        data = {'instructors': [i1.id, i3.id, 999999]}
+        self.client.force_authenticate(self.staff)
+        response = self.client.patch(reverse('course-detail', args=[self.course.id]), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        instructions = CourseInstruction.objects.filter(course=self.course)
+        self.assertEqual(set(instructions.values_list('user_id', flat=True)), {i1.id, i3.id})
+        # Instructors who stay on keep their expenses
+        self.assertEqual(instructions.get(user=i1), kept)
+        self.assertEqual(instructions.get(user=i1).expense_type, 'Fuel')
+
     def test_do_can_change_organizer_within_club(self):
         data = {'organizer': self.member.id}
         self.client.force_authenticate(self.do)
@@ -0,0 +1,95 @@
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club
+from courses.models import Course, CourseEnrolment
+from qualifications.models import Certificate
+from users.models import User
+
+class CourseEnrolmentBulkTestCase(APITestCase):
+
+    def setUp(self):
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        self.club = Club.objects.create(name='UCCSAC')
+        self.other_club = Club.objects.create(name='CSAC')
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.do = User.objects.create_user('Dive', 'Officer', club=self.club)
+        self.do.become_dive_officer()
+        self.members = [User.objects.create_user('Club', 'Member', club=self.club) for i in range(3)]
+        self.outsider = User.objects.create_user('Other', 'Member', club=self.other_club)
+        self.course = Course.objects.create(certificate=certificate, creator=self.do, organizer=self.do)
+        self.url = reverse('course-enrolment-bulk', args=[self.course.pk])
+
+    def post(self, user_ids):
+        return self.client.post(self.url, {'users': user_ids}, format='json')
+
+    def results(self, response):
+        return {row['user']: row['result'] for row in response.data}
+
+    def test_admin_can_enrol_anyone(self):
+        self.client.force_authenticate(self.staff)
+        ids = [m.pk for m in self.members] + [self.outsider.pk]
+        response = self.post(ids)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['user'] for row in response.data], ids)
+        self.assertEqual(set(self.results(response).values()), {'enrolled'})
+        self.assertEqual(self.course.courseenrolments.count(), 4)
+
+    def test_dive_officer_can_only_enrol_their_own_members(self):
+        self.client.force_authenticate(self.do)
+        response = self.post([self.members[0].pk, self.outsider.pk, 999999])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.results(response), {
+            self.members[0].pk: 'enrolled',
+            self.outsider.pk: 'not_found',
+            999999: 'not_found',
+        })
+        self.assertFalse(CourseEnrolment.objects.filter(user=self.outsider).exists())
+
+    def test_regular_members_cannot_enrol_in_bulk(self):
+        self.client.force_authenticate(self.members[0])
+        response = self.post([self.members[0].pk])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_existing_enrolments_are_reported(self):
+        CourseEnrolment.objects.create(course=self.course, user=self.members[0])
+        self.client.force_authenticate(self.staff)
+        response = self.post([self.members[0].pk, self.members[0].pk])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'user': self.members[0].pk, 'result': 'already_enrolled'}])
+        self.assertEqual(self.course.courseenrolments.count(), 1)
+
+    def test_course_fills_up_in_order(self):
+        self.course.maximum_participants = 2
+        self.course.save()
+        CourseEnrolment.objects.create(course=self.course, user=self.outsider)
+        self.client.force_authenticate(self.staff)
+        response = self.post([m.pk for m in self.members])
+        self.assertEqual([row['result'] for row in response.data],
+                         ['enrolled', 'course_full', 'course_full'])
+        self.assertEqual(self.course.courseenrolments.count(), 2)
+
+    def test_users_must_be_a_list_of_ids(self):
+        self.client.force_authenticate(self.staff)
+        for users in (None, self.members[0].pk, ['one'], [True]):
+            response = self.post(users)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_enrolment_is_only_available_for_a_course(self):
+        self.client.force_authenticate(self.staff)
+        response = self.client.post(reverse('courseenrolment-bulk'), {'users': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_queries_do_not_grow_with_the_number_of_users(self):
+        self.client.force_authenticate(self.do)
+        # The DO's roles are loaded on the first request, and kept
+        self.post([])
+        with CaptureQueriesContext(connection) as one:
+            self.post([self.members[0].pk])
+        more = [User.objects.create_user('Club', 'Member', club=self.club) for i in range(10)]
+        with CaptureQueriesContext(connection) as many:
+            self.post([m.pk for m in self.members[1:] + more])
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
@@ -34,6 +34,17 @@ class CourseInstructionCreateTestCase(APITestCase):
       response = self.client.post(reverse('course-instruction-list', args=[self.course.id]), data)
       self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_instructor_cannot_be_added_twice(self):
+      self.client.force_authenticate(self.admin)
+      data = {
+        'course': self.course.id,
+        'user': self.i1.id
+      }
+      self.client.post(reverse('course-instruction-list', args=[self.course.id]), data)
+      response = self.client.post(reverse('course-instruction-list', args=[self.course.id]), data)
+      self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+      self.assertEqual(CourseInstruction.objects.filter(course=self.course).count(), 1)
+
     def test_organizer_can_add_instructor_from_club(self):
       self.client.force_authenticate(self.organizer)
       data = {
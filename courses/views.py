@@ -1,20 +1,46 @@
+import datetime
+from collections import OrderedDict
+
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_condition import C
 from rest_framework import status
 from rest_framework import viewsets
-from rest_framework.exceptions import MethodNotAllowed, PermissionDenied
+from rest_framework.decorators import list_route
+from rest_framework.exceptions import MethodNotAllowed, PermissionDenied, ValidationError
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from caching import CachedListMixin, ConditionalGetMixin
 from clubs.models import Region
-from courses.models import Certificate, Course, CourseEnrolment, CourseInstruction
-from courses.serializers import CertificateSerializer, CourseSerializer, CourseEnrolmentSerializer, CourseInstructionSerializer
-from mixins import PermissionClassesByActionMixin
+from courses.models import ALREADY_ENROLLED, COURSE_FULL, ENROLLED, WAITLISTED, Certificate, Course, CourseEnrolment, CourseInstruction
+from courses.serializers import CertificateSerializer, CourseSerializer, CourseEnrolmentSerializer, \
+        CourseEnrolmentUpdateSerializer, CourseInstructionSerializer
+from mixins import ExportMixin, PaginatedListMixin, PermissionClassesByActionMixin
 from permissions.permissions import IsAdminUser, IsCourseOrganizer, IsCreator, \
         IsDiveOfficer, IsSafeMethod, IsSameUser, IsUser
 from users.models import User
 
+def parse_moment(param, value):
+    # Parse a date or datetime from a query parameter; a date means
+    # midnight (in the current time zone) at the start of that day.
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is not None:
+                moment = datetime.datetime.combine(day, datetime.time())
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValidationError({param: 'Must be a date or datetime in ISO 8601 format.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
 def find_organizer_or_fall_back(user, data, current_organizer=None):
     # If the user is an admin or Dive Officer, they can
     # override the default organizer. An admin can set this to
@@ -40,7 +66,7 @@ def find_organizer_or_fall_back(user, data, current_organizer=None):
             proposed_organizer = User.objects.get(pk=data['organizer'])
             # Staff members may set any user as organizer; DOs may only set members
             # of their own club
-            if user.is_staff or proposed_organizer.club == user.club:
+            if user.is_staff or proposed_organizer.club_id == user.club_id:
                 return proposed_organizer
         except User.DoesNotExist:
             return fallback
@@ -48,9 +74,9 @@ def find_organizer_or_fall_back(user, data, current_organizer=None):
     # the fallback
     return fallback
 
-class CourseViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
+class CourseViewSet(ConditionalGetMixin, ExportMixin, PaginatedListMixin, PermissionClassesByActionMixin, viewsets.ModelViewSet):
 
-    queryset = Course.objects.all()
+    queryset = Course.objects.with_serializer_data()
     serializer_class = CourseSerializer
 
     permission_classes = (C(IsAdminUser) | C(IsSafeMethod),)
@@ -61,15 +87,101 @@ class CourseViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
         'update': [C(IsAdminUser) | C(IsDiveOfficer)],
     }
 
+    # The columns included when courses are exported as a file
+    export_fields = (
+        'id', 'certificate__name', 'datetime', 'location', 'region__name',
+        'organizer_id', 'organizer__first_name', 'organizer__last_name',
+        'maximum_participants', 'enrolled_count', 'instructor_count',
+    )
+
+    def get_export_queryset(self):
+        queryset = self.get_queryset()
+        if 'region_pk' in self.kwargs:
+            queryset = queryset.filter(region=self.kwargs['region_pk'])
+        return queryset
+
+    # Course lists can be sorted on these columns (?ordering=name, or
+    # ?ordering=-name for descending order). By default, they're in
+    # date order.
+    list_orderings = ('datetime', 'enrolled_count', 'instructor_count')
+
+    # They can be filtered on the courses' certificate, organizer, and
+    # region (by ID)...
+    id_filters = OrderedDict([
+        ('certificate', 'certificate_id'),
+        ('organizer', 'organizer_id'),
+        ('region', 'region_id'),
+    ])
+
+    # ...on the counts that are stored with each course...
+    count_filters = OrderedDict([
+        ('min_enrolled', 'enrolled_count__gte'),
+        ('max_enrolled', 'enrolled_count__lte'),
+        ('min_instructors', 'instructor_count__gte'),
+        ('max_instructors', 'instructor_count__lte'),
+    ])
+
+    # ...and on their dates: ?when=upcoming or ?when=past, or a range
+    # given by ?after= and/or ?before= (dates or datetimes in ISO 8601
+    # format). These leave out courses that haven't got a date.
+    date_filters = OrderedDict([
+        ('after', 'datetime__gte'),
+        ('before', 'datetime__lt'),
+    ])
+    list_periods = ('upcoming', 'past')
+
+    def filter_list(self, queryset, params):
+        for param, lookup in list(self.id_filters.items()) + list(self.count_filters.items()):
+            value = params.get(param)
+            if value is None:
+                continue
+            if not value.isdigit():
+                raise ValidationError({param: 'Must be a whole number.'})
+            queryset = queryset.filter(**{lookup: int(value)})
+
+        when = params.get('when')
+        if when is not None:
+            if when not in self.list_periods:
+                raise ValidationError({'when': 'Must be one of: {}'.format(', '.join(self.list_periods))})
+            lookup = 'datetime__gte' if when == 'upcoming' else 'datetime__lt'
+            queryset = queryset.filter(**{lookup: timezone.now()})
+        for param, lookup in self.date_filters.items():
+            value = params.get(param)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: parse_moment(param, value)})
+        dated = when is not None or any(param in params for param in self.date_filters)
+
+        has_space = params.get('has_space')
+        if has_space is not None:
+            if has_space not in ('true', 'false'):
+                raise ValidationError({'has_space': 'Must be true or false.'})
+            queryset = queryset.with_space() if has_space == 'true' else queryset.full()
+
+        ordering = params.get('ordering', 'datetime')
+        if ordering.lstrip('-') not in self.list_orderings:
+            raise ValidationError({'ordering': 'Must be one of: {}'.format(', '.join(self.list_orderings))})
+        # If there may be undated courses in the list, then we can't
+        # order on the (indexed) datetime column itself; see
+        # CourseQuerySet.with_date_order().
+        if ordering.lstrip('-') == 'datetime' and not dated:
+            queryset = queryset.with_date_order()
+            ordering = ordering.replace('datetime', 'date_order')
+        # Break ties by ID, so that pages are stable (and cursors
+        # follow the same ordering)
+        self.pagination_ordering = (ordering, 'id')
+        return queryset.order_by(*self.pagination_ordering)
+
     def list(self, request, region_pk=None):
         # If the request contains a region ID, then filter the
         # queryset to return only courses from that region.
-        queryset = Course.objects.all()
+        queryset = Course.objects.with_serializer_data()
         if region_pk is not None:
             queryset = queryset.filter(region=region_pk)
-        serializer = CourseSerializer(queryset, many=True)
-        return Response(serializer.data)
+        queryset = self.filter_list(queryset, request.query_params)
+        return self.paginated_response(queryset, CourseSerializer)
 
+    # The course and its instructors are saved together, or not at all
+    @transaction.atomic
     def perform_create(self, serializer):
         # The requesting user
         user = self.request.user
@@ -105,17 +217,11 @@ class CourseViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
             region=region,
         )
 
-        # Add instructors, if specified. (This is only allowed when
-        # the course is being created; otherwise it needs to be
-        # performed through the CourseInstruction nested route.)
-        # TODO: This may require us to lock the user table as well,
-        # in which case we'll need to enforce atomicity.
-        instructors = []
+        # Add instructors, if specified.
         if 'instructors' in self.request.data:
-            instructors = User.objects.filter(id__in=self.request.data['instructors'])
-        for instructor in instructors:
-            CourseInstruction.objects.create(course=instance, user=instructor)
+            instance.set_instructors(self.request.data['instructors'])
 
+    @transaction.atomic
     def perform_update(self, serializer):
         user = self.request.user
         data = self.request.data
@@ -138,35 +244,47 @@ class CourseViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
             region=region,
         )
 
+        # The instructor list replaces the course's instructors.
         # TODO: This does not modify any expense types or values
         # (but then we are not currently allowing the user to set
         # them)
         if 'instructors' in data:
-            instructors = User.objects.filter(id__in=data['instructors'])
-            for instructor in instructors:
-                CourseInstruction.objects.get_or_create(
-                    course=instance,
-                    user=instructor
-                )
+            updated_instance.set_instructors(data['instructors'])
+
+        # If the course has grown, or has just opened a waiting list,
+        # give any new places to the members who are waiting.
+        if 'maximum_participants' in data:
+            updated_instance.lock()
+            updated_instance.fill_from_waitlist()
 
-class CourseEnrolmentViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
+class CourseEnrolmentViewSet(PaginatedListMixin, PermissionClassesByActionMixin, viewsets.ModelViewSet):
 
     queryset = CourseEnrolment.objects.all()
     serializer_class = CourseEnrolmentSerializer
 
     permission_classes = [C(IsAuthenticated),]
     permission_classes_by_action = {
+        'bulk': [C(IsAdminUser) | C(IsDiveOfficer)],
         'create': [C(IsAdminUser) | C(IsDiveOfficer) | C(IsSameUser)],
         'destroy': [C(IsAdminUser) | C(IsDiveOfficer) | C(IsUser)],
     }
 
+    # The result reported for a user who doesn't exist, or whom the
+    # requesting user may not enrol
+    NOT_FOUND = 'not_found'
+
+    def get_serializer_class(self):
+        if self.action in ('update', 'partial_update'):
+            return CourseEnrolmentUpdateSerializer
+        return CourseEnrolmentSerializer
+
     def get_queryset(self):
         queryset = CourseEnrolment.objects.all()
         user = self.request.user
         if user.is_staff:
             return queryset
         if user.is_dive_officer():
-            return queryset.filter(user__club=user.club)
+            return queryset.filter(user__club_id=user.club_id)
         return queryset.filter(user=user)
 
     def create(self, request):
@@ -179,7 +297,7 @@ class CourseEnrolmentViewSet(PermissionClassesByActionMixin, viewsets.ModelViewS
 
         # DOs can create an enrolment for members of their club
         if user.is_dive_officer():
-            queryset = User.objects.filter(club=user.club)
+            queryset = User.objects.filter(club_id=user.club_id)
             target_user = get_object_or_404(queryset, pk=request.data['user'])
             return super(CourseEnrolmentViewSet, self).create(request)
 
@@ -189,6 +307,25 @@ class CourseEnrolmentViewSet(PermissionClassesByActionMixin, viewsets.ModelViewS
             return super(CourseEnrolmentViewSet, self).create(request)
         raise PermissionDenied
 
+    # Enrolments go through Course.enrol(), which checks (with the course
+    # locked) that there's room, and puts the member on the waiting list
+    # if there isn't.
+    def perform_create(self, serializer):
+        fields = dict(serializer.validated_data)
+        course = fields.pop('course')
+        target_user = fields.pop('user')
+        result = course.enrol([target_user.pk], **fields)[target_user.pk]
+        if result == ALREADY_ENROLLED:
+            raise ValidationError({'user': 'This user is already enrolled on this course.'})
+        if result == COURSE_FULL:
+            raise ValidationError({'course': 'This course is full.'})
+        serializer.instance = course.courseenrolments.get(user=target_user)
+
+    # Withdrawing from a course gives the place to the next member on the
+    # waiting list
+    def perform_destroy(self, instance):
+        instance.course.withdraw(instance)
+
     def list(self, request, course_pk=None):
         # Bare lists are not allowed; clients must make nested requests
         if course_pk is None:
@@ -197,13 +334,48 @@ class CourseEnrolmentViewSet(PermissionClassesByActionMixin, viewsets.ModelViewS
         # Otherwise, filter on the course PK and return the results
         course = get_object_or_404(Course, pk=course_pk)
         queryset = self.get_queryset().filter(course=course)
-        serializer = CourseEnrolmentSerializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(queryset, CourseEnrolmentSerializer)
+
+    # Enrol a list of members at once: POST {"users": [1, 2, 3]} to
+    # /courses/{id}/enrolments/bulk/. Admins can enrol anyone, and DOs
+    # can enrol members of their own club. The response gives a result
+    # for each user: enrolled, waitlisted, already_enrolled, course_full,
+    # or not_found (for users who don't exist or can't be enrolled by the
+    # requesting user).
+    @list_route(methods=['post'])
+    def bulk(self, request, course_pk=None):
+        """
+        Enrol a list of users on the course.
+        """
+        # Like lists, bulk enrolment is only available on nested routes
+        if course_pk is None:
+            raise MethodNotAllowed(self.action)
+        course = get_object_or_404(Course, pk=course_pk)
+
+        user_ids = request.data.get('users')
+        if not isinstance(user_ids, list) or \
+                not all(isinstance(i, int) and not isinstance(i, bool) for i in user_ids):
+            raise ValidationError({'users': 'Must be a list of user IDs.'})
+
+        # Find the users we're allowed to enrol, in one query
+        user = request.user
+        candidates = User.objects.filter(pk__in=user_ids)
+        if not user.is_staff:
+            candidates = candidates.filter(club_id=user.club_id)
+        found = set(candidates.values_list('pk', flat=True))
+
+        results = course.enrol([i for i in user_ids if i in found])
+        ordered = list(OrderedDict.fromkeys(user_ids))
+        created = {ENROLLED, WAITLISTED} & set(results.values())
+        response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        return Response([
+            {'user': i, 'result': results.get(i, self.NOT_FOUND)} for i in ordered
+        ], status=response_status)
 
 
-class CourseInstructionViewSet(PermissionClassesByActionMixin, viewsets.ModelViewSet):
+class CourseInstructionViewSet(PaginatedListMixin, PermissionClassesByActionMixin, viewsets.ModelViewSet):
 
-    queryset = CourseInstruction.objects.all()
+    queryset = CourseInstruction.objects.with_serializer_data()
     # Admins, DOs, and course organizers can view the instructor lists for
     # courses
     permission_classes = [
@@ -212,20 +384,19 @@ class CourseInstructionViewSet(PermissionClassesByActionMixin, viewsets.ModelVie
     serializer_class = CourseInstructionSerializer
 
     def get_queryset(self):
-        queryset = CourseInstruction.objects.all()
+        queryset = CourseInstruction.objects.with_serializer_data()
         user = self.request.user
         if user.is_staff:
             return queryset
         if user.is_dive_officer():
-            return queryset.filter(user__club=user.club)
+            return queryset.filter(user__club_id=user.club_id)
         return queryset.filter(user=user)
 
     def list(self, request, course_pk=None):
         if course_pk is None:
             raise MethodNotAllowed(self.action)
         queryset = self.get_queryset().filter(course__pk=course_pk)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.paginated_response(queryset, self.get_serializer_class())
 
 
     def create(self, request, course_pk=None):
@@ -236,6 +407,8 @@ class CourseInstructionViewSet(PermissionClassesByActionMixin, viewsets.ModelVie
         user = get_object_or_404(User, pk=request.data.get('user', None))
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        if CourseInstruction.objects.filter(course=course, user=user).exists():
+            raise ValidationError({'user': 'This user is already an instructor on this course.'})
         serializer.save(
             course=course,
             user=user
@@ -244,7 +417,9 @@ class CourseInstructionViewSet(PermissionClassesByActionMixin, viewsets.ModelVie
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class CertificateViewSet(viewsets.ModelViewSet):
+# Certificates rarely change, and every client needs the list, so it's
+# served from the cache.
+class CertificateViewSet(CachedListMixin, viewsets.ModelViewSet):
 
     queryset = Certificate.objects.all()
     serializer_class = CertificateSerializer
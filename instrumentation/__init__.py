@@ -0,0 +1 @@
+from .instrumentation import InstrumentationMiddleware, fingerprint
@@ -0,0 +1,146 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('sincserver.requests')
+slow_logger = logging.getLogger('sincserver.requests.slow')
+
+# How many repeated query fingerprints are included in each log line
+MAX_DUPLICATES_LOGGED = 5
+
+# Literals in SQL: quoted strings, then numbers that aren't part of an
+# identifier (so that "U0"."id" and T3 are left alone)
+SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+SQL_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+SQL_IN_LIST = re.compile(r'\bIN \((?:\?, )*\?\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Reduce a query to its shape, by replacing literal values with '?' (and
+    IN lists with a single '(...)'), so that the same query run with
+    different parameters -- the signature of an N+1 problem -- can be
+    recognized.
+    """
+    sql = SQL_STRING.sub('?', sql)
+    sql = SQL_NUMBER.sub('?', sql)
+    sql = SQL_IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def describe_role(user):
+    """
+    A short label for the kind of user making a request, for grouping
+    log lines. This only looks at what the request has already loaded:
+    the role checks cache the user's committee positions and regions on
+    the instance, and if the request never asked for them, the user is
+    just 'authenticated'.
+    """
+    if user is None or not user.is_authenticated:
+        return 'anonymous'
+    if user.is_admin():
+        return 'admin'
+    regions = getattr(user, '_region_cache', None)
+    roles = getattr(user, '_role_cache', None)
+    if regions:
+        return 'regional-dive-officer'
+    if roles and user.is_dive_officer():
+        return 'dive-officer'
+    if roles:
+        return 'committee'
+    if regions is not None or roles is not None:
+        return 'member'
+    return 'authenticated'
+
+
+class InstrumentationMiddleware(object):
+    """
+    Record each request's wall time, database time and query count, and
+    the queries it repeated. These are added to the response as a
+    Server-Timing header and logged, as a JSON object, to the
+    'sincserver.requests' logger. Requests that take longer than
+    REQUEST_INSTRUMENTATION_SLOW_MS are sampled (at the rate given by
+    REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE) and logged with the
+    fingerprint of each query to 'sincserver.requests.slow'. Only
+    fingerprints are logged, never the SQL itself, whose literal values
+    include token keys and password hashes.
+
+    This is opt-in: it does nothing unless REQUEST_INSTRUMENTATION is
+    True. Queries are recorded the same way as in DEBUG mode, which costs
+    a little time and memory per query. The body of a streaming response
+    is produced after the middleware has returned, so its queries aren't
+    counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_INSTRUMENTATION_SLOW_MS', 500)
+        self.slow_sample_rate = getattr(settings, 'REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE', 1.0)
+
+    def __call__(self, request):
+        request._instrumentation_view = None
+        # Record queries even when DEBUG is off, as CaptureQueriesContext
+        # does, and pick out the ones run during this request
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        start = len(connection.queries_log)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            queries = list(connection.queries_log)[start:]
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+
+        db_ms = sum(float(query['time']) for query in queries) * 1000
+        duplicates = Counter(fingerprint(query['sql']) for query in queries)
+        duplicates = [(sql, count) for sql, count in duplicates.most_common() if count > 1]
+
+        response['Server-Timing'] = ', '.join([
+            'total;dur={:.1f}'.format(elapsed_ms),
+            'db;dur={:.1f};desc="{} queries"'.format(db_ms, len(queries)),
+            'app;dur={:.1f}'.format(max(0, elapsed_ms - db_ms)),
+        ])
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'view': None,
+            'action': None,
+            'role': describe_role(getattr(request, 'user', None)),
+            'total_ms': round(elapsed_ms, 1),
+            'db_ms': round(db_ms, 1),
+            'queries': len(queries),
+            'duplicate_queries': sum(count - 1 for sql, count in duplicates),
+            'duplicates': [{'sql': sql, 'count': count} for sql, count in duplicates[:MAX_DUPLICATES_LOGGED]],
+        }
+        if request._instrumentation_view:
+            record['view'], record['action'] = request._instrumentation_view
+        logger.info(json.dumps(record, sort_keys=True))
+
+        if elapsed_ms >= self.slow_ms and random.random() < self.slow_sample_rate:
+            record['sql'] = [{'sql': fingerprint(query['sql']), 'time': query['time']} for query in queries]
+            slow_logger.warning(json.dumps(record, sort_keys=True))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # DRF viewsets keep their class and their method-to-action
+        # mapping on the view function that the router generates
+        cls = getattr(view_func, 'cls', None)
+        if cls is not None:
+            name = '{}.{}'.format(cls.__module__, cls.__name__)
+        else:
+            name = '{}.{}'.format(view_func.__module__, getattr(view_func, '__name__', type(view_func).__name__))
+        actions = getattr(view_func, 'actions', None) or {}
+        request._instrumentation_view = (name, actions.get(request.method.lower()))
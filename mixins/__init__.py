@@ -1 +1 @@
-from .mixins import PermissionClassesByActionMixin
+from .mixins import ExportMixin, PaginatedListMixin, PermissionClassesByActionMixin
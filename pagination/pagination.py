@@ -0,0 +1,85 @@
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.settings import api_settings
+
+# If PAGE_SIZE isn't set in the REST_FRAMEWORK settings, use this.
+DEFAULT_PAGE_SIZE = 50
+
+# The largest page that a client may ask for.
+MAX_PAGE_SIZE = 500
+
+# The ordering used if a view doesn't declare one. Orderings used for
+# pagination must be on a unique (or nearly unique), indexed column.
+DEFAULT_ORDERING = ('id',)
+
+
+def get_pagination_ordering(view):
+    ordering = getattr(view, 'pagination_ordering', DEFAULT_ORDERING)
+    if isinstance(ordering, str):
+        return (ordering,)
+    return tuple(ordering)
+
+
+class PageNumberModePagination(PageNumberPagination):
+    """
+    Classic page-number pagination (?page=3&page_size=20).
+    """
+    page_size = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Slicing an unordered queryset gives inconsistent pages, so
+        # fall back to the view's pagination ordering
+        if not queryset.ordered:
+            queryset = queryset.order_by(*get_pagination_ordering(view))
+        return super(PageNumberModePagination, self).paginate_queryset(queryset, request, view)
+
+
+class CursorModePagination(CursorPagination):
+    """
+    Keyset pagination (?cursor=...). Pages are fetched with a WHERE clause
+    on the ordering column rather than an OFFSET, so the cost of fetching
+    a page doesn't grow with its position in the list.
+    """
+    page_size = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        return get_pagination_ordering(view)
+
+    # CursorPagination doesn't let the client choose a page size, so
+    # borrow PageNumberPagination's implementation.
+    def get_page_size(self, request):
+        return PageNumberPagination.get_page_size(self, request)
+
+
+class OptionalPagination(BasePagination):
+    """
+    Pagination is opt-in: if the request has a 'cursor' parameter (which
+    may be empty, to request the first page), then the response is
+    cursor-paginated; if it has a 'page' or 'page_size' parameter, then
+    it's page-number-paginated; otherwise, the full list is returned,
+    exactly as it would be without pagination.
+
+    Views can set 'pagination_ordering' to choose the ordering used for
+    cursors (and for page numbers, if the queryset isn't already ordered).
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if 'cursor' in params:
+            self.paginator = CursorModePagination()
+        elif 'page' in params or 'page_size' in params:
+            self.paginator = PageNumberModePagination()
+        else:
+            return None
+        page = self.paginator.paginate_queryset(queryset, request, view)
+        self.display_page_controls = getattr(self.paginator, 'display_page_controls', False)
+        return page
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
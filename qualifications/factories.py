@@ -0,0 +1,19 @@
+import factory
+from factory.django import DjangoModelFactory
+
+from qualifications.models import Certificate, Qualification
+
+class CertificateFactory(DjangoModelFactory):
+    class Meta:
+        model = Certificate
+
+    name = factory.Sequence(lambda n: 'Certificate {}'.format(n))
+
+
+class QualificationFactory(DjangoModelFactory):
+    class Meta:
+        model = Qualification
+
+    certificate = factory.SubFactory(CertificateFactory)
+    user = factory.SubFactory('users.factories.UserFactory')
+    date_granted = factory.Faker('date_object')
@@ -3,6 +3,8 @@ from django.utils import timezone
 
 from django.db import models
 
+from caching import cache_list_until_changed
+
 class Certificate(models.Model):
 
     class Meta:
@@ -15,15 +17,32 @@ class Certificate(models.Model):
     # members?
     is_instructor_certificate = models.BooleanField(default=False)
 
+    # When was the record last modified?
+    last_modified = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return self.name
 
 
+class QualificationQuerySet(models.QuerySet):
+
+    def with_serializer_data(self):
+        """
+        Join everything that QualificationSerializer nests (the
+        certificate, and the member with their club and its region), and
+        prefetch the club's members, so that serializing the
+        qualifications takes two queries however many there are.
+        """
+        return self.select_related('certificate', 'user__club__region').prefetch_related('user__club__users')
+
+
 class Qualification(models.Model):
     """
     Intermediate model for the granting of certificates
     """
 
+    objects = QualificationQuerySet.as_manager()
+
     # Which certificate?
     certificate = models.ForeignKey('Certificate', on_delete=models.CASCADE)
 
@@ -40,3 +59,8 @@ class Qualification(models.Model):
     def __str__(self):
         d = self.date_granted.strftime('%d/%m/%Y') if self.date_granted else 'undated'
         return '{}: {} ({})'.format(self.user, self.certificate, d)
+
+
+# The certificate list is served from the cache (see CertificateViewSet),
+# so throw it away whenever a certificate changes.
+cache_list_until_changed(Certificate)
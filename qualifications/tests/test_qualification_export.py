@@ -0,0 +1,27 @@
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club
+from qualifications.models import Certificate
+from users.models import User
+from users.tests.test_export import read_csv
+
+class QualificationExportTestCase(APITestCase):
+
+    def setUp(self):
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        club = Club.objects.create(name='UCCSAC')
+        self.user = User.objects.create_user('Club', 'Member', club=club)
+        self.user.receive_certificate(certificate)
+        self.other_user = User.objects.create_user('Other', 'User')
+        self.other_user.receive_certificate(certificate)
+
+    def test_users_can_only_export_their_own_qualifications(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('qualification-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = read_csv(response)
+        self.assertEqual([r['user_id'] for r in rows], [str(self.user.id)])
+        self.assertEqual(rows[0]['certificate__name'], 'Trainee Diver')
@@ -1,3 +1,5 @@
+import datetime
+
 from django.core.urlresolvers import reverse
 
 from rest_framework import status
@@ -86,3 +88,70 @@ class QualificationListTestCase(APITestCase):
         response = self.client.get(reverse('qualification-list'))
         data = response.data
         self.assertEqual(len(data), 2)
+
+
+class QualificationListPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('Staff', 'Member', is_staff=True)
+        certificate = Certificate.objects.create(name='Trainee Diver')
+        # Qualifications aren't necessarily granted in the order they're
+        # recorded
+        for days in (3, 0, 5, 1, 1):
+            user = User.objects.create_user('Club', 'Member')
+            Qualification.objects.create(
+                user=user, certificate=certificate,
+                date_granted=datetime.date(2017, 1, 1) - datetime.timedelta(days=days),
+            )
+        self.client.force_authenticate(self.admin)
+
+    def test_cursor_pagination_runs_newest_first(self):
+        response = self.client.get(reverse('qualification-list'), {'cursor': '', 'page_size': 3})
+        first_page = [q['id'] for q in response.data['results']]
+        response = self.client.get(response.data['next'])
+        second_page = [q['id'] for q in response.data['results']]
+        self.assertIsNone(response.data['next'])
+        expected = [q['id'] for q in self.client.get(reverse('qualification-list')).data]
+        self.assertEqual(first_page + second_page, expected)
+        by_date = Qualification.objects.order_by('-date_granted', '-id')
+        self.assertEqual(expected, list(by_date.values_list('id', flat=True)))
+
+
+class ConditionalQualificationListTestCase(APITestCase):
+
+    def setUp(self):
+        self.cert = Certificate.objects.create(name='Trainee Diver')
+        self.member = User.objects.create_user('Club', 'Member')
+        self.other = User.objects.create_user('Other', 'Member')
+        self.member.receive_certificate(self.cert)
+        self.client.force_authenticate(self.member)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.client.get(reverse('qualification-list'))['ETag']
+        response = self.client.get(reverse('qualification-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_users_qualifications_do_not_change_the_validator(self):
+        etag = self.client.get(reverse('qualification-list'))['ETag']
+        self.other.receive_certificate(self.cert)
+        response = self.client.get(reverse('qualification-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_new_qualification_changes_the_validator(self):
+        etag = self.client.get(reverse('qualification-list'))['ETag']
+        self.member.receive_certificate(Certificate.objects.create(name='Club Diver'))
+        response = self.client.get(reverse('qualification-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_pages_have_their_own_validators(self):
+        first = self.client.get(reverse('qualification-list'), {'page': 1})['ETag']
+        second = self.client.get(reverse('qualification-list'), {'page': 1, 'page_size': 1})['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_qualification_detail_is_conditional(self):
+        qualification = self.member.qualifications.get()
+        url = reverse('qualification-detail', args=[qualification.id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
@@ -5,12 +5,14 @@ from rest_framework import status, viewsets
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
+from caching import ConditionalGetMixin
+from mixins import ExportMixin, PaginatedListMixin
 from permissions.permissions import IsAdminUser, IsDiveOfficer, IsSafeMethod, IsUser
 from users.models import User
 from .models import Certificate, Qualification
 from .serializers import QualificationSerializer, QualificationWriteSerializer
 
-class QualificationViewSet(viewsets.ModelViewSet):
+class QualificationViewSet(ConditionalGetMixin, ExportMixin, PaginatedListMixin, viewsets.ModelViewSet):
 
     # Users must be authenticated, and only admins can make changes
     permission_classes = [
@@ -20,6 +22,15 @@ class QualificationViewSet(viewsets.ModelViewSet):
     queryset = Qualification.objects.all()
     serializer_class = QualificationSerializer
 
+    # Cursor pagination runs newest-first, like the unpaginated list
+    pagination_ordering = ('-date_granted', '-id')
+
+    # The columns included when qualifications are exported as a file
+    export_fields = (
+        'id', 'user_id', 'user__first_name', 'user__last_name', 'user__club__name',
+        'certificate__name', 'date_granted',
+    )
+
     # We want clients to be able to send flat data, e.g.:
     # {'user': 1, 'certificate': 10}
     # while receiving nested data, so we'll use two different serializers.
@@ -38,15 +49,23 @@ class QualificationViewSet(viewsets.ModelViewSet):
         if user.is_staff:
             return queryset
         if user.is_dive_officer():
-            return queryset.filter(user__club=user.club)
+            return queryset.filter(user__club_id=user.club_id)
         return queryset.filter(user=user)
 
+    # get_queryset() already limits qualifications to those the user may
+    # see, so a nested export only has to narrow it to one member.
+    def get_export_queryset(self):
+        queryset = self.get_queryset()
+        if 'user_pk' in self.kwargs:
+            queryset = queryset.filter(user=self.kwargs['user_pk'])
+        return queryset
+
     def list(self, request, user_pk=None):
-        qualifications = self.get_queryset()
+        qualifications = self.get_queryset().with_serializer_data()
         user = self.request.user
         if not user.is_staff:
             if user.is_dive_officer():
-                qualifications = qualifications.filter(user__club=user.club)
+                qualifications = qualifications.filter(user__club_id=user.club_id)
             else:
                 qualifications = qualifications.filter(user=user)
         if user_pk is not None:
@@ -61,6 +80,5 @@ class QualificationViewSet(viewsets.ModelViewSet):
             else:
                 raise Http404
 
-        qualifications = qualifications.order_by('-date_granted')
-        serializer = QualificationSerializer(qualifications, many=True)
-        return Response(serializer.data)
+        qualifications = qualifications.order_by('-date_granted', '-id')
+        return self.paginated_response(qualifications, QualificationSerializer)
@@ -61,6 +61,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'instrumentation.InstrumentationMiddleware', # Per-request timing (opt-in; see below)
     'corsheaders.middleware.CorsMiddleware', # CORS middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -146,14 +147,79 @@ AUTH_USER_MODEL = 'users.User'
 
 # Django REST Framework settings
 REST_FRAMEWORK = {
-    # Token-based authentication only
+    # Token-based authentication only: either DRF's database tokens
+    # (with resolved tokens cached) or expiring, signed tokens (see
+    # authentication/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'authentication.CachedTokenAuthentication',
+        'authentication.SignedTokenAuthentication',
     ],
     # Nothing is available to anonymous users
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # List responses are paginated only if the client asks for it, with
+    # either ?page=N or ?cursor=... (see pagination/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'pagination.OptionalPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Caching. By default, each process keeps its own cache in memory; set
+# CACHE_BACKEND and CACHE_LOCATION in .env to share a cache (e.g.,
+# memcached) between processes.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# How long (in seconds) the region and certificate lists are cached
+REFERENCE_DATA_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_DATA_CACHE_TIMEOUT', 300))
+
+# Authentication tokens are resolved to users with a database query,
+# and the result is remembered in each process for up to
+# AUTH_TOKEN_CACHE_TIMEOUT seconds (for at most AUTH_TOKEN_CACHE_SIZE
+# tokens). Set AUTH_TOKEN_CACHE_SHARED to share resolved tokens through
+# the default cache instead. Signed tokens (which can be revoked) are
+# never checked against the per-process cache, so that revoking them
+# takes effect in every process straight away. The cost is that, unless
+# AUTH_TOKEN_CACHE_SHARED is set (with a CACHE_BACKEND that processes
+# share), each request with a signed token makes a query for the user.
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 1000))
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', 60))
+AUTH_TOKEN_CACHE_SHARED = os.environ.get('AUTH_TOKEN_CACHE_SHARED', 'False') == 'True'
+
+# How long (in seconds) a signed token from /auth/token/ is valid for.
+# Clients can exchange a valid token for a new one at /auth/token/refresh/.
+SIGNED_TOKEN_LIFETIME = int(os.environ.get('SIGNED_TOKEN_LIFETIME', 24 * 60 * 60))
+
+# Per-request instrumentation (see instrumentation/instrumentation.py).
+# If REQUEST_INSTRUMENTATION is True, every response gets a Server-Timing
+# header, and a line with the request's timings and query counts is
+# logged to 'sincserver.requests'. A sample of requests slower than
+# REQUEST_INSTRUMENTATION_SLOW_MS milliseconds is logged with the shape of
+# each of its queries (with the values taken out) to
+# 'sincserver.requests.slow'.
+REQUEST_INSTRUMENTATION = os.environ.get('REQUEST_INSTRUMENTATION', 'False') == 'True'
+REQUEST_INSTRUMENTATION_SLOW_MS = int(os.environ.get('REQUEST_INSTRUMENTATION_SLOW_MS', 500))
+REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE = float(os.environ.get('REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE', 1.0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'sincserver.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 # CORS configuration setting: do we allow all, or whitelist?
@@ -0,0 +1,111 @@
+from django.core.urlresolvers import RegexURLResolver, get_resolver, reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# The fixture sizes at which every route is measured
+FIXTURE_SIZES = (1, 10, 100)
+
+# The budget for a route that the requesting user may not use. It's
+# still requested, and must be refused (with 403 Forbidden or 404 Not
+# Found), but the number of queries isn't checked.
+FORBIDDEN = 'forbidden'
+
+# The budget for a route that doesn't answer GET requests at all (a list
+# that's only served under a nested route, say). It isn't requested.
+NOT_GETTABLE = 'not gettable'
+
+
+def api_routes(patterns=None):
+    """
+    Yield (name, view class, URL keyword arguments) for every route that
+    the REST framework routers register in sincserver/urls.py and that
+    has a GET method.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, RegexURLResolver):
+            for route in api_routes(pattern.url_patterns):
+                yield route
+            continue
+        cls = getattr(pattern.callback, 'cls', None)
+        # Skip the format-suffix duplicates of each route
+        if cls is None or 'format' in pattern.regex.groupindex:
+            continue
+        if getattr(cls, 'queryset', None) is None:
+            continue
+        # Routes for POST-only actions (such as bulk enrolment) can't be
+        # measured with a GET
+        if 'get' not in getattr(pattern.callback, 'actions', {}):
+            continue
+        yield pattern.name, cls, sorted(pattern.regex.groupindex)
+
+
+def count_queries(client, url):
+    """
+    Make a GET request and return the response and the number of
+    database queries that it took.
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+        # Streaming responses (exports) only query the database as
+        # they're read
+        if response.streaming:
+            b''.join(response.streaming_content)
+    return response, len(context.captured_queries)
+
+
+class QueryBudgetMixin(object):
+    """
+    Checks that a route takes no more than a declared number of queries,
+    however many rows it returns.
+
+    Test cases using this define grow_fixture(size), which adds rows
+    until there are 'size' of each kind, and route_kwargs(view class,
+    URL argument names), which returns arguments for reverse(). Then
+    assertQueryBudgets(budgets), where budgets maps route names to the
+    largest number of queries that each may take, requests every route
+    at each of FIXTURE_SIZES, and fails if any route goes over budget,
+    takes more queries with more rows, has no budget at all, or doesn't
+    succeed (or, for FORBIDDEN routes, isn't refused).
+    """
+
+    def grow_fixture(self, size):
+        raise NotImplementedError
+
+    def route_kwargs(self, view_class, arg_names):
+        raise NotImplementedError
+
+    def measure_routes(self, routes, budgets):
+        counts = {}
+        for size in FIXTURE_SIZES:
+            self.grow_fixture(size)
+            for name, cls, arg_names in routes:
+                url = reverse(name, kwargs=self.route_kwargs(cls, arg_names))
+                response, queries = count_queries(self.client, url)
+                if budgets[name] is FORBIDDEN:
+                    self.assertIn(response.status_code, (403, 404),
+                                  '{} wasn\'t refused with {} rows'.format(url, size))
+                else:
+                    self.assertTrue(200 <= response.status_code < 300,
+                                    '{} failed ({}) with {} rows'.format(url, response.status_code, size))
+                counts.setdefault(name, []).append(queries)
+        return counts
+
+    def assertQueryBudgets(self, budgets, routes=None):
+        if routes is None:
+            routes = list(api_routes())
+        missing = sorted(name for name, cls, arg_names in routes if name not in budgets)
+        self.assertFalse(missing, 'No query budget declared for: {}'.format(', '.join(missing)))
+        routes = [route for route in routes if budgets[route[0]] is not NOT_GETTABLE]
+
+        failures = []
+        for name, counts in sorted(self.measure_routes(routes, budgets).items()):
+            sizes = ', '.join('{} with {} rows'.format(c, s) for c, s in zip(counts, FIXTURE_SIZES))
+            if budgets[name] is FORBIDDEN:
+                continue
+            if max(counts) > budgets[name]:
+                failures.append('{} is over its budget of {} queries ({})'.format(name, budgets[name], sizes))
+            elif counts[-1] > counts[0]:
+                failures.append('{} takes more queries as it returns more rows ({})'.format(name, sizes))
+        self.assertFalse(failures, '\n'.join(failures))
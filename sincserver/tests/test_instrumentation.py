@@ -0,0 +1,117 @@
+import json
+
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from instrumentation import InstrumentationMiddleware, fingerprint
+from instrumentation.instrumentation import describe_role
+from users.models import User
+
+@override_settings(REQUEST_INSTRUMENTATION=True, REQUEST_INSTRUMENTATION_SLOW_MS=0,
+                   REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE=1.0)
+class InstrumentationMiddlewareTestCase(APITestCase):
+
+    def setUp(self):
+        self.region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=self.region)
+        self.admin = User.objects.create_user('Staff', 'Member', club=self.club, is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def get(self, url):
+        with self.assertLogs('sincserver.requests', 'INFO') as logs:
+            response = self.client.get(url)
+        records = [json.loads(record.getMessage()) for record in logs.records]
+        return response, records
+
+    def test_response_has_server_timing(self):
+        response, records = self.get(reverse('club-list'))
+        timing = response['Server-Timing']
+        self.assertIn('total;dur=', timing)
+        self.assertIn('db;dur=', timing)
+        self.assertIn('queries"', timing)
+
+    def test_request_is_logged(self):
+        response, records = self.get(reverse('club-detail', args=[self.club.pk]))
+        record = records[0]
+        self.assertEqual(record['method'], 'GET')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['view'], 'clubs.views.ClubViewSet')
+        self.assertEqual(record['action'], 'retrieve')
+        self.assertEqual(record['role'], 'admin')
+        self.assertGreater(record['queries'], 0)
+        self.assertIn('"{} queries"'.format(record['queries']), response['Server-Timing'])
+
+    def test_slow_requests_are_logged_with_their_sql(self):
+        response, records = self.get(reverse('club-list'))
+        # With a threshold of 0ms, every request is slow
+        self.assertEqual(len(records), 2)
+        self.assertEqual(len(records[1]['sql']), records[1]['queries'])
+
+    def test_slow_requests_are_logged_without_values(self):
+        token = Token.objects.create(user=self.admin)
+        self.client.force_authenticate(None)
+        with self.assertLogs('sincserver.requests', 'INFO') as logs:
+            self.client.get(reverse('club-list'), HTTP_AUTHORIZATION='Token ' + token.key)
+            self.client.post(reverse('user-list'), {'first_name': 'New', 'last_name': 'Member'},
+                             HTTP_AUTHORIZATION='Token ' + token.key)
+        output = ' '.join(record.getMessage() for record in logs.records)
+        self.assertNotIn(token.key, output)
+        self.assertNotIn(self.admin.password, output)
+        self.assertNotIn('New', output)
+
+    def test_role_is_described_without_more_queries(self):
+        member = User.objects.get(pk=User.objects.create_user('Club', 'Member', club=self.club).pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(describe_role(member), 'authenticated')
+        member.is_dive_officer()
+        member.is_regional_dive_officer()
+        with self.assertNumQueries(0):
+            self.assertEqual(describe_role(member), 'member')
+
+    @override_settings(REQUEST_INSTRUMENTATION_SLOW_SAMPLE_RATE=0)
+    def test_slow_requests_can_be_left_unsampled(self):
+        response, records = self.get(reverse('club-list'))
+        self.assertEqual(len(records), 1)
+        self.assertNotIn('sql', records[0])
+
+    def test_repeated_queries_are_reported(self):
+        def view(request):
+            for user in User.objects.all():
+                Club.objects.get(pk=user.club_id)
+            return HttpResponse()
+        for i in range(2):
+            User.objects.create_user('Member', str(i), club=self.club)
+        middleware = InstrumentationMiddleware(view)
+        with self.assertLogs('sincserver.requests', 'INFO') as logs:
+            middleware(RequestFactory().get('/'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['queries'], 4)
+        self.assertEqual(record['duplicate_queries'], 2)
+        self.assertEqual(record['duplicates'][0]['count'], 3)
+        self.assertIn('"clubs_club"', record['duplicates'][0]['sql'])
+
+    @override_settings(REQUEST_INSTRUMENTATION=False)
+    def test_middleware_is_off_by_default(self):
+        response = self.client.get(reverse('club-list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class FingerprintTestCase(APITestCase):
+
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            fingerprint('SELECT "users_user"."id" FROM "users_user" WHERE "users_user"."id" = 42'),
+            'SELECT "users_user"."id" FROM "users_user" WHERE "users_user"."id" = ?',
+        )
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE name = 'O''Brien' AND x IN (1, 2, 3)"),
+            'SELECT * FROM t WHERE name = ? AND x IN (...)',
+        )
+
+    def test_identifiers_with_numbers_are_kept(self):
+        self.assertEqual(fingerprint('SELECT U0."id" FROM t U0 WHERE T3."x" = 1'),
+                         'SELECT U0."id" FROM t U0 WHERE T3."x" = ?')
@@ -0,0 +1,188 @@
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from courses.models import Course, CourseEnrolment, CourseInstruction
+from qualifications.models import Certificate, Qualification
+from sincserver.tests.shared import FORBIDDEN, NOT_GETTABLE, QueryBudgetMixin
+from users.models import User
+
+# The most queries each route may take when requested by an admin. Every
+# route registered in sincserver/urls.py with a GET method needs an
+# entry here.
+QUERY_BUDGETS = {
+    'certificate-detail': 1,
+    'certificate-list': 2,
+    'club-detail': 5,
+    'club-list': 3,
+    'club-qualifications': 4,
+    'club-users-courses-organized': 2,
+    'club-users-courses-taught': 2,
+    'club-users-current-membership-status': 1,
+    'club-users-detail': 6,
+    'club-users-export': 1,
+    'club-users-list': 1,
+    'club-users-me': 2,
+    'course-detail': 1,
+    'course-enrolment-detail': 1,
+    'course-enrolment-list': 2,
+    'course-export': 1,
+    'course-instruction-detail': 1,
+    'course-instruction-list': 1,
+    'course-list': 2,
+    'courseenrolment-detail': 1,
+    # Enrolments are only listed under a course
+    'courseenrolment-list': NOT_GETTABLE,
+    'qualification-detail': 6,
+    'qualification-export': 1,
+    'qualification-list': 3,
+    'region-active-instructors': 4,
+    'region-club-detail': 4,
+    'region-club-list': 3,
+    'region-club-qualifications': 4,
+    'region-course-detail': 1,
+    'region-course-export': 1,
+    'region-course-list': 2,
+    'region-detail': 1,
+    'region-dive-officers': 2,
+    'region-list': 2,
+    'region-user-courses-organized': 2,
+    'region-user-courses-taught': 2,
+    'region-user-current-membership-status': 1,
+    'region-user-detail': 6,
+    'region-user-export': 1,
+    'region-user-list': 1,
+    'region-user-me': 2,
+    'user-course-instruction-detail': 1,
+    'user-course-instruction-list': 2,
+    'user-courses-organized': 2,
+    'user-courses-organized-detail': 1,
+    'user-courses-organized-export': 1,
+    'user-courses-organized-list': 2,
+    'user-courses-taught': 2,
+    'user-current-membership-status': 1,
+    'user-detail': 6,
+    'user-export': 1,
+    'user-list': 1,
+    'user-me': 2,
+    'user-qualification-detail': 6,
+    'user-qualification-export': 1,
+    'user-qualification-list': 4,
+}
+
+# Dive Officers (who see their own club's members) and regular members
+# (who see themselves) get querysets of their own, so their requests
+# are measured too. Where these differ from an admin's, it's because of
+# the role checks, or because the route refuses the user.
+DIVE_OFFICER_QUERY_BUDGETS = dict(QUERY_BUDGETS)
+DIVE_OFFICER_QUERY_BUDGETS.update({
+    'club-detail': 4,
+    'club-users-me': 3,
+    'region-user-me': 3,
+    'user-list': 2,
+    'user-me': 3,
+})
+
+MEMBER_QUERY_BUDGETS = dict(QUERY_BUDGETS)
+MEMBER_QUERY_BUDGETS.update({
+    'club-detail': 2,
+    'club-list': FORBIDDEN,
+    'club-qualifications': FORBIDDEN,
+    'club-users-detail': FORBIDDEN,
+    'club-users-export': FORBIDDEN,
+    'club-users-list': FORBIDDEN,
+    'club-users-me': 3,
+    'course-instruction-detail': FORBIDDEN,
+    'region-active-instructors': FORBIDDEN,
+    'region-club-detail': 2,
+    'region-club-list': FORBIDDEN,
+    'region-club-qualifications': FORBIDDEN,
+    'region-dive-officers': FORBIDDEN,
+    'region-user-detail': FORBIDDEN,
+    'region-user-export': FORBIDDEN,
+    'region-user-list': FORBIDDEN,
+    'region-user-me': 3,
+    'user-course-instruction-detail': FORBIDDEN,
+    'user-detail': FORBIDDEN,
+    'user-export': FORBIDDEN,
+    'user-list': FORBIDDEN,
+    'user-me': 3,
+})
+
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    """
+    Request every API route with 1, 10 and 100 members, qualifications,
+    courses and enrolments in a single region and club, and check that
+    each stays within its query budget, as an admin, as a Dive Officer,
+    and as a regular member.
+    """
+
+    def setUp(self):
+        self.region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=self.region)
+        self.certificate = Certificate.objects.create(name='Trainee Diver')
+        self.instructor_certificate = Certificate.objects.create(name='Instructor', is_instructor_certificate=True)
+        self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.members = []
+        self.courses = []
+        self.grow_fixture(1)
+        # A member of the club who holds no office; they're enrolled on
+        # the first course
+        self.member = User.objects.create_user('Regular', 'Member', club=self.club)
+        self.member.receive_certificate(self.certificate)
+        CourseEnrolment.objects.create(course=self.courses[0], user=self.member)
+        # The member whose details are requested
+        self.subject = self.members[0]
+
+    # Every member is a Dive Officer and an instructor, so that the
+    # lists of both grow with the fixture.
+    def grow_fixture(self, size):
+        while len(self.members) < size:
+            member = User.objects.create_user('Club', 'Member', club=self.club)
+            member.become_dive_officer()
+            member.receive_certificate(self.certificate)
+            member.receive_certificate(self.instructor_certificate)
+            self.members.append(member)
+        while len(self.courses) < size:
+            course = Course.objects.create(
+                certificate=self.certificate,
+                creator=self.members[0],
+                organizer=self.members[0],
+                region=self.region,
+            )
+            CourseInstruction.objects.create(course=course, user=self.members[0])
+            CourseEnrolment.objects.create(course=course, user=self.members[len(self.courses)])
+            self.courses.append(course)
+
+    def route_kwargs(self, view_class, arg_names):
+        course = self.courses[0]
+        objects = {
+            'user_pk': self.subject.pk,
+            'club_pk': self.club.pk,
+            'region_pk': self.region.pk,
+            'course_pk': course.pk,
+        }
+        # 'pk' is the ID of whatever the route's viewset deals in
+        objects['pk'] = {
+            Certificate: self.certificate,
+            Club: self.club,
+            Course: course,
+            CourseEnrolment: course.courseenrolments.get(user=self.subject),
+            CourseInstruction: course.courseinstruction_set.first(),
+            Qualification: self.subject.qualifications.first(),
+            Region: self.region,
+            User: self.subject,
+        }[view_class.queryset.model].pk
+        return {name: objects[name] for name in arg_names}
+
+    def test_routes_are_within_query_budgets(self):
+        self.client.force_authenticate(self.staff)
+        self.assertQueryBudgets(QUERY_BUDGETS)
+
+    def test_routes_are_within_dive_officer_query_budgets(self):
+        self.client.force_authenticate(self.members[0])
+        self.assertQueryBudgets(DIVE_OFFICER_QUERY_BUDGETS)
+
+    def test_routes_are_within_member_query_budgets(self):
+        self.subject = self.member
+        self.client.force_authenticate(self.member)
+        self.assertQueryBudgets(MEMBER_QUERY_BUDGETS)
@@ -19,6 +19,8 @@ from rest_framework import routers
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework_nested import routers as nested_routers
 
+from authentication.views import obtain_signed_token, refresh_signed_token, revoke_signed_tokens
+
 from qualifications.views import QualificationViewSet
 from clubs.views import ClubViewSet, RegionViewSet
 from courses.views import CertificateViewSet, CourseViewSet, CourseEnrolmentViewSet, CourseInstructionViewSet
@@ -56,6 +58,9 @@ urlpatterns = [
     url(r'^admin/', admin.site.urls),
     #url(r'^auth/', include('rest_framework.urls', namespace='rest_framework')),
     url(r'^auth/login/', obtain_auth_token), # Respond to username/password pairs with auth tokens
+    url(r'^auth/token/$', obtain_signed_token, name='signed-token'), # ... or with expiring, signed tokens
+    url(r'^auth/token/refresh/$', refresh_signed_token, name='signed-token-refresh'),
+    url(r'^auth/token/revoke/$', revoke_signed_tokens, name='signed-token-revoke'),
     url(r'^', include(router.urls)), # All other URLs are passed to the default router
     url(r'^', include(users_router.urls)),
     url(r'^', include(clubs_router.urls)),
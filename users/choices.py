@@ -39,3 +39,8 @@ MEMBERSHIP_CHOICES = (
 # fitness to dive, etc.) and represent it using this value.
 STATUS_CURRENT = 'Current'
 STATUS_LAPSED = 'Lapsed'
+
+STATUS_CHOICES = (
+    (STATUS_CURRENT, _('Current')),
+    (STATUS_LAPSED, _('Lapsed')),
+)
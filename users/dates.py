@@ -0,0 +1,69 @@
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+from django.utils import timezone
+
+# The CFT year is named after the calendar year in which it ends. It runs
+# from the 1st of October of the year before to the 31st of December, so
+# from October onwards two CFT years overlap: members are still covered
+# by this year's membership while renewing for next year's.
+OCTOBER = 10
+DECEMBER = 12
+
+CFTYear = namedtuple('CFTYear', ['year', 'start', 'end'])
+
+
+def cft_year(year):
+    """
+    Return the CFT year that ends in the given calendar year.
+    """
+    return CFTYear(year, date(year - 1, OCTOBER, 1), date(year, DECEMBER, 31))
+
+
+# Where a given day falls in the CFT calendar
+CFTCalendar = namedtuple('CFTCalendar', [
+    # The day itself
+    'day',
+    # The CFT year that ended most recently
+    'last_year',
+    # The CFT year whose membership is in force on this day (the one
+    # ending this calendar year)
+    'this_year',
+    # The CFT year after that
+    'next_year',
+    # Whether next year's CFT year has begun (i.e., members can renew)
+    'renewals_open',
+])
+
+
+# Due dates are worked out for every member in a list, so the calendar
+# for each day is only computed once. Days are keys, so the answer
+# changes at midnight however long the process lives.
+@lru_cache(maxsize=16)
+def calendar_for(day):
+    """
+    Return the CFTCalendar for the given date.
+    """
+    next_year = cft_year(day.year + 1)
+    return CFTCalendar(
+        day=day,
+        last_year=cft_year(day.year - 1),
+        this_year=cft_year(day.year),
+        next_year=next_year,
+        renewals_open=day >= next_year.start,
+    )
+
+
+def today():
+    """
+    Return today's date in the current time zone.
+    """
+    return timezone.localtime(timezone.now()).date()
+
+
+def current_calendar():
+    """
+    Return the CFTCalendar for today.
+    """
+    return calendar_for(today())
@@ -0,0 +1,28 @@
+import factory
+from factory.django import DjangoModelFactory
+
+from clubs.factories import ClubFactory
+from users import choices
+from users.models import User
+
+class UserFactory(DjangoModelFactory):
+    """
+    Members with plausible personal details. Users built with build() or
+    build_batch() can be saved in bulk with User.objects.bulk_create_users().
+    """
+    class Meta:
+        model = User
+
+    first_name = factory.Faker('first_name')
+    last_name = factory.Faker('last_name')
+    email = factory.Faker('email')
+    phone_mobile = factory.Faker('phone_number')
+    date_of_birth = factory.Faker('date_object')
+    gender = factory.Iterator([value for value, label in choices.GENDER_CHOICES])
+    club = factory.SubFactory(ClubFactory)
+
+    # Usernames are assigned from IDs when the user is saved (see
+    # users/models.py), so they go through the manager.
+    @classmethod
+    def _create(cls, model_class, *args, **kwargs):
+        return model_class.objects.create_user(*args, **kwargs)
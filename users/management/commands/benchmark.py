@@ -0,0 +1,324 @@
+import bisect
+import itertools
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+
+import django
+import factory
+from django.core.management.base import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models import Count
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import urlquote
+from rest_framework.test import APIClient
+
+from clubs.factories import ClubFactory, RegionFactory
+from clubs.models import Club, CommitteePosition
+from clubs.roles import DIVE_OFFICER
+from courses.factories import CourseFactory
+from courses.models import Course, CourseEnrolment, CourseInstruction
+from qualifications.factories import CertificateFactory, QualificationFactory
+from qualifications.models import Qualification
+from users.factories import UserFactory
+from users.management.commands.import_members import batches
+from users.models import User
+
+BATCH_SIZE = 1000
+
+# The certificates in the synthetic federation, and whether each is an
+# instructor certificate
+CERTIFICATES = (
+    ('Trainee Diver', False),
+    ('Club Diver', False),
+    ('Dive Leader', False),
+    ('Advanced Diver', False),
+    ('Club Instructor', True),
+    ('Regional Instructor', True),
+)
+
+# The proportion of members who hold an instructor certificate
+INSTRUCTOR_FRACTION = 0.05
+
+
+def percentile(values, p):
+    """
+    The p-th percentile of a sorted list, by the nearest-rank method.
+    """
+    return values[max(0, int(math.ceil(p / 100 * len(values))) - 1)]
+
+
+def weighted_choices(rng, population, weights, k):
+    """
+    k choices from population, with replacement, in proportion to weights.
+    (random.choices() does this, but only from Python 3.6.)
+    """
+    cumulative = list(itertools.accumulate(weights))
+    last = len(population) - 1
+    return [population[min(last, bisect.bisect(cumulative, rng.random() * cumulative[-1]))]
+            for i in range(k)]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic federation (regions, clubs, members, '
+        'qualifications, courses and enrolments) in a fresh test database, '
+        'then time the main API routes, reporting p50/p95/p99 latency, '
+        'queries per request and bytes per response. Use --output to save '
+        'the results as JSON, and --compare to compare them with a '
+        'previous run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', type=int, default=4)
+        parser.add_argument('--clubs', type=int, default=100)
+        parser.add_argument('--users', type=int, default=50000)
+        parser.add_argument('--courses', type=int, default=1000)
+        parser.add_argument('--enrolments-per-course', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=20,
+                            help='Timed requests per route (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untimed requests per route before timing starts (default: 2)')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed, so that runs are repeatable (default: 0)')
+        parser.add_argument('--routes', nargs='+', metavar='ROUTE',
+                            help='Only time these routes (by the names printed in the report)')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', help='Compare the results with this JSON file from an earlier run')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        self.options = options
+        self.verbosity = options['verbosity']
+        self.random = random.Random(options['seed'])
+        factory.Faker._get_faker().seed(options['seed'])
+
+        # Work in a throwaway database, exactly as the tests do
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            fixture = self.seed()
+            routes = self.run_routes()
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        results = {
+            'meta': {
+                'revision': git_revision(),
+                'timestamp': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'seed': options['seed'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'fixture': fixture,
+            'routes': routes,
+        }
+        self.report(routes)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.compare(json.load(f)['routes'], routes)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.log('Wrote results to {}'.format(options['output']), level=1)
+
+    def log(self, message, level=2):
+        if self.verbosity >= level:
+            self.stdout.write(message)
+
+    ###########################################################################
+    # Synthetic data
+    ###########################################################################
+
+    def seed(self):
+        started = time.time()
+        options = self.options
+        regions = RegionFactory.create_batch(options['regions'])
+        clubs = ClubFactory.build_batch(options['clubs'])
+        for club in clubs:
+            club.region = self.random.choice(regions)
+        Club.objects.bulk_create(clubs)
+        certificates = [CertificateFactory(name=name, is_instructor_certificate=is_instructor)
+                        for name, is_instructor in CERTIFICATES]
+        self.log('Created regions, clubs and certificates')
+
+        # Members are spread unevenly between clubs, as they are in
+        # real life
+        weights = [self.random.paretovariate(1.5) for club in clubs]
+        users = []
+        for size in self.batch_sizes(options['users']):
+            batch = [UserFactory.build(club=club)
+                     for club in weighted_choices(self.random, clubs, weights, size)]
+            users.extend(User.objects.bulk_create_users(batch))
+            self.log('Created {} members'.format(len(users)))
+        if not users:
+            raise CommandError('--users must be at least 1')
+
+        # Each club's first member is its Dive Officer
+        dive_officers = {}
+        for user in users:
+            dive_officers.setdefault(user.club_id, user)
+        CommitteePosition.objects.bulk_create([
+            CommitteePosition(user=user, club_id=club_id, role=DIVE_OFFICER)
+            for club_id, user in dive_officers.items()
+        ])
+
+        ordinary = [c for c in certificates if not c.is_instructor_certificate]
+        instructor_certificates = [c for c in certificates if c.is_instructor_certificate]
+        instructors = []
+        qualification_count = 0
+        for batch in batches(users, BATCH_SIZE):
+            qualifications = []
+            for user in batch:
+                held = self.random.sample(ordinary, self.random.randint(1, len(ordinary)))
+                if self.random.random() < INSTRUCTOR_FRACTION:
+                    held.append(self.random.choice(instructor_certificates))
+                    instructors.append(user)
+                qualifications.extend(QualificationFactory.build(user=user, certificate=c) for c in held)
+            Qualification.objects.bulk_create(qualifications)
+            qualification_count += len(qualifications)
+        self.log('Created {} qualifications'.format(qualification_count))
+        instructors = instructors or users[:1]
+
+        courses = []
+        # Every course is given the same number of students below
+        students_per_course = min(len(users), options['enrolments_per_course'])
+        for size in self.batch_sizes(options['courses']):
+            batch = []
+            for organizer in [self.random.choice(instructors) for i in range(size)]:
+                batch.append(CourseFactory.build(
+                    certificate=self.random.choice(ordinary),
+                    creator=organizer,
+                    organizer=organizer,
+                    region_id=organizer.club.region_id,
+                    enrolled_count=students_per_course,
+                    instructor_count=1,
+                ))
+            Course.objects.bulk_create(batch)
+        # Not every database returns IDs from bulk_create()
+        course_ids = list(Course.objects.values_list('pk', flat=True))
+        enrolment_count = 0
+        for batch in batches(course_ids, BATCH_SIZE):
+            instructions = []
+            enrolments = []
+            for course_id in batch:
+                instructions.append(CourseInstruction(course_id=course_id, user=self.random.choice(instructors)))
+                students = self.random.sample(users, students_per_course)
+                enrolments.extend(CourseEnrolment(course_id=course_id, user=user) for user in students)
+            CourseInstruction.objects.bulk_create(instructions)
+            CourseEnrolment.objects.bulk_create(enrolments)
+            enrolment_count += len(enrolments)
+        self.log('Created {} courses and {} enrolments'.format(len(course_ids), enrolment_count))
+
+        self.log('Seeded the database in {:.1f}s'.format(time.time() - started), level=1)
+        return {
+            'regions': len(regions),
+            'clubs': len(clubs),
+            'users': len(users),
+            'qualifications': qualification_count,
+            'courses': len(course_ids),
+            'enrolments': enrolment_count,
+        }
+
+    def batch_sizes(self, total):
+        for start in range(0, total, BATCH_SIZE):
+            yield min(BATCH_SIZE, total - start)
+
+    ###########################################################################
+    # Timing
+    ###########################################################################
+
+    def get_routes(self):
+        # The busiest club, and its region, stand in for the worst case
+        club = Club.objects.annotate(member_count=Count('users')).order_by('-member_count')[0]
+        surname = User.objects.filter(club=club).values_list('last_name', flat=True)[0]
+        return [
+            ('users', reverse('user-list')),
+            ('users-page', reverse('user-list') + '?page=1'),
+            ('users-search', reverse('user-list') + '?name=' + urlquote(surname[:3])),
+            ('club-qualifications', reverse('club-qualifications', args=[club.pk])),
+            ('region-active-instructors', reverse('region-active-instructors', args=[club.region_id])),
+            ('courses', reverse('course-list')),
+        ]
+
+    def run_routes(self):
+        admin = User.objects.create_user('Benchmark', 'Admin', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        routes = self.get_routes()
+        if self.options['routes']:
+            unknown = set(self.options['routes']) - set(name for name, url in routes)
+            if unknown:
+                raise CommandError('Unknown routes: {}'.format(', '.join(sorted(unknown))))
+            routes = [(name, url) for name, url in routes if name in self.options['routes']]
+
+        results = {}
+        for name, url in routes:
+            for i in range(self.options['warmup']):
+                client.get(url)
+            timings = []
+            queries = []
+            sizes = []
+            for i in range(self.options['requests']):
+                with CaptureQueriesContext(connection) as context:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = time.perf_counter() - started
+                if response.status_code != 200:
+                    raise CommandError('{} returned {}'.format(url, response.status_code))
+                timings.append(elapsed * 1000)
+                queries.append(len(context.captured_queries))
+                sizes.append(len(response.content))
+            timings.sort()
+            results[name] = {
+                'url': url,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'p99_ms': round(percentile(timings, 99), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'queries': max(queries),
+                'bytes': max(sizes),
+            }
+            self.log('Timed {}'.format(name))
+        return results
+
+    ###########################################################################
+    # Reporting
+    ###########################################################################
+
+    def report(self, routes):
+        self.stdout.write('{:<28}{:>10}{:>10}{:>10}{:>9}{:>12}'.format(
+            'route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'bytes'))
+        for name, r in sorted(routes.items()):
+            self.stdout.write('{:<28}{:>10.1f}{:>10.1f}{:>10.1f}{:>9}{:>12}'.format(
+                name, r['p50_ms'], r['p95_ms'], r['p99_ms'], r['queries'], r['bytes']))
+
+    def compare(self, before, after):
+        self.stdout.write('')
+        self.stdout.write('{:<28}{:>10}{:>10}{:>10}{:>9}'.format('change', 'p50', 'p95', 'p99', 'queries'))
+        for name in sorted(set(before) & set(after)):
+            changes = ['{:+.0%}'.format(after[name][key] / before[name][key] - 1) if before[name][key] else 'n/a'
+                       for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+            queries = after[name]['queries'] - before[name]['queries']
+            self.stdout.write('{:<28}{:>10}{:>10}{:>10}{:>+9}'.format(name, *(changes + [queries])))
@@ -0,0 +1,330 @@
+import csv
+import datetime
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from caching import invalidate_cached_list
+from clubs.models import Club, Region
+from qualifications.models import Certificate, Qualification
+from users import choices
+from users.models import User
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Member columns that are copied straight into the User model
+MEMBER_TEXT_FIELDS = (
+    'first_name', 'last_name', 'email',
+    'phone_home', 'phone_mobile',
+    'next_of_kin_name', 'next_of_kin_phone',
+)
+
+# Member columns that take one of a fixed set of choices; values can be
+# given either as the stored integer or as the human-readable label
+MEMBER_CHOICE_FIELDS = (
+    ('gender', choices.GENDER_CHOICES),
+    ('title', choices.TITLE_CHOICES),
+    ('membership_type', choices.MEMBERSHIP_CHOICES),
+)
+
+# Club columns that are copied straight into the Club model
+CLUB_TEXT_FIELDS = (
+    'description', 'contact_name', 'contact_email', 'contact_phone',
+    'location', 'training_times',
+)
+
+
+def read_rows(path):
+    """
+    Yield each row of a CSV file (with a header row) or a JSON Lines file
+    (if the filename ends in '.jsonl') as a (line number, dict) pair,
+    without reading the whole file into memory.
+    """
+    if path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+    else:
+        with open(path, encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+
+def batches(iterable, size):
+    """
+    Split an iterable into lists of at most 'size' items.
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# Treat empty CSV cells as missing values
+def value(row, key):
+    v = row.get(key)
+    if v is None or (isinstance(v, str) and not v.strip()):
+        return None
+    return v.strip() if isinstance(v, str) else v
+
+
+def choice_value(choice_list, v):
+    if v is None:
+        return None
+    for stored, label in choice_list:
+        if str(v) == str(stored) or str(v).lower() == str(label).lower():
+            return stored
+    raise ValueError('{!r} is not one of {}'.format(v, [label for stored, label in choice_list]))
+
+
+# parse_date() returns None for text that isn't a date at all, but
+# raises ValueError for dates that don't exist (like 2017-02-30); both
+# come out of here as a ValueError
+def date_value(v):
+    if v is None:
+        return None
+    try:
+        d = parse_date(v)
+    except ValueError:
+        d = None
+    if d is None:
+        raise ValueError('{!r} is not a date'.format(v))
+    return d
+
+
+def datetime_value(v):
+    if v is None:
+        return None
+    try:
+        parsed = parse_datetime(v)
+    except ValueError:
+        raise ValueError('{!r} is not a date'.format(v))
+    if parsed is None:
+        parsed = datetime.datetime.combine(date_value(v), datetime.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Import regions, clubs, members, and qualifications from CSV or '
+        'JSON Lines exports (for example, from COMS). Regions, clubs and '
+        'certificates are matched by name; qualifications refer to members '
+        'by CFT number.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--regions', help='Regions file (columns: name)')
+        parser.add_argument('--clubs', help='Clubs file (columns: name, region, ...)')
+        parser.add_argument('--members', help='Members file (columns: id, first_name, last_name, club, ...)')
+        parser.add_argument('--qualifications',
+                            help='Qualifications file (columns: user, certificate, date_granted, ...)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Number of rows written per transaction (default: {})'.format(DEFAULT_BATCH_SIZE))
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        if self.batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # In-memory lookup tables, so that we never have to query for a
+        # region, club, or certificate by name while importing
+        self.regions = {r.name: r for r in Region.objects.all()}
+        self.clubs = {c.name: c for c in Club.objects.all()}
+        self.certificates = {c.name: c for c in Certificate.objects.all()}
+
+        started = time.time()
+        if options['regions']:
+            self.import_regions(options['regions'])
+        if options['clubs']:
+            self.import_clubs(options['clubs'])
+        if options['members']:
+            self.import_members(options['members'])
+        if options['qualifications']:
+            self.import_qualifications(options['qualifications'])
+        self.log('Finished in {:.1f}s'.format(time.time() - started), level=1)
+
+    def log(self, message, level=2):
+        if self.verbosity >= level:
+            self.stdout.write(message)
+
+    def fail(self, path, line, message):
+        raise CommandError('{} (line {}): {}'.format(path, line, message))
+
+    ###########################################################################
+    # Regions, clubs, and certificates
+    ###########################################################################
+
+    # Create any regions we haven't seen before. Regions have
+    # database-assigned IDs, so we reload the lookup table afterwards.
+    def ensure_regions(self, names):
+        new = [Region(name=name) for name in set(names) if name not in self.regions]
+        if new:
+            Region.objects.bulk_create(new)
+            # bulk_create() doesn't send signals, so clear the cached
+            # region list ourselves
+            invalidate_cached_list(Region)
+            self.regions = {r.name: r for r in Region.objects.all()}
+
+    def ensure_certificates(self, names):
+        new = [Certificate(name=name) for name in set(names) if name not in self.certificates]
+        if new:
+            Certificate.objects.bulk_create(new)
+            invalidate_cached_list(Certificate)
+            self.certificates = {c.name: c for c in Certificate.objects.all()}
+
+    def import_regions(self, path):
+        names = [value(row, 'name') for line, row in read_rows(path)]
+        with transaction.atomic():
+            self.ensure_regions([name for name in names if name])
+        self.log('Imported regions from {}'.format(path), level=1)
+
+    def import_clubs(self, path):
+        count = 0
+        for batch in batches(read_rows(path), self.batch_size):
+            with transaction.atomic():
+                self.ensure_regions([value(row, 'region') for line, row in batch if value(row, 'region')])
+                new_clubs = []
+                for line, row in batch:
+                    name = value(row, 'name')
+                    if not name:
+                        self.fail(path, line, 'clubs must have a name')
+                    if name in self.clubs:
+                        continue
+                    region_name = value(row, 'region')
+                    try:
+                        foundation_date = date_value(value(row, 'foundation_date'))
+                    except ValueError as e:
+                        self.fail(path, line, e)
+                    club = Club(
+                        name=name,
+                        region=self.regions[region_name] if region_name else None,
+                        foundation_date=foundation_date,
+                        **{field: value(row, field) for field in CLUB_TEXT_FIELDS}
+                    )
+                    # Club IDs are UUIDs generated in Python, so the new
+                    # club can go straight into the lookup table
+                    self.clubs[name] = club
+                    new_clubs.append(club)
+                Club.objects.bulk_create(new_clubs)
+            count += len(new_clubs)
+            self.log('Imported {} clubs'.format(count))
+        self.log('Imported {} clubs from {}'.format(count, path), level=1)
+
+    ###########################################################################
+    # Members
+    ###########################################################################
+
+    def build_member(self, path, line, row):
+        club_name = value(row, 'club')
+        if club_name is not None and club_name not in self.clubs:
+            self.fail(path, line, 'unknown club {!r}'.format(club_name))
+        if not (value(row, 'first_name') and value(row, 'last_name')):
+            self.fail(path, line, 'members must have a first and last name')
+        try:
+            user = User(
+                id=int(value(row, 'id')) if value(row, 'id') else None,
+                club=self.clubs[club_name] if club_name else None,
+                date_of_birth=date_value(value(row, 'date_of_birth')),
+                **{field: value(row, field) or '' for field in MEMBER_TEXT_FIELDS}
+            )
+            for field, choice_list in MEMBER_CHOICE_FIELDS:
+                v = choice_value(choice_list, value(row, field))
+                if v is not None:
+                    setattr(user, field, v)
+            if value(row, 'member_since'):
+                user.member_since = datetime_value(value(row, 'member_since'))
+        except ValueError as e:
+            self.fail(path, line, e)
+        return user
+
+    def import_members(self, path):
+        # Members are identified by their CFT number (i.e., their ID), so
+        # we can skip any that have already been imported
+        existing_ids = set(User.objects.values_list('id', flat=True))
+        count = 0
+        for batch in batches(read_rows(path), self.batch_size):
+            users = []
+            for line, row in batch:
+                user = self.build_member(path, line, row)
+                if user.id is not None:
+                    if user.id in existing_ids:
+                        continue
+                    existing_ids.add(user.id)
+                users.append(user)
+            # Inserting explicit IDs doesn't advance PostgreSQL's ID
+            # sequence, so members with IDs go in first, and the sequence
+            # is brought up to date before any member without one (in this
+            # batch or a later one) is given an ID that's already taken
+            numbered = [user for user in users if user.id is not None]
+            unnumbered = [user for user in users if user.id is None]
+            with transaction.atomic():
+                if numbered:
+                    User.objects.bulk_create_users(numbered)
+                    self.reset_sequences(User)
+                if unnumbered:
+                    User.objects.bulk_create_users(unnumbered)
+            count += len(users)
+            self.log('Imported {} members'.format(count))
+        self.log('Imported {} members from {}'.format(count, path), level=1)
+
+    def reset_sequences(self, *models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    ###########################################################################
+    # Qualifications
+    ###########################################################################
+
+    # A member holds each certificate once, so qualifications that have
+    # already been imported (or appear twice in the file) are skipped
+    def import_qualifications(self, path):
+        user_ids = set(User.objects.values_list('id', flat=True))
+        existing = set(Qualification.objects.values_list('user_id', 'certificate_id'))
+        count = 0
+        for batch in batches(read_rows(path), self.batch_size):
+            qualifications = []
+            with transaction.atomic():
+                self.ensure_certificates([value(row, 'certificate') for line, row in batch
+                                          if value(row, 'certificate')])
+                for line, row in batch:
+                    certificate_name = value(row, 'certificate')
+                    if not certificate_name:
+                        self.fail(path, line, 'qualifications must have a certificate')
+                    try:
+                        user_id = int(value(row, 'user'))
+                    except (TypeError, ValueError):
+                        self.fail(path, line, 'invalid CFT number {!r}'.format(value(row, 'user')))
+                    if user_id not in user_ids:
+                        self.fail(path, line, 'unknown member {}'.format(user_id))
+                    certificate = self.certificates[certificate_name]
+                    if (user_id, certificate.pk) in existing:
+                        continue
+                    existing.add((user_id, certificate.pk))
+                    qualification = Qualification(user_id=user_id, certificate=certificate)
+                    try:
+                        date_granted = date_value(value(row, 'date_granted'))
+                    except ValueError as e:
+                        self.fail(path, line, e)
+                    if date_granted:
+                        qualification.date_granted = date_granted
+                    qualifications.append(qualification)
+                Qualification.objects.bulk_create(qualifications)
+            count += len(qualifications)
+            self.log('Imported {} qualifications'.format(count))
+        self.log('Imported {} qualifications from {}'.format(count, path), level=1)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.models import MembershipStatus, User
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every member's stored membership status and renewal "
+        'dates. The dates move on with the calendar, so this should be run '
+        'nightly (for example, with the Heroku Scheduler).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Number of members recomputed per transaction (default: {})'.format(DEFAULT_BATCH_SIZE))
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        verbosity = options['verbosity']
+
+        started = time.time()
+        count = 0
+        # Walk through the users in ID order, a batch at a time, so that
+        # memory use stays flat and each transaction stays short
+        last_pk = None
+        while True:
+            users = User.objects.order_by('pk')
+            if last_pk is not None:
+                users = users.filter(pk__gt=last_pk)
+            users = list(users[:batch_size])
+            if not users:
+                break
+            MembershipStatus.objects.refresh(users)
+            count += len(users)
+            last_pk = users[-1].pk
+            if verbosity >= 2:
+                self.stdout.write('Refreshed {} membership statuses'.format(count))
+        if verbosity >= 1:
+            self.stdout.write('Refreshed {} membership statuses in {:.1f}s'.format(count, time.time() - started))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 16:07
+from __future__ import unicode_literals
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# A copy of users.models.normalize_search_text() as it was when this
+# migration was written, so that later changes to it don't change what
+# this migration does.
+def normalize_search_text(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+# Rows are updated a batch at a time, with one UPDATE ... CASE per batch
+BATCH_SIZE = 500
+
+
+def populate_search_names(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    users = User.objects.order_by('pk').values_list('pk', 'first_name', 'last_name')
+    last_pk = None
+    while True:
+        batch = users if last_pk is None else users.filter(pk__gt=last_pk)
+        search_names = {
+            pk: normalize_search_text('{} {}'.format(first_name, last_name))
+            for pk, first_name, last_name in batch[:BATCH_SIZE]
+        }
+        if not search_names:
+            return
+        User.objects.filter(pk__in=search_names).update(search_name=models.Case(
+            *[models.When(pk=pk, then=models.Value(name)) for pk, name in search_names.items()],
+            output_field=models.CharField()
+        ))
+        last_pk = max(search_names)
+
+
+# Trigram indexes are PostgreSQL-only; other databases go without. The
+# trigram index serves prefix and substring searches alike, so the field
+# has no ordinary index.
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX users_user_search_name_trgm '
+        'ON users_user USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS users_user_search_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_auto_20170215_1406'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.RunPython(populate_search_names, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10.3 on 2026-10-17 17:02
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+# Give every existing user a status. These are the values that the
+# User methods give at the time of writing (every member is current
+# until the end of the year); refresh_membership_statuses recomputes
+# them with the real methods.
+def create_membership_statuses(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    MembershipStatus = apps.get_model('users', 'MembershipStatus')
+    end_of_this_year = datetime.date(datetime.date.today().year, 12, 31)
+    statuses = (MembershipStatus(
+        user_id=pk,
+        status='Current',
+        next_fitness_test_due_date=end_of_this_year,
+        next_medical_disclaimer_due_date=end_of_this_year,
+        next_medical_assessment_due_date=end_of_this_year,
+        next_renewal_due_date=end_of_this_year,
+        next_year_status='LAPSED',
+    ) for pk in User.objects.values_list('pk', flat=True).iterator())
+    MembershipStatus.objects.bulk_create(list(statuses), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_token_generation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipStatus',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='membership_status', serialize=False, to='users.User')),
+                ('status', models.CharField(choices=[('Current', 'Current'), ('Lapsed', 'Lapsed')], db_index=True, max_length=20)),
+                ('next_fitness_test_due_date', models.DateField(blank=True, null=True)),
+                ('next_medical_disclaimer_due_date', models.DateField(blank=True, null=True)),
+                ('next_medical_assessment_due_date', models.DateField(blank=True, null=True)),
+                ('next_renewal_due_date', models.DateField(blank=True, null=True)),
+                ('next_year_status', models.CharField(max_length=20)),
+                ('last_computed', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(create_membership_statuses, migrations.RunPython.noop),
+    ]
@@ -1,23 +1,19 @@
-from datetime import date
+import unicodedata
+import uuid
 
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+from django.db.models.functions import Cast, Length
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from clubs.models import Club, CommitteePosition, Region
 from clubs import roles
 from qualifications.models import Qualification
-from users import choices
-
-# Date-related stuff; for computing a user's current membership status,
-# we need to know where we are relative to the end of last year, this year,
-# and next year
-DECEMBER = 12
-this_year = date.today().year # Get the current year
-end_of_last_year = date(this_year, DECEMBER, 31)
-end_of_next_year = date(this_year, DECEMBER, 31)
-end_of_this_year = date(this_year, DECEMBER, 31)
+from users import choices, dates
 
 def get_national_club():
     return Club.objects.get_or_create(
@@ -25,6 +21,88 @@ def get_national_club():
         region=Region.objects.get_or_create(name='National')[0]
     )[0]
 
+# Normalize a string for searching: fold accents (so that searching for
+# 'sean' finds 'Seán'), lower-case it, and collapse whitespace.
+def normalize_search_text(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+# A user's username is their ID, which (unless it's given explicitly) the
+# database only assigns when the user is inserted. Until then, each user
+# gets a unique placeholder, so that concurrent inserts can't collide on
+# the username column. (Real usernames are numeric, so they never begin
+# with the placeholder prefix.)
+PLACEHOLDER_USERNAME_PREFIX = '~'
+
+def placeholder_username():
+    return '{}{}'.format(PLACEHOLDER_USERNAME_PREFIX, uuid.uuid4().hex)
+
+# Serializing a full User touches their club (and its region and members),
+# their committee positions, and their qualifications. Doing that one
+# user at a time costs several queries per user, so list endpoints should
+# load everything up front using this queryset method.
+class UserQuerySet(models.QuerySet):
+
+    # Users who hold at least one instructor-level certificate. (Each
+    # user appears once, however many such certificates they hold.)
+    def instructors(self):
+        return self.filter(qualifications__certificate__is_instructor_certificate=True).distinct()
+
+    # Users whose membership is current. Rather than computing each
+    # user's status, this reads the stored MembershipStatus (below),
+    # which is indexed on the status.
+    def current(self):
+        """
+        Return only the users whose current_membership_status() is
+        STATUS_CURRENT.
+        """
+        return self.filter(membership_status__status=choices.STATUS_CURRENT)
+
+    # Search for users by name or CFT number. On PostgreSQL, name searches
+    # use a trigram index on search_name (see migration 0005) and are
+    # ranked by trigram similarity; elsewhere, matches at the start of
+    # the name or of a word in it are ranked first.
+    def search(self, fragment):
+        """
+        Return the users matching a search fragment, best matches first.
+        A numeric fragment is matched against CFT numbers; anything else
+        is matched against the users' names.
+        """
+        fragment = fragment.strip()
+        if fragment.isdigit():
+            return self.filter(username__contains=fragment).order_by(Length('username'), 'username')
+        term = normalize_search_text(fragment)
+        if connections[self.db].vendor == 'postgresql':
+            rank = TrigramSimilarity('search_name', term)
+        else:
+            rank = models.Case(
+                models.When(search_name__startswith=term, then=models.Value(2)),
+                models.When(search_name__contains=' ' + term, then=models.Value(1)),
+                default=models.Value(0),
+                output_field=models.IntegerField(),
+            )
+        return self.filter(search_name__contains=term).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', 'last_name', 'first_name', 'id')
+
+    def with_serializer_data(self):
+        """
+        Return the queryset with everything that UserSerializer needs
+        loaded in a constant number of queries: clubs and regions are
+        joined, committee positions and club members are prefetched, and
+        instructor status is annotated as 'instructor_certificate_count'.
+        """
+        return self.select_related('club__region').prefetch_related(
+            'club__users',
+            'committee_positions',
+        ).annotate(
+            instructor_certificate_count=models.Count(models.Case(
+                models.When(qualifications__certificate__is_instructor_certificate=True, then=1),
+                output_field=models.IntegerField(),
+            )),
+        )
+
 # Because we're using a custom User model (rather than Django's built-in
 # model), we also need to define a user manager with custom create_user()
 # and create_superuser() methods. This is largely because we're using the
@@ -32,8 +110,9 @@ def get_national_club():
 # create a User object without giving a username.
 #
 # The job of giving the user a username the same as their ID is handled
-# by a signal (defined at the bottom of this file).
-class UserManager(BaseUserManager):
+# by signals (defined at the bottom of this file), except in
+# bulk_create_users(), which has to do it itself.
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, first_name, last_name, password=None, **kwargs):
         """
         Creates and saves a user with the given name and password and returns
@@ -43,28 +122,86 @@ class UserManager(BaseUserManager):
         if not first_name and last_name:
             raise ValueError('Users must have a first and last name')
 
+        # A user's username is always their ID, whatever we're given
+        # (manage.py createsuperuser, for one, asks for a username)
+        kwargs.pop('username', None)
         user = self.model(
             first_name=first_name,
             last_name=last_name,
             **kwargs
         )
         user.set_password(password)
-        user.save(using=self._db)
+        # This is always a new user, so there's no need for Django to
+        # check for an existing row first (which it would do if an ID
+        # were given).
+        user.save(force_insert=True, using=self._db)
+        if 'id' in kwargs:
+            self.reset_id_sequence()
         return user
 
+    def reset_id_sequence(self):
+        """
+        Bring the database's sequence of user IDs (if it has one, as
+        PostgreSQL does) up to date, after users have been inserted with
+        explicit IDs, so that the next user created without one isn't
+        given an ID that's already taken.
+        """
+        connection = connections[self.db]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [self.model]):
+                cursor.execute(sql)
+
     def create_superuser(self, first_name, last_name, password, **kwargs):
         """
         Creates and saves a superuser with the given name and password
         and returns the User object.
         """
-        # Create and save a standard user
-        user = self.create_user(first_name, last_name, password)
-        # Set the 'is_superuser' and 'is_staff' flag
-        user.is_superuser = True
-        user.is_staff = True
-        # Save a second time
-        user.save(using=self._db)
-        return user
+        # Create and save a standard user with the 'is_superuser' and
+        # 'is_staff' flags set
+        kwargs.update(is_superuser=True, is_staff=True)
+        return self.create_user(first_name, last_name, password, **kwargs)
+
+    def bulk_create_users(self, users, batch_size=None):
+        """
+        Insert a list of unsaved User objects using bulk_create(), and
+        return the list with each user's ID and username filled in.
+        Signals aren't sent, and passwords aren't hashed (hashing is slow,
+        by design): set them beforehand if they're needed.
+        """
+        # Users whose IDs we already know can be given their usernames
+        # straight away; the rest get placeholders with a common prefix,
+        # so that we can find them again afterwards.
+        batch_prefix = '{}{}-'.format(PLACEHOLDER_USERNAME_PREFIX, uuid.uuid4().hex)
+        pending = {}
+        for index, user in enumerate(users):
+            user.search_name = normalize_search_text(user.get_full_name())
+            # set_unusable_password() draws 40 random characters one at a
+            # time, which adds up over a large import; a UUID does the job
+            if not user.password:
+                user.password = '{}{}'.format(UNUSABLE_PASSWORD_PREFIX, uuid.uuid4().hex)
+            if user.pk is not None:
+                user.username = str(user.pk)
+            else:
+                user.username = '{}{}'.format(batch_prefix, index)
+                pending[user.username] = user
+        self.bulk_create(users, batch_size=batch_size)
+        if pending:
+            # Not every database tells us the IDs of the rows that
+            # bulk_create() inserted, so look them up in one query...
+            placeholders = self.filter(username__startswith=batch_prefix)
+            for pk, username in placeholders.values_list('pk', 'username'):
+                user = pending[username]
+                user.pk = pk
+                user.username = str(pk)
+                user._state.adding = False
+                user._state.db = self.db
+            # ...then swap the placeholders for the IDs in one more.
+            placeholders.update(username=Cast('id', models.CharField(max_length=150)))
+        # New users don't have membership statuses yet (the signal that
+        # would normally create them isn't sent)
+        MembershipStatus.objects.bulk_create(
+            [MembershipStatus.compute(user) for user in users], batch_size=batch_size)
+        return users
 
 # Here's our custom User model. We define quite a lot of fields on it,
 # as well as various convenience methods that allow us to query a member's
@@ -89,6 +226,12 @@ class User(AbstractUser):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
 
+    # A normalized copy of the user's full name, used for searching. It's
+    # kept up to date by a signal (defined at the bottom of this file), so
+    # it should never be set directly. On PostgreSQL, it has a trigram
+    # index (see migration 0005), which serves every kind of search.
+    search_name = models.CharField(max_length=201, blank=True, editable=False)
+
     # Gender; choices are retrieved from choices.py (so that they're
     # reusable).
     gender = models.IntegerField(choices=choices.GENDER_CHOICES, blank=True, null=True)
@@ -134,6 +277,20 @@ class User(AbstractUser):
     # CFT membership type: student/full.
     membership_type = models.IntegerField(choices=choices.MEMBERSHIP_CHOICES, default=choices.MEMBERSHIP_FULL)
 
+    ############################################################################
+    # Authentication
+    ############################################################################
+
+    # Signed tokens carry the generation they were issued in, and are
+    # only accepted while it matches this counter (see
+    # authentication/tokens.py), so bumping it revokes them all.
+    token_generation = models.PositiveIntegerField(default=0, editable=False)
+
+    def revoke_signed_tokens(self):
+        self.token_generation = models.F('token_generation') + 1
+        self.save(update_fields=['token_generation'])
+        self.refresh_from_db(fields=['token_generation'])
+
     ############################################################################
     # Convenience methods for permisson handling
     ############################################################################
@@ -172,6 +329,19 @@ class User(AbstractUser):
 
         return True
 
+    # The status computed by the methods in this section is also stored
+    # in a MembershipStatus (see below), so that lists of users can be
+    # filtered on it. For now, the methods above don't look at anything
+    # stored (they're still to be written), so nothing calls this yet:
+    # the stored status only changes when the nightly command runs. Once
+    # disclaimers, fitness tests and assessments are recorded, whatever
+    # records them must call this to bring the stored status up to date.
+    def refresh_membership_status(self):
+        """
+        Recompute the user's stored MembershipStatus.
+        """
+        MembershipStatus.objects.refresh([self])
+
     # Look at the state of the user's disclaimer, assessment, and
     # fit-to-dive status, and decide whether they're current or lapsed.
     def current_membership_status(self):
@@ -193,31 +363,37 @@ class User(AbstractUser):
 
 
         ############################################################################
-        # Methods to calculate various important dates
-        # TODO: These are currently not accurate, because the CFT year runs
-        # from October to the following December. We'll need to come up
-        # with some more sophisticated logic.
+        # Methods to calculate various important dates. These are worked
+        # out from today's place in the CFT year (see users/dates.py).
         ############################################################################
 
     def next_fitness_test_due_date(self):
         # TODO: Compute actual logic for this based on CFT rules.
+        calendar = dates.current_calendar()
         if self.is_currently_fit_to_dive():
-            return end_of_this_year
-        return end_of_last_year
+            return calendar.this_year.end
+        return calendar.last_year.end
 
     def next_medical_disclaimer_due_date(self):
+        calendar = dates.current_calendar()
         if self.has_current_medical_disclaimer():
-            return end_of_this_year
-        return end_of_last_year
+            return calendar.this_year.end
+        return calendar.last_year.end
 
     def next_medical_assessment_due_date(self):
+        calendar = dates.current_calendar()
         if self.has_current_medical_assessment():
-            return end_of_this_year
-        return end_of_last_year
+            return calendar.this_year.end
+        return calendar.last_year.end
 
     def next_renewal_due_date(self):
-        # TODO: this is just a placeholder
-        return end_of_this_year
+        # Membership has to be renewed before this year's runs out. Once
+        # renewals for next year open in October, it's next year's
+        # membership that's due.
+        calendar = dates.current_calendar()
+        if calendar.renewals_open:
+            return calendar.next_year.end
+        return calendar.this_year.end
 
     def next_year_membership_status(self):
         # TODO: fix this
@@ -228,9 +404,25 @@ class User(AbstractUser):
     # Higher-echelon role methods
     ############################################################################
 
-    # Is this user the dive club of any region?
-    def is_regional_dive_officer(self):
-        return any([region.dive_officer == self for region in Region.objects.all()])
+    # The IDs of the regions of which this user is the Dive Officer. Like
+    # committee_roles() (below), these are loaded in a single query and
+    # kept on the instance.
+    def officered_region_ids(self):
+        """
+        Return the set of IDs of the regions of which this user is the
+        Dive Officer.
+        """
+        if not hasattr(self, '_region_cache'):
+            self._region_cache = set(self.regions_officered.values_list('id', flat=True))
+        return self._region_cache
+
+    # Is this user the Dive Officer of any region (or, if a region is
+    # specified, of that region)?
+    def is_regional_dive_officer(self, region=None):
+        region_ids = self.officered_region_ids()
+        if region is None:
+            return len(region_ids) > 0
+        return getattr(region, 'pk', region) in region_ids
 
     ############################################################################
     # Club committee role setters ('become_$ROLE') and getters ('is_$ROLE')
@@ -239,6 +431,9 @@ class User(AbstractUser):
     # Generic method for assigning a committee role to a user
     def __adopt_role(self, role):
         CommitteePosition.objects.get_or_create(user=self, club=self.club, role=role)
+        # The user's roles have changed, so any snapshot we're holding
+        # is out of date
+        self.clear_role_cache()
 
     # Make this user the Dive Officer of their club.
     def become_dive_officer(self):
@@ -254,13 +449,46 @@ class User(AbstractUser):
 
     # TODO: Finish these 'become_$ROLE' methods for the other committee roles
 
+    # Permission checks ask about the requesting user's roles several
+    # times per request, so rather than hitting the database every time,
+    # we load all of the user's committee positions (as (role, club ID)
+    # pairs) in a single query and keep them on the instance. This works
+    # the same way as the permission cache that Django's ModelBackend
+    # keeps on User objects: it lives as long as the instance does, which
+    # for request.user is the duration of the request.
+    def committee_roles(self):
+        """
+        Return a set of (role, club ID) pairs, one for each of the user's
+        committee positions.
+        """
+        if not hasattr(self, '_role_cache'):
+            self._role_cache = set(
+                CommitteePosition.objects.filter(user=self).values_list('role', 'club_id')
+            )
+        return self._role_cache
+
+    # Throw away the role snapshot, so that the next role check goes
+    # back to the database. This is called whenever the user's committee
+    # positions (or regional roles) change.
+    def clear_role_cache(self):
+        for attr in ('_role_cache', '_region_cache'):
+            try:
+                delattr(self, attr)
+            except AttributeError:
+                pass
+
     # Generic method to check whether a user holds a committee role.
     def __has_role(self, role):
-        return CommitteePosition.objects.filter(user=self, role=role).exists()
+        return any(held_role == role for held_role, club_id in self.committee_roles())
 
     # Has the user got *any* committee role at all?
     def has_any_role(self):
-        return CommitteePosition.objects.filter(user=self).exists()
+        return len(self.committee_roles()) > 0
+
+    # Does the user hold any committee role in the given club?
+    def has_any_role_in(self, club):
+        club_id = getattr(club, 'pk', club)
+        return any(held_club_id == club_id for role, held_club_id in self.committee_roles())
 
     # Is the user a Dive Officer?
     def is_dive_officer(self):
@@ -298,8 +526,12 @@ class User(AbstractUser):
     # Instructional certification checking
     ############################################################################
 
-    # Does the user hold an instructor-level grade?
+    # Does the user hold an instructor-level grade? If the user was loaded
+    # with UserQuerySet.with_serializer_data(), then we already know.
     def is_instructor(self):
+        count = getattr(self, 'instructor_certificate_count', None)
+        if count is not None:
+            return count > 0
         return self.qualifications.filter(certificate__is_instructor_certificate=True).exists()
 
     ############################################################################
@@ -330,7 +562,7 @@ class User(AbstractUser):
     def has_as_dive_officer(self, other_user):
         # True if both users are in the same club and the other user is
         # the Dive Officer, otherwise False
-        return self.club == other_user.club and other_user.is_dive_officer()
+        return self.club_id == other_user.club_id and other_user.is_dive_officer()
 
 
     ############################################################################
@@ -354,16 +586,128 @@ class User(AbstractUser):
         # useful for 
         return '{} (CFT #{})'.format(self.get_full_name(), self.id)
 
+class MembershipStatusManager(models.Manager):
+
+    def refresh(self, users, batch_size=None):
+        """
+        Recompute and store the membership statuses of the given users,
+        replacing any they already have, and return them.
+        """
+        statuses = [self.model.compute(user) for user in users]
+        with transaction.atomic(using=self.db):
+            self.filter(user__in=[status.user_id for status in statuses]).delete()
+            self.bulk_create(statuses, batch_size=batch_size)
+        return statuses
+
+
+# A user's membership status and renewal dates, as computed by the User
+# methods of the same names, stored so that lists of users can be
+# filtered and ordered on them in the database. Every user has one: it's
+# created along with the user and recomputed for everyone by the
+# refresh_membership_statuses management command, which should run
+# nightly (because the dates move on even when nothing else changes).
+# User.refresh_membership_status() recomputes a single user's, for the
+# code that will record the status's inputs (see the comment there).
+class MembershipStatus(models.Model):
+
+    objects = MembershipStatusManager()
+
+    user = models.OneToOneField(User, primary_key=True, related_name='membership_status',
+                                on_delete=models.CASCADE)
+
+    # These have the values of the User methods of the same names.
+    status = models.CharField(max_length=20, choices=choices.STATUS_CHOICES, db_index=True)
+    next_fitness_test_due_date = models.DateField(blank=True, null=True)
+    next_medical_disclaimer_due_date = models.DateField(blank=True, null=True)
+    next_medical_assessment_due_date = models.DateField(blank=True, null=True)
+    next_renewal_due_date = models.DateField(blank=True, null=True)
+    next_year_status = models.CharField(max_length=20)
+
+    # When the status was computed
+    last_computed = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def compute(cls, user):
+        """
+        Return an unsaved MembershipStatus for the user.
+        """
+        return cls(
+            user=user,
+            status=user.current_membership_status(),
+            next_fitness_test_due_date=user.next_fitness_test_due_date(),
+            next_medical_disclaimer_due_date=user.next_medical_disclaimer_due_date(),
+            next_medical_assessment_due_date=user.next_medical_assessment_due_date(),
+            next_renewal_due_date=user.next_renewal_due_date(),
+            next_year_status=user.next_year_membership_status(),
+        )
+
+    def __str__(self):
+        return '{}: {}'.format(self.user_id, self.status)
+
 ###############################################################################
 # Database signals.
 ###############################################################################
 
 
-# When a User object is created, set their username to their ID and save
-# the object again.
+# Before a new User object is inserted, give them a username: their ID,
+# if it's been set explicitly (in which case that's the only write we
+# need), or a placeholder otherwise.
+def set_placeholder_username(sender, **kwargs):
+    user = kwargs['instance']
+    if user._state.adding and not user.username:
+        if user.id is not None:
+            user.username = str(user.id)
+        else:
+            user.username = placeholder_username()
+models.signals.pre_save.connect(set_placeholder_username, User)
+
+
+# When a User object is created with a placeholder username, set their
+# username to their ID. Only the username column is written, and the
+# object isn't saved again (which would re-send all of these signals).
 def set_username(sender, **kwargs):
     user = kwargs['instance']
-    if kwargs['created']:
-        user.username = user.id
-        user.save()
+    if kwargs['created'] and str(user.username).startswith(PLACEHOLDER_USERNAME_PREFIX):
+        user.username = str(user.id)
+        sender.objects.filter(pk=user.pk).update(username=user.username)
 models.signals.post_save.connect(set_username, User)
+
+
+# Every new User object gets a membership status.
+def create_membership_status(sender, **kwargs):
+    if kwargs['created'] and not kwargs['raw']:
+        MembershipStatus.compute(kwargs['instance']).save(force_insert=True)
+models.signals.post_save.connect(create_membership_status, User)
+
+
+# Before a User object is saved, bring their search name up to date.
+def set_search_name(sender, **kwargs):
+    user = kwargs['instance']
+    user.search_name = normalize_search_text(user.get_full_name())
+models.signals.pre_save.connect(set_search_name, User)
+
+
+# When a committee position is created, changed, or deleted, throw away
+# the role snapshot held by the position's user (if we have that User
+# object in hand), so that their next role check sees the change.
+def clear_committee_role_cache(sender, **kwargs):
+    position = kwargs['instance']
+    # Only look at a User object that's already attached to the position;
+    # there's no point in running a query to fetch a fresh User, since
+    # a fresh User won't have a snapshot to clear.
+    user = getattr(position, '_user_cache', None)
+    if user is not None:
+        user.clear_role_cache()
+models.signals.post_save.connect(clear_committee_role_cache, CommitteePosition)
+models.signals.post_delete.connect(clear_committee_role_cache, CommitteePosition)
+
+
+# Likewise, when a region is saved or deleted, throw away its Dive
+# Officer's snapshot of regional roles.
+def clear_regional_role_cache(sender, **kwargs):
+    region = kwargs['instance']
+    user = getattr(region, '_dive_officer_cache', None)
+    if user is not None:
+        user.clear_role_cache()
+models.signals.post_save.connect(clear_regional_role_cache, Region)
+models.signals.post_delete.connect(clear_regional_role_cache, Region)
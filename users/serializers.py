@@ -44,7 +44,7 @@ class UserListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ('id', 'first_name', 'last_name', 'email', 'club',)
+        fields = ('id', 'first_name', 'last_name', 'email', 'club', 'current_membership_status',)
 
     class ClubSerializer(serializers.ModelSerializer):
         class Meta:
@@ -53,3 +53,6 @@ class UserListSerializer(serializers.ModelSerializer):
         region = RegionSerializer()
 
     club = ClubSerializer()
+
+    # Read from the stored status, rather than computed for each user
+    current_membership_status = serializers.ReadOnlyField(source='membership_status.status')
@@ -0,0 +1,75 @@
+import random
+
+from django.utils.six import StringIO
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, CommitteePosition, Region
+from courses.models import Course, CourseEnrolment
+from qualifications.models import Qualification
+from users.management.commands.benchmark import Command, percentile
+from users.models import User
+
+class BenchmarkTestCase(APITestCase):
+
+    # handle() sets up its own test database, so these tests drive the
+    # seeding and timing steps directly in the one we're already using
+    def command(self, **options):
+        command = Command(stdout=StringIO())
+        command.options = dict({
+            'regions': 2,
+            'clubs': 3,
+            'users': 30,
+            'courses': 4,
+            'enrolments_per_course': 5,
+            'requests': 2,
+            'warmup': 0,
+            'routes': None,
+        }, **options)
+        command.verbosity = 0
+        command.random = random.Random(0)
+        return command
+
+    def test_seed_creates_a_federation(self):
+        fixture = self.command().seed()
+        self.assertEqual(fixture, {
+            'regions': 2,
+            'clubs': 3,
+            'users': 30,
+            'qualifications': Qualification.objects.count(),
+            'courses': 4,
+            'enrolments': 20,
+        })
+        self.assertEqual(Region.objects.count(), 2)
+        self.assertEqual(Club.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Course.objects.count(), 4)
+        self.assertEqual(CourseEnrolment.objects.count(), 20)
+        self.assertGreaterEqual(Qualification.objects.count(), 30)
+        for u in User.objects.all():
+            self.assertEqual(u.username, str(u.pk))
+        # Every club with members has a Dive Officer
+        self.assertEqual(CommitteePosition.objects.count(),
+                         Club.objects.filter(users__isnull=False).distinct().count())
+
+    def test_every_route_is_timed(self):
+        command = self.command()
+        command.seed()
+        results = command.run_routes()
+        self.assertEqual(set(results), set(name for name, url in command.get_routes()))
+        for r in results.values():
+            self.assertLessEqual(r['p50_ms'], r['p95_ms'])
+            self.assertLessEqual(r['p95_ms'], r['p99_ms'])
+            self.assertGreater(r['queries'], 0)
+            self.assertGreater(r['bytes'], 0)
+
+    def test_only_the_requested_routes_are_timed(self):
+        command = self.command(routes=['courses'])
+        command.seed()
+        self.assertEqual(list(command.run_routes()), ['courses'])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
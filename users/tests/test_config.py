@@ -22,7 +22,57 @@ class SimpleUserTestCase(APITestCase):
         self.assertTrue(User.objects.filter(email=email).exists())
 
     def test_username_equals_id(self):
-        self.assertEquals(self.u.username, self.u.id)
+        self.assertEquals(self.u.username, str(self.u.id))
 
     def test_get_full_name(self):
         self.assertEquals('Joe Bloggs', self.u.get_full_name())
+
+
+class UserCreationWritesTestCase(APITestCase):
+
+    def test_create_user_writes_the_row_once(self):
+        # One INSERT, then an UPDATE of the username column only, then
+        # the INSERT of the user's membership status
+        with self.assertNumQueries(3):
+            u = User.objects.create_user(first_name='Joe', last_name='Bloggs')
+        self.assertEqual(User.objects.get(pk=u.pk).username, str(u.pk))
+
+    def test_create_user_with_known_id_is_a_single_insert(self):
+        # A single INSERT for the user, and one for their membership status
+        with self.assertNumQueries(2):
+            u = User.objects.create_user(first_name='Joe', last_name='Bloggs', id=4242)
+        self.assertEqual(User.objects.get(pk=4242).username, '4242')
+
+    def test_users_can_be_created_after_one_with_a_known_id(self):
+        User.objects.create_user(first_name='Joe', last_name='Bloggs', id=4242)
+        u = User.objects.create_user(first_name='Joe', last_name='Bloggs')
+        self.assertGreater(u.pk, 4242)
+
+    def test_create_superuser_does_not_save_twice(self):
+        with self.assertNumQueries(3):
+            u = User.objects.create_superuser('Super', 'User', 'password')
+        u = User.objects.get(pk=u.pk)
+        self.assertTrue(u.is_superuser and u.is_staff)
+
+    def test_superuser_username_is_their_id(self):
+        # manage.py createsuperuser passes the username it prompts for
+        u = User.objects.create_superuser('Super', 'User', 'password', username='admin')
+        self.assertEqual(User.objects.get(pk=u.pk).username, str(u.pk))
+
+    def test_bulk_create_users(self):
+        users = [User(first_name='Member', last_name=str(i)) for i in range(300)]
+        users.append(User(id=9000, first_name='Known', last_name='Id'))
+        # One INSERT for the user with a known ID and three for the rest,
+        # then a SELECT and an UPDATE to fill in the usernames, then four
+        # INSERTs for the membership statuses
+        with self.assertNumQueries(10):
+            created = User.objects.bulk_create_users(users, batch_size=100)
+        self.assertEqual(User.objects.count(), 301)
+        for u in created:
+            self.assertIsNotNone(u.pk)
+            self.assertEqual(u.username, str(u.pk))
+        for u in User.objects.all():
+            self.assertEqual(u.username, str(u.pk))
+            self.assertFalse(u.has_usable_password())
+        self.assertEqual(User.objects.get(pk=9000).search_name, 'known id')
+        self.assertEqual(User.objects.current().count(), 301)
@@ -1,11 +1,14 @@
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.utils.six import StringIO
 
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from clubs.models import Club
 from qualifications.models import Certificate, Qualification
-from users.models import User
+from users.choices import STATUS_CURRENT, STATUS_LAPSED
+from users.models import MembershipStatus, User
 from users.tests.shared import MOCK_USER_DATA
 
 class CurrentMembershipStatusTestCase(APITestCase):
@@ -42,3 +45,58 @@ class CurrentMembershipStatusTestCase(APITestCase):
       self.client.force_authenticate(self.member)
       response = self.client.get(reverse('user-current-membership-status', args=[self.other_user.id]))
       self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CurrentUserQuerySetTestCase(APITestCase):
+
+    def setUp(self):
+      club = Club.objects.create(name='UCC')
+      for i in range(3):
+          User.objects.create_user('Club', 'Member', club=club)
+
+    def test_current_agrees_with_current_membership_status(self):
+      expected = [u.id for u in User.objects.order_by('id') if u.current_membership_status() == STATUS_CURRENT]
+      current = list(User.objects.current().order_by('id').values_list('id', flat=True))
+      self.assertEqual(current, expected)
+
+
+class StoredMembershipStatusTestCase(APITestCase):
+
+    def setUp(self):
+      self.staff = User.objects.create_user('Staff', 'Member', is_staff=True)
+      self.club = Club.objects.create(name='UCC')
+      self.current = User.objects.create_user('Current', 'Member', club=self.club)
+      self.lapsed = User.objects.create_user('Lapsed', 'Member', club=self.club)
+      MembershipStatus.objects.filter(user=self.lapsed).update(status=STATUS_LAPSED)
+
+    def test_new_users_get_a_status(self):
+      stored = MembershipStatus.objects.get(user=self.current)
+      self.assertEqual(stored.status, self.current.current_membership_status())
+      self.assertEqual(stored.next_renewal_due_date, self.current.next_renewal_due_date())
+
+    def test_current_reads_the_stored_status(self):
+      self.assertIn(self.current, User.objects.current())
+      self.assertNotIn(self.lapsed, User.objects.current())
+
+    def test_refresh_membership_status(self):
+      self.lapsed.refresh_membership_status()
+      self.assertEqual(MembershipStatus.objects.get(user=self.lapsed).status, STATUS_CURRENT)
+      self.assertEqual(MembershipStatus.objects.filter(user=self.lapsed).count(), 1)
+
+    def test_command_refreshes_everyone(self):
+      MembershipStatus.objects.filter(user=self.current).delete()
+      call_command('refresh_membership_statuses', batch_size=2, stdout=StringIO())
+      self.assertEqual(MembershipStatus.objects.count(), User.objects.count())
+      self.assertEqual(User.objects.current().count(), User.objects.count())
+
+    def test_list_can_be_filtered_on_status(self):
+      self.client.force_authenticate(self.staff)
+      response = self.client.get(reverse('user-list'), {'status': STATUS_LAPSED})
+      self.assertEqual(response.status_code, status.HTTP_200_OK)
+      self.assertEqual([u['id'] for u in response.data], [self.lapsed.id])
+      self.assertEqual(response.data[0]['current_membership_status'], STATUS_LAPSED)
+
+    def test_list_rejects_unknown_statuses(self):
+      self.client.force_authenticate(self.staff)
+      response = self.client.get(reverse('user-list'), {'status': 'Expired'})
+      self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,89 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from users import dates
+from users.models import User
+
+def frozen_at(year, month, day, hour=12):
+    """
+    Patch timezone.now() to return the given moment (in UTC).
+    """
+    moment = datetime.datetime(year, month, day, hour, tzinfo=timezone.utc)
+    return mock.patch('django.utils.timezone.now', return_value=moment)
+
+
+class CFTCalendarTestCase(SimpleTestCase):
+
+    def setUp(self):
+        dates.calendar_for.cache_clear()
+
+    def test_cft_year_runs_from_october_to_the_following_december(self):
+        year = dates.cft_year(2017)
+        self.assertEqual(year.start, datetime.date(2016, 10, 1))
+        self.assertEqual(year.end, datetime.date(2017, 12, 31))
+
+    def test_calendar_in_summer(self):
+        calendar = dates.calendar_for(datetime.date(2017, 6, 1))
+        self.assertEqual(calendar.last_year.end, datetime.date(2016, 12, 31))
+        self.assertEqual(calendar.this_year.end, datetime.date(2017, 12, 31))
+        self.assertEqual(calendar.next_year.start, datetime.date(2017, 10, 1))
+        self.assertFalse(calendar.renewals_open)
+
+    def test_renewals_open_in_october(self):
+        self.assertFalse(dates.calendar_for(datetime.date(2017, 9, 30)).renewals_open)
+        calendar = dates.calendar_for(datetime.date(2017, 10, 1))
+        self.assertTrue(calendar.renewals_open)
+        # This year's membership is still in force
+        self.assertEqual(calendar.this_year.year, 2017)
+
+    def test_calendar_moves_on_at_new_year(self):
+        with frozen_at(2017, 12, 31, hour=23):
+            self.assertEqual(dates.current_calendar().this_year.end, datetime.date(2017, 12, 31))
+        with frozen_at(2018, 1, 1, hour=0):
+            calendar = dates.current_calendar()
+            self.assertEqual(calendar.this_year.end, datetime.date(2018, 12, 31))
+            self.assertEqual(calendar.last_year.end, datetime.date(2017, 12, 31))
+            self.assertFalse(calendar.renewals_open)
+
+    def test_calendar_is_computed_once_per_day(self):
+        with frozen_at(2017, 6, 1):
+            for i in range(10):
+                dates.current_calendar()
+        self.assertEqual(dates.calendar_for.cache_info().misses, 1)
+        self.assertEqual(dates.calendar_for.cache_info().hits, 9)
+
+
+class DueDatesTestCase(APITestCase):
+
+    def setUp(self):
+        dates.calendar_for.cache_clear()
+        self.user = User.objects.create_user('Club', 'Member')
+
+    def assertDueAt(self, due_date):
+        self.assertEqual(self.user.next_fitness_test_due_date(), due_date)
+        self.assertEqual(self.user.next_medical_disclaimer_due_date(), due_date)
+        self.assertEqual(self.user.next_medical_assessment_due_date(), due_date)
+
+    def test_due_dates_follow_the_calendar_across_new_year(self):
+        with frozen_at(2017, 12, 31):
+            self.assertDueAt(datetime.date(2017, 12, 31))
+        with frozen_at(2018, 1, 1):
+            self.assertDueAt(datetime.date(2018, 12, 31))
+
+    def test_renewal_is_due_for_next_year_once_renewals_open(self):
+        with frozen_at(2017, 9, 30):
+            self.assertEqual(self.user.next_renewal_due_date(), datetime.date(2017, 12, 31))
+        with frozen_at(2017, 10, 1):
+            self.assertEqual(self.user.next_renewal_due_date(), datetime.date(2018, 12, 31))
+        with frozen_at(2017, 12, 31):
+            self.assertEqual(self.user.next_renewal_due_date(), datetime.date(2018, 12, 31))
+        with frozen_at(2018, 1, 1):
+            self.assertEqual(self.user.next_renewal_due_date(), datetime.date(2018, 12, 31))
+
+    def test_lapsed_members_are_due_at_the_end_of_last_year(self):
+        with frozen_at(2018, 3, 1), mock.patch.object(User, 'is_currently_fit_to_dive', return_value=False):
+            self.assertEqual(self.user.next_fitness_test_due_date(), datetime.date(2017, 12, 31))
@@ -0,0 +1,78 @@
+import csv
+import json
+
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from users.models import User
+
+def read_csv(response):
+    lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+    return list(csv.DictReader(lines))
+
+def read_jsonl(response):
+    lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+    return [json.loads(line) for line in lines]
+
+class UserExportTestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('Staff', 'Member', is_staff=True)
+        region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=region)
+        self.do = User.objects.create_user('Dave', 'Officer', club=self.club)
+        self.do.become_dive_officer()
+        self.member = User.objects.create_user('Club', 'Member', club=self.club)
+        self.other_club = Club.objects.create(name='CSAC')
+        self.other_user = User.objects.create_user('Other', 'User', club=self.other_club)
+
+    def test_admin_can_export_all_users_as_csv(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-export'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = read_csv(response)
+        self.assertEqual(len(rows), User.objects.count())
+        member = [r for r in rows if r['id'] == str(self.member.id)][0]
+        self.assertEqual(member['club__name'], 'UCCSAC')
+        self.assertEqual(member['club__region__name'], 'South')
+
+    def test_export_as_jsonl(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-export'), {'filetype': 'jsonl'})
+        rows = read_jsonl(response)
+        self.assertEqual(sorted(r['id'] for r in rows), sorted(User.objects.values_list('id', flat=True)))
+
+    def test_export_is_read_in_chunks(self):
+        from users.views import UserViewSet
+        self.client.force_authenticate(self.admin)
+        chunk_size = UserViewSet.export_chunk_size
+        try:
+            UserViewSet.export_chunk_size = 2
+            rows = read_csv(self.client.get(reverse('user-export')))
+        finally:
+            UserViewSet.export_chunk_size = chunk_size
+        self.assertEqual([int(r['id']) for r in rows], list(User.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_dive_officer_export_is_limited_to_their_club(self):
+        self.client.force_authenticate(self.do)
+        rows = read_csv(self.client.get(reverse('user-export')))
+        self.assertEqual(sorted(int(r['id']) for r in rows), sorted([self.do.id, self.member.id]))
+
+    def test_nested_export_is_limited_to_the_club(self):
+        self.client.force_authenticate(self.admin)
+        rows = read_csv(self.client.get(reverse('club-users-export', args=[self.other_club.id])))
+        self.assertEqual([int(r['id']) for r in rows], [self.other_user.id])
+
+    def test_regular_users_cannot_export(self):
+        self.client.force_authenticate(self.member)
+        response = self.client.get(reverse('user-export'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_filetype_is_rejected(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-export'), {'filetype': 'xls'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils.six import StringIO
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from qualifications.models import Certificate, Qualification
+from users import choices
+from users.models import User
+
+class ImportMembersTestCase(APITestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('regions.csv', 'name\nSouth\nNorth\n')
+        self.write('clubs.csv', 'name,region,location\nUCCSAC,South,Cork\nQUBSAC,North,Belfast\n')
+        self.write('members.csv',
+                   'id,first_name,last_name,email,club,gender,membership_type,date_of_birth\n'
+                   '101,Joe,Bloggs,joe@example.com,UCCSAC,Male,Student Diver,1990-01-01\n'
+                   '102,Nosmo,King,,QUBSAC,,,\n'
+                   '103,Seán,Ó Súilleabháin,,UCCSAC,0,1,\n')
+        self.write('qualifications.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'user': 101, 'certificate': 'Trainee Diver', 'date_granted': '2010-06-01'},
+            {'user': 101, 'certificate': 'Club Diver'},
+            {'user': 103, 'certificate': 'Trainee Diver'},
+        ]))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        with open(self.path(name), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def run_import(self, **kwargs):
+        options = {
+            'regions': self.path('regions.csv'),
+            'clubs': self.path('clubs.csv'),
+            'members': self.path('members.csv'),
+            'qualifications': self.path('qualifications.jsonl'),
+            'batch_size': 2,
+            'stdout': StringIO(),
+        }
+        options.update(kwargs)
+        call_command('import_members', **options)
+
+    def test_import_creates_everything(self):
+        self.run_import()
+        self.assertEqual(Region.objects.count(), 2)
+        self.assertEqual(Club.objects.get(name='UCCSAC').region.name, 'South')
+        self.assertEqual(User.objects.count(), 3)
+        joe = User.objects.get(pk=101)
+        self.assertEqual(joe.username, '101')
+        self.assertEqual(joe.club.name, 'UCCSAC')
+        self.assertEqual(joe.gender, 1)
+        self.assertEqual(joe.membership_type, choices.MEMBERSHIP_STUDENT)
+        self.assertEqual(joe.search_name, 'joe bloggs')
+        self.assertEqual(Qualification.objects.filter(user=joe).count(), 2)
+        self.assertEqual(Certificate.objects.count(), 2)
+
+    def test_import_can_be_rerun_without_duplicating_anything(self):
+        self.run_import()
+        self.run_import()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(Club.objects.count(), 2)
+        self.assertEqual(Qualification.objects.count(), 3)
+
+    def test_repeated_qualifications_are_imported_once(self):
+        self.write('qualifications.jsonl', '\n'.join(json.dumps(row) for row in [
+            {'user': 101, 'certificate': 'Trainee Diver'},
+            {'user': 101, 'certificate': 'Trainee Diver'},
+        ]))
+        self.run_import()
+        self.assertEqual(Qualification.objects.count(), 1)
+
+    def test_members_without_ids_are_numbered_after_those_with_them(self):
+        self.write('members.csv', 'id,first_name,last_name\n,New,Member\n104,Joe,Bloggs\n,Other,Member\n')
+        self.run_import(qualifications=None)
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(all(user.id > 104 for user in User.objects.exclude(pk=104)))
+
+    def test_users_can_be_created_after_import(self):
+        self.run_import()
+        user = User.objects.create_user('New', 'Member')
+        self.assertGreater(user.id, 103)
+
+    def test_unknown_club_is_an_error(self):
+        self.write('members.csv', 'id,first_name,last_name,club\n104,Joe,Bloggs,Nowhere\n')
+        with self.assertRaises(CommandError):
+            self.run_import(qualifications=None)
+        self.assertFalse(User.objects.filter(pk=104).exists())
+
+    def test_unknown_member_in_qualifications_is_an_error(self):
+        self.write('qualifications.jsonl', json.dumps({'user': 999, 'certificate': 'Trainee Diver'}))
+        with self.assertRaises(CommandError):
+            self.run_import()
+
+    def test_impossible_dates_are_reported(self):
+        bad_files = [
+            ('clubs.csv', 2, 'name,foundation_date\nUCCSAC,2017-02-30\n'),
+            ('members.csv', 2, 'id,first_name,last_name,date_of_birth\n104,Joe,Bloggs,2017-02-30\n'),
+            ('qualifications.jsonl', 1, json.dumps({'user': 101, 'certificate': 'Trainee Diver',
+                                                    'date_granted': '2017-02-30'})),
+        ]
+        for name, line, content in bad_files:
+            with open(self.path(name), encoding='utf-8') as f:
+                good_content = f.read()
+            self.write(name, content)
+            message = "(line {}): '2017-02-30' is not a date".format(line)
+            with self.assertRaisesMessage(CommandError, message):
+                self.run_import()
+            self.write(name, good_content)
@@ -6,6 +6,7 @@ from rest_framework.test import APITestCase
 
 from clubs.models import Club
 from users.models import User
+from users.views import SEARCH_RESULT_LIMIT
 from users.tests.shared import MOCK_USER_DATA
 
 UCCSAC_SIZE = 10
@@ -156,3 +157,76 @@ class UserFilterListTestCase(APITestCase):
         self.client.force_authenticate(self.member)
         response = self.client.get('{}?name={}'.format(reverse('user-list'), 'member'))
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_search_ignores_accents(self):
+        User.objects.create_user('Seán', 'Ó Súilleabháin', club=self.uccsac)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-list'), {'name': 'sean o suil'})
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]['first_name'], 'Seán')
+
+    def test_search_ranks_prefix_matches_first(self):
+        User.objects.create_user('Zoe', 'Fossett', club=self.uccsac)
+        User.objects.create_user('Ossian', 'Zebedee', club=self.uccsac)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-list'), {'name': 'oss'})
+        self.assertEqual([u['first_name'] for u in response.data], ['Ossian', 'Zoe'])
+
+    def test_search_name_follows_name_changes(self):
+        self.member.last_name = 'Renamed'
+        self.member.save()
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-list'), {'name': 'renamed'})
+        self.assertEqual(len(response.data), 1)
+
+    def test_unpaginated_search_results_are_limited(self):
+        for i in range(SEARCH_RESULT_LIMIT + 5):
+            User.objects.create_user('Common', 'Name', club=self.uccsac)
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('user-list'), {'name': 'common'})
+        self.assertEqual(len(response.data), SEARCH_RESULT_LIMIT)
+        response = self.client.get(reverse('user-list'), {'name': 'common', 'page_size': 100})
+        self.assertEqual(response.data['count'], SEARCH_RESULT_LIMIT + 5)
+
+
+class UserListPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('Staff', 'Member', is_staff=True)
+        self.club = Club.objects.create(name='UCCSAC')
+        for i in range(UCCSAC_SIZE):
+            User.objects.create_user('Club', 'Member', club=self.club)
+        self.client.force_authenticate(self.admin)
+
+    def test_lists_are_unpaginated_by_default(self):
+        response = self.client.get(reverse('user-list'))
+        self.assertEqual(len(response.data), UCCSAC_SIZE + 1)
+
+    def test_page_number_pagination(self):
+        response = self.client.get(reverse('user-list'), {'page': 2, 'page_size': 4})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], UCCSAC_SIZE + 1)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_cursor_pagination_visits_every_user_once(self):
+        seen = []
+        response = self.client.get(reverse('user-list'), {'cursor': '', 'page_size': 4})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [u['id'] for u in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, list(User.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_nested_lists_can_be_paginated(self):
+        response = self.client.get(reverse('club-users-list', args=[self.club.id]), {'page_size': 3})
+        self.assertEqual(response.data['count'], UCCSAC_SIZE)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_page_returns_404(self):
+        response = self.client.get(reverse('user-list'), {'page': 100})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,145 @@
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, CommitteePosition, Region
+from clubs.roles import DIVE_OFFICER, TREASURER
+from courses.models import Course
+from qualifications.models import Certificate
+from users.models import User
+
+# Count the queries in a captured block that hit the committee positions
+# table; this is the query that the role snapshot should run at most once.
+def count_role_queries(context):
+    return len([q for q in context.captured_queries if 'clubs_committeeposition' in q['sql']])
+
+
+class RoleCacheTestCase(APITestCase):
+
+    def setUp(self):
+        self.club = Club.objects.create(name='UCCSAC')
+        self.user = User.objects.create_user('Dave', 'Officer', club=self.club)
+
+    def test_role_checks_share_a_single_query(self):
+        self.user.become_dive_officer()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_dive_officer())
+            self.assertTrue(user.has_any_role())
+            self.assertTrue(user.has_any_role_in(self.club))
+            self.assertFalse(user.is_treasurer())
+            self.assertFalse(user.is_training_officer())
+
+    def test_becoming_a_committee_member_clears_the_cache(self):
+        self.assertFalse(self.user.is_dive_officer())
+        self.user.become_dive_officer()
+        self.assertTrue(self.user.is_dive_officer())
+
+    def test_creating_a_position_clears_the_cache(self):
+        self.assertFalse(self.user.is_treasurer())
+        CommitteePosition.objects.create(user=self.user, club=self.club, role=TREASURER)
+        self.assertTrue(self.user.is_treasurer())
+
+    def test_deleting_a_position_clears_the_cache(self):
+        position = CommitteePosition.objects.create(user=self.user, club=self.club, role=DIVE_OFFICER)
+        self.assertTrue(self.user.is_dive_officer())
+        position.delete()
+        self.assertFalse(self.user.is_dive_officer())
+
+    def test_has_any_role_in_checks_the_club(self):
+        self.user.become_dive_officer()
+        other_club = Club.objects.create(name='UCDSAC')
+        self.assertTrue(self.user.has_any_role_in(self.club.pk))
+        self.assertFalse(self.user.has_any_role_in(other_club))
+
+
+class RegionalDiveOfficerTestCase(APITestCase):
+
+    def setUp(self):
+        self.south = Region.objects.create(name='South')
+        self.north = Region.objects.create(name='North')
+        self.user = User.objects.create_user('Regional', 'Officer')
+
+    def test_regional_dive_officer_check_is_a_single_query(self):
+        self.south.dive_officer = self.user
+        self.south.save()
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.is_regional_dive_officer())
+            self.assertTrue(user.is_regional_dive_officer(self.south))
+            self.assertFalse(user.is_regional_dive_officer(self.north.pk))
+
+    def test_regions_officered_reverse_accessor(self):
+        self.south.dive_officer = self.user
+        self.south.save()
+        self.assertEqual(list(self.user.regions_officered.all()), [self.south])
+
+    def test_assigning_a_region_clears_the_cache(self):
+        self.assertFalse(self.user.is_regional_dive_officer())
+        self.north.dive_officer = self.user
+        self.north.save()
+        self.assertTrue(self.user.is_regional_dive_officer(self.north))
+
+
+class RoleQueryCountTestCase(APITestCase):
+    """
+    Each endpoint checks the requesting user's roles several times (in
+    permission classes and in the view itself), but the committee
+    positions table should only be queried once per request.
+    """
+
+    def setUp(self):
+        self.region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=self.region)
+        self.certificate = Certificate.objects.create(name='Trainee Diver')
+        do = User.objects.create_user('Dive', 'Officer', club=self.club)
+        do.become_dive_officer()
+        self.member = User.objects.create_user('Club', 'Member', club=self.club)
+        self.member.receive_certificate(self.certificate)
+        self.course = Course.objects.create(
+            certificate=self.certificate,
+            creator=do,
+            organizer=do,
+            region=self.region,
+        )
+        # Authenticate with a fresh User object, as if it had just been
+        # loaded by the authentication backend
+        self.do = User.objects.get(pk=do.pk)
+        self.client.force_authenticate(self.do)
+
+    def assertRolesLoadedOnce(self, method, url, data=None, expected_status=status.HTTP_200_OK):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, expected_status)
+        self.assertEqual(count_role_queries(context), 1)
+
+    def test_course_enrolment_create(self):
+        data = {'user': self.member.id, 'course': self.course.id}
+        self.assertRolesLoadedOnce('post', reverse('courseenrolment-list'), data,
+                                   expected_status=status.HTTP_201_CREATED)
+
+    def test_course_create(self):
+        data = {'certificate': self.certificate.id}
+        self.assertRolesLoadedOnce('post', reverse('course-list'), data,
+                                   expected_status=status.HTTP_201_CREATED)
+
+    def test_user_list(self):
+        self.assertRolesLoadedOnce('get', reverse('user-list'))
+
+    def test_user_current_membership_status(self):
+        self.assertRolesLoadedOnce('get', reverse('user-current-membership-status', args=[self.member.id]))
+
+    def test_club_detail(self):
+        self.assertRolesLoadedOnce('get', reverse('club-detail', args=[self.club.id]))
+
+    def test_club_qualifications(self):
+        self.assertRolesLoadedOnce('get', reverse('club-qualifications', args=[self.club.id]))
+
+    def test_qualification_list(self):
+        self.assertRolesLoadedOnce('get', reverse('qualification-list'))
+
+    def test_region_active_instructors(self):
+        self.assertRolesLoadedOnce('get', reverse('region-active-instructors', args=[self.region.id]))
@@ -0,0 +1,50 @@
+from rest_framework.test import APITestCase
+
+from clubs.models import Club, Region
+from qualifications.models import Certificate
+from users.models import User
+from users.serializers import UserSerializer
+
+class UserSerializerQueryTestCase(APITestCase):
+
+    def setUp(self):
+        region = Region.objects.create(name='South')
+        self.club = Club.objects.create(name='UCCSAC', region=region)
+        self.mon1 = Certificate.objects.create(name='Mon 1', is_instructor_certificate=True)
+        self.d1 = Certificate.objects.create(name='Trainee Diver')
+        self.do = User.objects.create_user('Dive', 'Officer', club=self.club)
+        self.do.become_dive_officer()
+        self.do.receive_certificate(self.d1)
+        self.do.receive_certificate(self.mon1)
+
+    def add_members(self, count):
+        for i in range(count):
+            user = User.objects.create_user('Club', 'Member', club=self.club)
+            user.receive_certificate(self.d1)
+
+    def serialize_all(self):
+        queryset = User.objects.filter(club=self.club).with_serializer_data()
+        return UserSerializer(queryset, many=True).data
+
+    def test_query_count_does_not_depend_on_number_of_users(self):
+        # Main query, plus one each to prefetch committee positions and
+        # club members
+        self.add_members(1)
+        with self.assertNumQueries(3):
+            self.serialize_all()
+        self.add_members(10)
+        with self.assertNumQueries(3):
+            self.serialize_all()
+
+    def test_annotated_output_matches_unannotated_output(self):
+        self.add_members(2)
+        queryset = User.objects.filter(club=self.club).order_by('id')
+        expected = UserSerializer(queryset, many=True).data
+        annotated = UserSerializer(queryset.with_serializer_data(), many=True).data
+        self.assertEqual(annotated, expected)
+
+    def test_annotation_counts_only_instructor_certificates(self):
+        self.add_members(1)
+        users = {u.pk: u for u in User.objects.filter(club=self.club).with_serializer_data()}
+        self.assertTrue(users[self.do.pk].is_instructor())
+        self.assertEqual(len([u for u in users.values() if u.is_instructor()]), 1)
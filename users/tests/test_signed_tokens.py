@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from authentication import make_signed_token, read_signed_token
+from authentication.authentication import token_cache, user_to_values
+from users.models import User
+
+class SignedTokenTestCase(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.user = User.objects.create_user('Club', 'Member', password='secret')
+        # The certificate list is served from the cache, so the only
+        # queries a request for it can make are for authentication
+        self.url = reverse('certificate-list')
+
+    def authenticate(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+
+    def obtain_token(self):
+        response = self.client.post(reverse('signed-token'), {'username': self.user.username, 'password': 'secret'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['token']
+
+    def test_login_issues_a_token(self):
+        token = self.obtain_token()
+        self.assertEqual(read_signed_token(token), (self.user.id, 0))
+
+    def test_login_needs_the_right_password(self):
+        response = self.client.post(reverse('signed-token'), {'username': self.user.username, 'password': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_token_authenticates_without_a_database_query_once_cached(self):
+        self.authenticate(self.obtain_token())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_tampered_token_is_rejected(self):
+        token = self.obtain_token()
+        user_id, rest = token.split(':', 1)
+        self.authenticate('{}:{}'.format(int(user_id) + 1, rest))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_is_rejected(self):
+        token, expires = make_signed_token(self.user, lifetime=-1)
+        self.authenticate(token)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], 'Token has expired.')
+
+    def test_refresh_issues_a_new_token(self):
+        token, expires = make_signed_token(self.user, lifetime=60)
+        self.authenticate(token)
+        response = self.client.post(reverse('signed-token-refresh'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data['expires'], expires)
+        self.authenticate(response.data['token'])
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_database_tokens_cannot_be_used_to_refresh(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token whatever')
+        response = self.client.post(reverse('signed-token-refresh'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoking_rejects_existing_tokens(self):
+        old_token = self.obtain_token()
+        other_token = self.obtain_token()
+        self.authenticate(old_token)
+        response = self.client.post(reverse('signed-token-revoke'))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        for token in (old_token, other_token):
+            self.authenticate(token)
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(response.data['detail'], 'Token has been revoked.')
+        # New tokens are fine
+        self.authenticate(self.obtain_token())
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_deactivated_user_is_rejected(self):
+        self.authenticate(self.obtain_token())
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_revocation_is_seen_through_the_shared_cache(self):
+        self.authenticate(self.obtain_token())
+        self.client.get(self.url)
+        self.user.revoke_signed_tokens()
+        # As if another process had cached the user before revocation
+        token_cache.clear()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_is_seen_by_other_processes(self):
+        self.authenticate(self.obtain_token())
+        self.client.get(self.url)
+        stale_values = user_to_values(self.user)
+        self.user.revoke_signed_tokens()
+        # As if another process still had the user's details from before
+        # the revocation in its own cache
+        token_cache.set('user:{}'.format(self.user.id), stale_values)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
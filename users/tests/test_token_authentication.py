@@ -0,0 +1,124 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from authentication.authentication import TokenCache, shared_user_key, token_cache
+from clubs.models import Club
+from users.models import User
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        cache.clear()
+        self.club = Club.objects.create(name='UCCSAC')
+        self.user = User.objects.create_user('Club', 'Member', club=self.club)
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+        # The certificate list is served from the cache, so the only
+        # query a request for it can make is for the token
+        self.url = reverse('certificate-list')
+
+    def get(self):
+        return self.client.get(self.url)
+
+    def test_token_is_only_looked_up_once(self):
+        self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token nonsense')
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_rejected(self):
+        self.get()
+        self.token.delete()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.get()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_changes_to_the_user_are_seen(self):
+        response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('user-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_shared_cache_is_used_when_local_cache_is_empty(self):
+        self.get()
+        token_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().status_code, status.HTTP_200_OK)
+        self.token.delete()
+        token_cache.clear()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_changes_made_by_other_processes_are_seen(self):
+        self.get()
+        # Another process has its own LRU cache, and only clears that
+        # (and the shared cache) when it deletes the token
+        with mock.patch('authentication.authentication.token_cache', TokenCache(size=10, timeout=60)):
+            self.token.delete()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(AUTH_TOKEN_CACHE_SHARED=True)
+    def test_users_deactivated_by_other_processes_are_rejected(self):
+        self.get()
+        with mock.patch('authentication.authentication.token_cache', TokenCache(size=10, timeout=60)):
+            self.user.is_active = False
+            self.user.save()
+        self.assertEqual(self.get().status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_hash_is_not_cached(self):
+        self.get()
+        self.assertNotIn('password', token_cache.get(self.token.key))
+        with override_settings(AUTH_TOKEN_CACHE_SHARED=True):
+            token_cache.clear()
+            self.get()
+        self.assertNotIn('password', cache.get(shared_user_key(self.user.pk)))
+        # A user built from the cache still has their password, on demand
+        self.user.set_password('secret')
+        User.objects.filter(pk=self.user.pk).update(password=self.user.password)
+        response = self.get()
+        self.assertTrue(response.wsgi_request.user.check_password('secret'))
+
+
+class TokenCacheTestCase(APITestCase):
+
+    def test_least_recently_used_entry_is_dropped(self):
+        lru = TokenCache(size=2, timeout=60)
+        lru.set('a', {'id': 1})
+        lru.set('b', {'id': 2})
+        lru.get('a')
+        lru.set('c', {'id': 3})
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), {'id': 1})
+        self.assertEqual(lru.get('c'), {'id': 3})
+
+    def test_entries_expire(self):
+        lru = TokenCache(size=2, timeout=-1)
+        lru.set('a', {'id': 1})
+        self.assertIsNone(lru.get('a'))
+
+    def test_delete_user(self):
+        lru = TokenCache(size=3, timeout=60)
+        lru.set('a', {'id': 1})
+        lru.set('b', {'id': 2})
+        lru.delete_user(1)
+        self.assertIsNone(lru.get('a'))
+        self.assertEqual(lru.get('b'), {'id': 2})
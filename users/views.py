@@ -1,23 +1,26 @@
-from django.db.models import Q
 from django.shortcuts import get_object_or_404, render
 from rest_condition import C
 from rest_framework import viewsets
 from rest_framework.decorators import detail_route, list_route, permission_classes
-from rest_framework.exceptions import APIException, PermissionDenied
+from rest_framework.exceptions import APIException, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from clubs.models import Club, CommitteePosition
+from clubs.models import Club
 from clubs.roles import DIVE_OFFICER
 from clubs.serializers import CommitteePositionSerializer
 from courses.models import Course
 from courses.serializers import CourseSerializer
+from mixins import ExportMixin, PaginatedListMixin
 from permissions.permissions import IsAdminUser, IsDiveOfficer, IsSameUser
-from users import fieldsets
+from users import choices, fieldsets
 from users.models import User
 from users.serializers import UserSerializer, UserListSerializer
 
-class UserViewSet(viewsets.ModelViewSet):
+# The maximum number of results returned by an unpaginated user search.
+SEARCH_RESULT_LIMIT = 25
+
+class UserViewSet(ExportMixin, PaginatedListMixin, viewsets.ModelViewSet):
 
     # Our default permission classes: you must be authenticated to do
     # anything.
@@ -52,6 +55,8 @@ class UserViewSet(viewsets.ModelViewSet):
         # Admins and DOs can list users (but the queryset needs to be
         # filtered
         'list': [C(IsAdminUser) | C(IsDiveOfficer)],
+        # The same goes for exporting the list as a file
+        'export': [C(IsAdminUser) | C(IsDiveOfficer)],
         # Admins and DOs can retrieve users (but the queryset needs to
         # be filtered)
         'retrieve': [C(IsAdminUser) | C(IsDiveOfficer)],
@@ -75,6 +80,15 @@ class UserViewSet(viewsets.ModelViewSet):
         except KeyError:
             return [IsAuthenticated()] + [permission() for permission in self.permission_classes]
 
+    # The columns included when the user list is exported as a file
+    export_fields = (
+        'id', 'title', 'first_name', 'last_name', 'gender', 'date_of_birth',
+        'email', 'phone_home', 'phone_mobile',
+        'next_of_kin_name', 'next_of_kin_phone',
+        'club__name', 'club__region__name',
+        'membership_type', 'member_since',
+    )
+
     # When we actually go ahead and create a new User object, we want to be
     # able to assign some attributes that we don't require (or allow)
     # the requesting user to specify. We do that here.
@@ -118,11 +132,21 @@ class UserViewSet(viewsets.ModelViewSet):
         # but for the moment we'll just filter by club committee position;
         # if you're on the committee, you can see what's going on.
         # Field restrictions are specified in serializers.py.
-        if CommitteePosition.objects.filter(user=user, club=user.club).exists():
-            return User.objects.filter(club=user.club)
+        if user.has_any_role_in(user.club_id):
+            return User.objects.filter(club_id=user.club_id)
         return User.objects.filter(id=user.id)
 
 
+    # Exports are scoped by get_queryset(), and (like lists) can be
+    # narrowed to a club or region through the nested routes.
+    def get_export_queryset(self):
+        queryset = self.get_queryset()
+        if 'region_pk' in self.kwargs:
+            queryset = queryset.filter(club__region__id=self.kwargs['region_pk'])
+        if 'club_pk' in self.kwargs:
+            queryset = queryset.filter(club__id=self.kwargs['club_pk'])
+        return queryset
+
     # When the user asks for a list of Users, check their status and
     # filter the queryset accordingly.
     def list(self, request, club_pk=None, region_pk=None):
@@ -141,7 +165,7 @@ class UserViewSet(viewsets.ModelViewSet):
         # If the user is not an admin, then they're a DO; return
         # only the members of their club.
         else:
-            queryset = User.objects.filter(club=user.club)
+            queryset = User.objects.filter(club_id=user.club_id)
 
         if region_pk is not None:
             queryset = queryset.filter(club__region__id=region_pk)
@@ -160,35 +184,49 @@ class UserViewSet(viewsets.ModelViewSet):
         # names in the database. We'll also do a preliminary check
         # to see whether it's numeric, in which case it could be a
         # CFT number.
-        if 'name' in params:
-            fragment = params['name']
-            if fragment.isdigit():
-                q = Q(username__icontains=fragment)
-            else:
-                q = Q(first_name__icontains=fragment) | Q(last_name__icontains=fragment)
-            queryset = queryset.filter(q)
-
-        # Serialize the queryset to JSON.
-        serializer = UserListSerializer(queryset, many=True)
-
-        # Return a Response.
-        return Response(serializer.data)
+        #
+        # Search results are ranked, and (because our typeahead only
+        # wants the best few matches) limited unless the client asks for
+        # pagination.
+        limit = None
+        if params.get('name', '').strip():
+            queryset = queryset.search(params['name'])
+            limit = SEARCH_RESULT_LIMIT
+
+        # Members can be filtered on their membership status, which is
+        # stored (and indexed), so this doesn't compute it for everyone.
+        status = params.get('status')
+        if status:
+            statuses = [value for value, label in choices.STATUS_CHOICES]
+            if status not in statuses:
+                raise ValidationError({'status': 'Must be one of: {}'.format(', '.join(statuses))})
+            queryset = queryset.filter(membership_status__status=status)
+
+        # Each row includes the user's club and its region, and their
+        # membership status, so fetch them in the same query.
+        queryset = queryset.select_related('club__region', 'membership_status')
+
+        # Serialize the queryset to JSON (a page at a time, if the
+        # client has asked for pagination) and return a Response.
+        return self.paginated_response(queryset, UserListSerializer, limit=limit)
 
 
     ###########################################################################
-    # Extra routes
+    # Extra routes. These are also registered under the nested club and
+    # region routers, which pass club_pk or region_pk as well; they
+    # don't depend on them, so they take (and ignore) any extra keyword
+    # arguments.
     ###########################################################################
 
     def _courses(self, role):
         user = self.get_object()
         kwargs = {role: user}
-        courses = Course.objects.filter(**kwargs)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data)
+        courses = Course.objects.filter(**kwargs).with_serializer_data()
+        return self.paginated_response(courses, CourseSerializer)
 
     # Tell us which courses this user has organized.
     @detail_route(methods=['get'], url_path='courses-organized')
-    def courses_organized(self, request, pk=None):
+    def courses_organized(self, request, pk=None, **kwargs):
         """
         Return the list of courses that this user has organized.
         """
@@ -196,7 +234,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
     # Tell us which courses this user is teaching (or has taught).
     @detail_route(methods=['get'], url_path='courses-taught')
-    def courses_taught(self, request, pk=None):
+    def courses_taught(self, request, pk=None, **kwargs):
         """
         Return the list of courses on which this user is teaching
         or has taught
@@ -205,7 +243,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
     # Return this user's current membership status.
     @detail_route(methods=['get'])
-    def current_membership_status(self, request, pk=None):
+    def current_membership_status(self, request, pk=None, **kwargs):
         """
         Return this user's current membership status
         """
@@ -221,7 +259,7 @@ class UserViewSet(viewsets.ModelViewSet):
     # from the request (which automatically does a DB lookup
     # to populate its 'user' attribute anyway).
     @list_route(methods=['get'])
-    def me(self, request):
+    def me(self, request, **kwargs):
         """
         Return the requesting user's profile information.
         """